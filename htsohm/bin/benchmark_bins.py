@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+
+import time
+
+import click
+import numpy as np
+
+from htsohm.bins import calc_bin, calc_bin_indices, flat_bin_ids
+
+def scalar_calc_bins(box_r, num_bins, ranges):
+    """the per-material calc_bin list comprehension that calc_bins used before it was vectorized."""
+    return [tuple(calc_bin(v, *r, num_bins) for v, r in zip(b, ranges)) for b in box_r]
+
+def best_time(f, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = f()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+@click.command()
+@click.option('--num-points', '-n', type=int, default=10**6)
+@click.option('--num-bins', '-b', type=int, default=40)
+@click.option('--num-axes', '-d', type=int, default=2)
+@click.option('--repeat', '-r', type=int, default=3)
+@click.option('--seed', type=int, default=0)
+def benchmark_bins(num_points, num_bins, num_axes, repeat, seed):
+    """Times the vectorized binning against per-material calc_bin calls and checks they agree.
+
+    Points are drawn from a little outside each axis's range so clipping is exercised too."""
+    rng = np.random.default_rng(seed)
+    ranges = [(0.0, 1.0)] + [(0.0, 400.0)] * (num_axes - 1)
+    box_r = np.column_stack([rng.uniform(lb - 0.1 * (ub - lb), ub + 0.1 * (ub - lb), num_points)
+                             for lb, ub in ranges])
+    box_r_list = box_r.tolist()
+
+    scalar_time, scalar_bins = best_time(lambda: scalar_calc_bins(box_r_list, num_bins, ranges), repeat)
+    vector_time, vector_bins = best_time(lambda: calc_bin_indices(box_r, ranges, num_bins), repeat)
+    flat_time, _ = best_time(lambda: np.bincount(flat_bin_ids(calc_bin_indices(box_r, ranges, num_bins), num_bins),
+                                                 minlength=num_bins ** num_axes), repeat)
+
+    if [tuple(b) for b in vector_bins.tolist()] != scalar_bins:
+        raise(Exception("ERROR: vectorized bins do not match calc_bin"))
+
+    print("%d points, %d axes, %d bins per axis (best of %d)" % (num_points, num_axes, num_bins, repeat))
+    print("calc_bin per material:      %8.4f s" % scalar_time)
+    print("calc_bin_indices:           %8.4f s (%5.1fx)" % (vector_time, scalar_time / vector_time))
+    print("calc_bin_indices + counts:  %8.4f s" % flat_time)
+
+if __name__ == '__main__':
+    benchmark_bins()
@@ -6,7 +6,7 @@ import numpy as np
 from htsohm import load_config_file, db
 from htsohm.db import Material, VoidFraction
 from htsohm.figures import delaunay_figure
-from htsohm.htsohm_run import calc_bins
+from htsohm.bins import calc_bin_indices, flat_bin_ids
 
 from sqlalchemy.orm import joinedload
 
@@ -61,14 +61,14 @@ def bin_graph(config_path, database_path=None, csv_path=None, last_material=None
     last_generation_start = len(mats_r) - last_children
 
     print("calculating bins...")
-    bin_counts = np.zeros((num_bins, num_bins))
-    start_bins = calc_bins(mats_r[0:last_generation_start], num_bins, prop1range=prop1range, prop2range=prop2range)
-    for i, (bx, by) in enumerate(start_bins):
-        bin_counts[bx,by] += 1
+    bin_ranges = [prop1range, prop2range]
+    start_bins = calc_bin_indices(mats_r[0:last_generation_start], bin_ranges, num_bins)
+    bin_counts = np.bincount(flat_bin_ids(start_bins, num_bins), minlength=num_bins ** 2).reshape(num_bins, num_bins)
     bins_explored = np.count_nonzero(bin_counts)
-    new_bins = calc_bins(mats_r[last_generation_start:], num_bins, prop1range=prop1range, prop2range=prop2range)
-    print(len(new_bins), len(start_bins), len(set(new_bins) - set(start_bins)))
-    new_bins = set(new_bins) - set(start_bins)
+    new_bins = calc_bin_indices(mats_r[last_generation_start:], bin_ranges, num_bins)
+    start_bins = set(map(tuple, start_bins.tolist()))
+    print(len(new_bins), len(start_bins), len(set(map(tuple, new_bins.tolist())) - start_bins))
+    new_bins = set(map(tuple, new_bins.tolist())) - start_bins
     print("bins explored = %d" % bins_explored)
 
     children = []
@@ -6,6 +6,15 @@ import click
 
 from htsohm import db, load_config_file
 from htsohm.simulation import simulate
+from htsohm.simulation.raspa import write_framework_files
+
+def raspa_input_file(output_dir, simcfg):
+    """the RASPA input file of a simulation, named as in the run of its type."""
+    if simcfg["type"] == "gas_loading":
+        return os.path.join(output_dir, "{}_loading.input".format(simcfg["adsorbate"]))
+    elif simcfg["type"] == "surface_area":
+        return os.path.join(output_dir, "SurfaceArea.input")
+    return os.path.join(output_dir, "{}.input".format(simcfg["type"]))
 
 
 @click.command()
@@ -28,7 +37,11 @@ def output_config_files(config_path, material_ids, database_path=None):
             os.makedirs(output_dir, exist_ok=True)
 
             sim = getattr(simulate, simcfg["type"])
-            sim.write_output_files(m, simcfg, output_dir)
+            if simcfg["type"] == "gas_loading":
+                sim.write_raspa_file(raspa_input_file(output_dir, simcfg), m, simcfg, restart=False)
+            else:
+                sim.write_raspa_file(raspa_input_file(output_dir, simcfg), m, simcfg)
+            write_framework_files(m, output_dir)
 
 
 if __name__ == '__main__':
@@ -10,7 +10,7 @@ import numpy as np
 
 from htsohm import load_config_file, db
 from htsohm.db import Material
-from htsohm.htsohm_run import calc_bins
+from htsohm.bins import calc_bin_indices
 
 def dof_analysis(config_path, output_directory):
     config = load_config_file(config_path)
@@ -20,6 +20,7 @@ def dof_analysis(config_path, output_directory):
     children_per_generation = config['children_per_generation']
     prop1range = config['prop1range']
     prop2range = config['prop2range']
+    bin_ranges = [prop1range, prop2range]
 
     num_bins = config['number_of_convergence_bins']
     bin_counts = np.zeros((num_bins, num_bins))
@@ -42,9 +43,8 @@ def dof_analysis(config_path, output_directory):
 
     new_mats_d = mats_d[0:children_per_generation]
     new_mats_r = mats_r[0:children_per_generation]
-    new_bins = calc_bins(new_mats_r, num_bins, prop1range=prop1range, prop2range=prop2range)
-    for i, (bx, by) in enumerate(new_bins):
-        bin_counts[bx,by] += 1
+    new_bins = calc_bin_indices(new_mats_r, bin_ranges, num_bins)
+    np.add.at(bin_counts, tuple(new_bins.T), 1)
 
     pts = {t:[] for t in perturbation_types}
     gen = 1
@@ -53,7 +53,10 @@ def dof_analysis(config_path, output_directory):
     animation = [[[b[0], b[1], -1, -1] for b in new_bins]]
 
     while len(new_mats_d) > 0:
-        new_bins = calc_bins(new_mats_r, num_bins, prop1range=prop1range, prop2range=prop2range)
+        new_bins = calc_bin_indices(new_mats_r, bin_ranges, num_bins)
+        parents_r = [(m.parent.void_fraction[0].void_fraction, m.parent.gas_loading[0].absolute_volumetric_loading)
+                     for m in new_mats_d]
+        parent_bins = calc_bin_indices(parents_r, bin_ranges, num_bins)
 
         gen_animation = []
         gen_stats = {t:[0, 0.0, 0.0, 0.0, 0] for t in perturbation_types}
@@ -69,15 +72,12 @@ def dof_analysis(config_path, output_directory):
                 m_stats[4] += 1
 
             # generate information for animation script
-            parent_r = (m.parent.void_fraction[0].void_fraction, m.parent.gas_loading[0].absolute_volumetric_loading)
-            parent_bin = calc_bins([parent_r], num_bins, prop1range=prop1range, prop2range=prop2range)[0]
-            gen_animation.append([new_bins[i][0], new_bins[i][1], parent_bin[0], parent_bin[1]])
+            gen_animation.append([new_bins[i][0], new_bins[i][1], parent_bins[i][0], parent_bins[i][1]])
 
             # this and dml needed for output of numpy arrays # num_materials, ∆vf, ∆ml, ∆all, new_bins
             pts[m.perturbation].append([m.parent.gas_loading[0].absolute_volumetric_loading / ml_binunits, dml])
 
-        for i, (bx, by) in enumerate(new_bins):
-            bin_counts[bx,by] += 1
+        np.add.at(bin_counts, tuple(new_bins.T), 1)
 
         row = [gen] + list(chain.from_iterable([gen_stats[t] for t in perturbation_types]))
         tsv.writerow(row)
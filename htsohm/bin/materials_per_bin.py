@@ -18,8 +18,6 @@ def num_materials_per_bin(config_path, database_path, generation=None, output_pa
     """outputs materials per bin for cover visualization script in blender"""
 
     config = load_config_file(config_path)
-    prop1range = config['prop1range']
-    prop2range = config['prop2range']
     num_bins = config['number_of_convergence_bins']
     VoidFraction.set_column_for_void_fraction(config['void_fraction_subtype'])
 
@@ -27,10 +25,10 @@ def num_materials_per_bin(config_path, database_path, generation=None, output_pa
 
     generation = 500
 
-    _, _, bin_counts, _, _, _ = load_restart_db(generation, num_bins, prop1range, prop2range, session)
+    _, _, bin_grid, _ = load_restart_db(generation, num_bins, config['properties'], session)
 
     with click.open_file(output_path, 'w') as f:
-        np.savetxt(f, bin_counts, "%d", delimiter=",")
+        np.savetxt(f, bin_grid.bin_counts, "%d", delimiter=",")
 
 
 if __name__ == '__main__':
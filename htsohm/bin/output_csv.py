@@ -3,10 +3,11 @@ import csv
 import sys
 
 import click
+import numpy as np
 from sqlalchemy.orm import joinedload
 
 from htsohm import db
-from htsohm.bins import calc_bin
+from htsohm.bins import calc_bin_indices
 from htsohm.db import Material, AtomSite
 
 @click.command()
@@ -90,15 +91,22 @@ def csv_add_bin_column(csv_path, bin, output_file=sys.stdout):
         csv_in = csv.reader(f)
         csv_out = csv.writer(output_file, lineterminator="\n")
         header = next(csv_in)
+        rows = list(csv_in)
 
-        bin_col_labels = ["bin%d" % col for col, _, _, _ in bin]
-        csv_out.writerow(header + bin_col_labels + ["unique_bins"])
-        unique_bins = set()
-        for row in csv_in:
-            calcd_bins = [calc_bin(float(row[col]), lb, ub, nb) for col, lb, ub, nb in bin]
-            unique_bins = unique_bins.union(set([tuple(calcd_bins)]))
-            csv_out.writerow(row + calcd_bins + [len(unique_bins)])
+    bin_col_labels = ["bin%d" % col for col, _, _, _ in bin]
+    csv_out.writerow(header + bin_col_labels + ["unique_bins"])
 
+    values = np.array([[float(row[col]) for col, _, _, _ in bin] for row in rows]).reshape(len(rows), len(bin))
+    calcd_bins = calc_bin_indices(values, [(lb, ub) for _, lb, ub, _ in bin], [nb for _, _, _, nb in bin])
+
+    # running count of unique bins: each bin counts from the first row it appears in
+    first_seen = np.zeros(len(rows), dtype=int)
+    if len(rows) > 0:
+        first_seen[np.unique(calcd_bins, axis=0, return_index=True)[1]] = 1
+    unique_bins = np.cumsum(first_seen)
+
+    for row, row_bins, num_unique in zip(rows, calcd_bins.tolist(), unique_bins.tolist()):
+        csv_out.writerow(row + row_bins + [num_unique])
 
 if __name__ == '__main__':
     output_csv()
@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+
+import click
+
+from htsohm.task_queue import run_worker
+
+@click.command()
+@click.argument('queue-path', type=click.Path())
+@click.option('--worker-id', type=str, default=None, help="defaults to hostname:pid:random")
+@click.option('--poll-interval', type=float, default=1.0, help="seconds between checks for new tasks")
+@click.option('--idle-timeout', type=float, default=None, help="exit after this many seconds without a task")
+def queue_worker(queue_path, worker_id=None, poll_interval=1.0, idle_timeout=None):
+    """Runs tasks from the task queue of a run whose config sets task_queue_path.
+
+    Start as many of these as there are cores, on any node that can see QUEUE_PATH and the output
+    directory of the run, from the run's directory."""
+    run_worker(queue_path, worker_id, poll_interval=poll_interval, idle_timeout=idle_timeout)
+
+if __name__ == '__main__':
+    queue_worker()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+import time
+
+import click
+import numpy as np
+from sqlalchemy.orm import joinedload
+
+from htsohm import db
+from htsohm.config import load_config_file
+from htsohm.db import Material, VoidFraction
+from htsohm.simulation.native.forcefield import LJFramework
+from htsohm.simulation.native.widom import widom_void_fraction
+
+@click.command()
+@click.argument('config-path', type=click.Path())
+@click.argument('database-path', type=click.Path())
+@click.option('--num-materials', '-n', type=int, default=20)
+@click.option('--insertions', type=int, default=None)
+@click.option('--seed', type=int, default=0)
+def validate_native_void_fraction(config_path, database_path, num_materials, insertions, seed):
+    """Recomputes the helium void fraction of materials with stored RASPA values using the native
+    Widom engine, and prints both side by side.
+
+    Uses the cutoff, temperature and adsorbate of the void_fraction simulation in the config."""
+    config = load_config_file(config_path)
+    [simulation_config] = [s for s in config["simulations"].values() if s["type"] == "void_fraction"]
+    if insertions is None:
+        insertions = simulation_config.get("native_insertions", 20 * simulation_config["simulation_cycles"])
+
+    db.init_database(db.get_sqlite_dbcs(database_path))
+    session = db.get_session()
+    mats = session.query(Material) \
+        .options(joinedload("structure").joinedload("atom_types", "atom_sites")) \
+        .options(joinedload("void_fraction")) \
+        .join(VoidFraction).filter(VoidFraction.void_fraction.isnot(None)) \
+        .order_by(Material.id).limit(num_materials).all()
+
+    rng = np.random.RandomState(seed)
+    print("id, raspa, native, difference, seconds")
+    differences = []
+    for m in mats:
+        tbegin = time.perf_counter()
+        framework = LJFramework(m.structure, simulation_config["adsorbate"], simulation_config["cutoff"])
+        native = widom_void_fraction(framework, simulation_config["temperature"], insertions, rng=rng)
+        raspa = m.void_fraction[0].void_fraction
+        differences.append(native - raspa)
+        print("%d, %f, %f, %f, %.2f" % (m.id, raspa, native, native - raspa, time.perf_counter() - tbegin))
+
+    if len(differences) > 0:
+        differences = np.abs(differences)
+        print("mean absolute difference: %f; max: %f" % (differences.mean(), differences.max()))
+
+if __name__ == '__main__':
+    validate_native_void_fraction()
@@ -0,0 +1,200 @@
+"""
+Bin counts and bin membership for a run, stored sparsely so that the cost depends on the number of
+materials and occupied bins, not on num_bins ** num_axes.
+
+Every material is recorded by the flat bin id it falls in, in an append-only array indexed by the
+material's position in box_d / box_r. The counts of the occupied bins are kept in a dict, updated on
+every insert. The materials of each bin are found through a CSR-style index: the material positions
+sorted by bin id, the sorted ids of the occupied bins, and the offset where each occupied bin
+starts. Materials inserted after the index was built are kept per bin in a dict of pending positions,
+and looked up there as well; the index is only rebuilt, lazily, once the pending materials outnumber
+an eighth of the indexed ones. That way inserting and sampling one material at a time, as in steady
+state, sorts all materials O(log n) times over a run rather than once per insert.
+
+Grids are saved as separate .npy files so they can be loaded back memory-mapped, without copying.
+"""
+
+import os
+
+import numpy as np
+
+class BinGrid:
+    # materials added since the index was built that are looked up without rebuilding it
+    min_pending = 1024
+
+    def __init__(self, num_bins, num_axes=2):
+        self.num_bins = num_bins
+        self.num_axes = num_axes
+        self.shape = (num_bins,) * num_axes
+        self.num_total_bins = num_bins ** num_axes
+        self.counts = {}
+        self._bin_ids = np.zeros(0, dtype=np.int64)
+        self._length = 0
+        self._order = None
+        self._occupied = None
+        self._offsets = None
+        self._pending = {}
+        self._num_pending = 0
+        self._all_occupied = None
+        self.num_index_builds = 0
+
+    @classmethod
+    def from_bin_ids(cls, bin_ids, num_bins, num_axes=2):
+        grid = cls(num_bins, num_axes)
+        grid.add(bin_ids)
+        return grid
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def num_occupied(self):
+        return len(self.counts)
+
+    @property
+    def bin_ids(self):
+        """flat bin id of each material, by material position."""
+        return self._bin_ids[:self._length]
+
+    @property
+    def bin_counts(self):
+        """counts as a dense array with one axis per property. Only meant for small grids, e.g. to
+        plot two properties."""
+        dense = np.zeros(self.num_total_bins, dtype=np.int64)
+        bin_ids, counts = self.occupied_counts()
+        dense[bin_ids] = counts
+        return dense.reshape(self.shape)
+
+    def add(self, bin_ids):
+        """appends materials, in order, by their flat bin ids. Returns the flat ids of the bins that
+        were empty before."""
+        bin_ids = np.asarray(bin_ids, dtype=np.int64).reshape(-1)
+        start = self._length
+        new_length = self._length + len(bin_ids)
+        if new_length > len(self._bin_ids) or not self._bin_ids.flags.writeable:
+            grown = np.empty(max(new_length, 2 * len(self._bin_ids), 1024), dtype=np.int64)
+            grown[:self._length] = self.bin_ids
+            self._bin_ids = grown
+        self._bin_ids[self._length:new_length] = bin_ids
+        self._length = new_length
+
+        new_bins = []
+        for b, count in zip(*(a.tolist() for a in np.unique(bin_ids, return_counts=True))):
+            if b not in self.counts:
+                new_bins.append(b)
+            self.counts[b] = self.counts.get(b, 0) + count
+        if new_bins:
+            self._all_occupied = None
+
+        # keep small batches aside instead of re-sorting all materials; rebuild once enough piled up
+        if self._order is not None:
+            if self._num_pending + len(bin_ids) > max(self.min_pending, len(self._order) // 8):
+                self._order = None
+            else:
+                for position, b in enumerate(bin_ids.tolist(), start):
+                    self._pending.setdefault(b, []).append(position)
+                self._num_pending += len(bin_ids)
+        if self._order is None:
+            self._pending, self._num_pending = {}, 0
+        return np.array(new_bins, dtype=np.int64)
+
+    def _index(self):
+        """the CSR index of the materials added before the last rebuild; later materials are in
+        _pending."""
+        if self._order is None:
+            self._order = np.argsort(self.bin_ids, kind="stable")
+            sorted_bin_ids = self.bin_ids[self._order]
+            self._occupied = np.unique(sorted_bin_ids)
+            self._offsets = np.append(np.searchsorted(sorted_bin_ids, self._occupied), self._length)
+            self.num_index_builds += 1
+        return self._order, self._occupied, self._offsets
+
+    def _indexed_counts(self, bin_ids):
+        """positions of bin_ids in the occupied bins of the index, and their counts in the index."""
+        _, occupied, offsets = self._index()
+        positions = np.searchsorted(occupied, bin_ids)
+        found = positions < len(occupied)
+        found[found] = occupied[positions[found]] == np.asarray(bin_ids)[found]
+        counts = np.zeros(len(positions), dtype=np.int64)
+        counts[found] = offsets[positions[found] + 1] - offsets[positions[found]]
+        return positions, counts
+
+    def occupied(self):
+        """sorted flat ids of all bins that have at least one material."""
+        _, occupied, _ = self._index()
+        if self._all_occupied is None:
+            pending = np.fromiter(self._pending, dtype=np.int64, count=len(self._pending))
+            self._all_occupied = np.union1d(occupied, pending) if len(pending) else occupied
+        return self._all_occupied
+
+    def occupied_counts(self):
+        """sorted flat ids of the occupied bins and the number of materials in each."""
+        occupied = self.occupied()
+        _, counts = self._indexed_counts(occupied)
+        if self._pending:
+            pending = np.fromiter(self._pending, dtype=np.int64, count=len(self._pending))
+            np.add.at(counts, np.searchsorted(occupied, pending), [len(p) for p in self._pending.values()])
+        return occupied, counts
+
+    def is_occupied(self, bin_ids):
+        bin_ids = np.asarray(bin_ids, dtype=np.int64)
+        occupied = self.occupied()
+        positions = np.searchsorted(occupied, bin_ids)
+        found = positions < len(occupied)
+        found[found] = occupied[positions[found]] == bin_ids[found]
+        return found
+
+    def members(self, bin_id):
+        """positions of the materials in a bin, in the order they were added."""
+        order, _, offsets = self._index()
+        [position], [count] = self._indexed_counts(np.array([bin_id], dtype=np.int64))
+        indexed = order[offsets[position]:offsets[position] + count] if count else order[:0]
+        pending = self._pending.get(int(bin_id))
+        return np.append(indexed, pending).astype(order.dtype) if pending else indexed
+
+    def sample(self, bin_ids, rng=np.random):
+        """picks one material position uniformly at random from each of the given bins. Bins may be
+        repeated; they must not be empty."""
+        bin_ids = np.asarray(bin_ids, dtype=np.int64)
+        order, _, offsets = self._index()
+        positions, counts = self._indexed_counts(bin_ids)
+        pending = [self._pending.get(b, ()) for b in bin_ids.tolist()]
+        totals = counts + np.array([len(p) for p in pending], dtype=np.int64)
+        if not totals.all():
+            raise(Exception("ERROR: cannot sample a material from an empty bin"))
+        picks = (rng.random_sample(len(bin_ids)) * totals).astype(np.int64)
+        indexed = picks < counts
+        samples = np.empty(len(bin_ids), dtype=np.int64)
+        samples[indexed] = order[offsets[positions[indexed]] + picks[indexed]]
+        for i in np.flatnonzero(~indexed).tolist():
+            samples[i] = pending[i][picks[i] - counts[i]]
+        return samples
+
+    def unravel(self, bin_ids):
+        """converts flat bin ids to a list of bin index tuples."""
+        return list(zip(*(axis.tolist() for axis in np.unravel_index(np.asarray(bin_ids, dtype=np.int64), self.shape))))
+
+    def save(self, path):
+        """writes the grid, including its member index, as .npy files in the directory path."""
+        os.makedirs(path, exist_ok=True)
+        if self._num_pending:
+            self._order, self._pending, self._num_pending = None, {}, 0
+        order, occupied, offsets = self._index()
+        np.save(os.path.join(path, "bin_ids.npy"), self.bin_ids)
+        np.save(os.path.join(path, "order.npy"), order)
+        np.save(os.path.join(path, "occupied.npy"), occupied)
+        np.save(os.path.join(path, "offsets.npy"), offsets)
+
+    @classmethod
+    def load(cls, path, num_bins, num_axes=2, mmap_mode="r"):
+        """loads a grid saved with save. With the default mmap_mode the arrays are memory-mapped
+        read-only, and are only copied if materials are added to the grid; only the counts of the
+        occupied bins are read into memory."""
+        grid = cls(num_bins, num_axes)
+        grid._bin_ids = np.load(os.path.join(path, "bin_ids.npy"), mmap_mode=mmap_mode)
+        grid._length = len(grid._bin_ids)
+        grid._order = np.load(os.path.join(path, "order.npy"), mmap_mode=mmap_mode)
+        grid._occupied = np.load(os.path.join(path, "occupied.npy"), mmap_mode=mmap_mode)
+        grid._offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode=mmap_mode)
+        grid.counts = dict(zip(grid._occupied.tolist(), np.diff(grid._offsets).tolist()))
+        return grid
@@ -1,3 +1,4 @@
+import numpy as np
 
 def calc_bin(value, bound_min, bound_max, bins):
     """Find bin in parameter range.
@@ -15,5 +16,39 @@ def calc_bin(value, bound_min, bound_max, bins):
     assigned_bin = max(assigned_bin, 0)
     return int(assigned_bin)
 
+def calc_bin_array(values, bound_min, bound_max, bins):
+    """vectorized calc_bin: returns an int array with the bin of each value, clipped to the
+    parameter range exactly as calc_bin does."""
+    step = (bound_max - bound_min) / bins
+    assigned_bins = (np.asarray(values, dtype=float) - bound_min) // step
+    return np.clip(assigned_bins, 0, bins - 1).astype(int)
+
+def calc_bin_indices(values, ranges, num_bins):
+    """Find bins for many points in a parameter-space with any number of property axes.
+    Args:
+        values (array): n x d array of property values; a 1-d array is treated as one axis.
+        ranges (list): d (lower, upper) limits, one per property axis.
+        num_bins (int or list): number of bins per axis, either one for all axes or one per axis.
+    Returns:
+        n x d int array of bin indices, clipped to each axis exactly as calc_bin does.
+    """
+    values = np.asarray(values, dtype=float).reshape(-1, len(ranges))
+    num_bins = np.broadcast_to(num_bins, len(ranges))
+    bin_indices = np.empty(values.shape, dtype=int)
+    for axis, ((bound_min, bound_max), bins) in enumerate(zip(ranges, num_bins)):
+        bin_indices[:, axis] = calc_bin_array(values[:, axis], bound_min, bound_max, bins)
+    return bin_indices
+
+def flat_bin_ids(bin_indices, num_bins):
+    """converts n x d bin indices to flat (row-major) bin ids, usable with np.bincount."""
+    bin_indices = np.asarray(bin_indices, dtype=int)
+    if bin_indices.size == 0:
+        return np.zeros(0, dtype=int)
+    shape = tuple(np.broadcast_to(num_bins, bin_indices.shape[1]))
+    return np.ravel_multi_index(tuple(bin_indices.T), shape)
+
+def calc_flat_bin_ids(values, ranges, num_bins):
+    return flat_bin_ids(calc_bin_indices(values, ranges, num_bins), num_bins)
+
 def calc_bins(box_r, num_bins, prop1range=(0.0, 1.0), prop2range=(0.0, 1.0)):
-    return [(calc_bin(b[0], *prop1range, num_bins), calc_bin(b[1], *prop2range, num_bins)) for b in box_r]
+    return [tuple(b) for b in calc_bin_indices(box_r, [prop1range, prop2range], num_bins).tolist()]
@@ -0,0 +1,109 @@
+"""
+Periodic cell list for spatial queries over the atom sites of an orthorhombic box.
+
+The box is divided into cells at least cell_size long along each axis, and the atoms are sorted by
+the cell they fall in, with the offset where each cell starts (a CSR-style index, as in BinGrid).
+A query at distance r only looks at the atoms in the cells within r of the query point, wrapping
+around the periodic boundaries.
+
+All distances are between nearest periodic images (the minimum image convention), so each atom or
+pair of atoms is reported at most once. This is exact for radii up to half of the shortest box
+length; beyond that, further images of the same atom are not reported.
+"""
+
+import itertools
+from math import ceil
+
+import numpy as np
+
+class PeriodicCellList:
+    def __init__(self, frac_coords, box, cell_size):
+        """frac_coords: an (n, 3) array of fractional atom coordinates. box: the lengths (a, b, c)
+        of the box. cell_size: the shortest cell length, usually the largest query radius."""
+        self.box = np.array(box, dtype=float)
+        frac = np.array(frac_coords, dtype=float).reshape(-1, 3) % 1.0
+        self.coords = frac * self.box
+
+        # no more cells than about twice the number of atoms, however small cell_size is
+        max_cells = max(1, ceil(2 * len(frac) ** (1/3)))
+        self.shape = tuple(max(1, min(int(length // cell_size), max_cells)) for length in box)
+        self.cell_lengths = self.box / self.shape
+
+        cells = np.minimum((frac * self.shape).astype(np.int64), np.array(self.shape) - 1)
+        cell_ids = np.ravel_multi_index(cells.T, self.shape)
+        self.order = np.argsort(cell_ids, kind="stable")
+        self.offsets = np.searchsorted(cell_ids[self.order], np.arange(np.prod(self.shape) + 1))
+        self._cells = cells
+
+    def __len__(self):
+        return len(self.coords)
+
+    def minimum_image(self, delta):
+        """wraps displacement vectors to their nearest periodic image."""
+        return delta - self.box * np.round(delta / self.box)
+
+    def _neighbor_cells(self, cell, reach):
+        """flat ids of the cells within reach cells of cell along each axis, each cell once."""
+        axes = [np.arange(n) if 2 * k + 1 >= n else (c + np.arange(-k, k + 1)) % n
+                for c, k, n in zip(cell, reach, self.shape)]
+        return np.ravel_multi_index(np.array(list(itertools.product(*axes))).T, self.shape)
+
+    def _atoms_in_cells(self, cell_ids):
+        return np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in cell_ids])
+
+    def _reach(self, r):
+        return [ceil(r / length) for length in self.cell_lengths]
+
+    def _cell_of(self, point):
+        frac = (np.asarray(point, dtype=float) / self.box) % 1.0
+        return np.minimum((frac * self.shape).astype(np.int64), np.array(self.shape) - 1)
+
+    def query_radius(self, point, r):
+        """returns the indices of the atoms closer than r to a point (in cartesian coordinates), in
+        ascending order, and their distances."""
+        if len(self) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        candidates = np.sort(self._atoms_in_cells(self._neighbor_cells(self._cell_of(point), self._reach(r))))
+        distances = np.sqrt((self.minimum_image(self.coords[candidates] - point) ** 2).sum(axis=1))
+        within = distances < r
+        return candidates[within], distances[within]
+
+    def nearest(self, point, exclude=None):
+        """returns the index of the atom nearest to a point (in cartesian coordinates) and its
+        distance, skipping the atom with index exclude. Returns (-1, inf) if there is no such atom.
+
+        Searches outward one shell of cells at a time, until the nearest atom found is closer than
+        any atom outside the cells searched."""
+        cell = self._cell_of(point)
+        for k in itertools.count(1):
+            reach = [k] * 3
+            candidates = self._atoms_in_cells(self._neighbor_cells(cell, reach))
+            if exclude is not None:
+                candidates = candidates[candidates != exclude]
+            searched_all = all(2 * k + 1 >= n for n in self.shape)
+            if len(candidates) > 0:
+                distances = np.sqrt((self.minimum_image(self.coords[candidates] - point) ** 2).sum(axis=1))
+                i = np.argmin(distances)
+                if searched_all or distances[i] <= k * self.cell_lengths.min():
+                    return int(candidates[i]), float(distances[i])
+            if searched_all:
+                return -1, np.inf
+
+    def pairs(self, r):
+        """returns all pairs of atoms closer than r, as arrays (i, j, distance) with i < j."""
+        reach = self._reach(r)
+        found_i, found_j, found_d = [], [], []
+        for cell_id in np.flatnonzero(np.diff(self.offsets)):
+            atoms = self.order[self.offsets[cell_id]:self.offsets[cell_id + 1]]
+            neighbors = self._atoms_in_cells(self._neighbor_cells(self._cells[atoms[0]], reach))
+            delta = self.minimum_image(self.coords[neighbors][None, :, :] - self.coords[atoms][:, None, :])
+            distances = np.sqrt((delta ** 2).sum(axis=2))
+            i, j = np.nonzero((distances < r) & (atoms[:, None] < neighbors[None, :]))
+            found_i.append(atoms[i])
+            found_j.append(neighbors[j])
+            found_d.append(distances[i, j])
+        if len(found_i) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+        i, j, d = np.concatenate(found_i), np.concatenate(found_j), np.concatenate(found_d)
+        order = np.lexsort((j, i))
+        return i[order], j[order], d[order]
@@ -2,14 +2,36 @@ import time
 import os
 import yaml
 
+from htsohm.properties import default_properties, check_properties
+
 def default_configuration():
     return {
         'override_restart_errors': False,
         'keep_configs': False,
+        'scratch_root': False,
         'output_dir': os.getcwd(),
         'void_fraction_subtype': 'raspa',
         'load_restart_path': False,
+        'run_state_compact_every': 0,
         'num_processes': 1,
+        'steady_state': False,
+        'task_queue_path': False,
+        'task_lease_seconds': 120,
+        'task_queue_in_flight': False,
+        'prescreen': False,
+        'prescreen_neighbors': 5,
+        'prescreen_min_training': 100,
+        'prescreen_saturation': 10,
+        'prescreen_max_attempts': 10,
+        'prescreen_warm_start': 1000,
+        'prescreen_window': 10000,
+        'prescreen_max_rejection': 0.9,
+        'energy_grid_spacing': False,
+        'energy_grid_cache_dir': False,
+        'simulation_cache': False,
+        'simulation_cache_db': False,
+        'structure_hash_digits': 6,
+        'max_concurrent_simulations': 1,
         'initial_points_random_seed': int(time.time())
     }
 
@@ -26,6 +48,9 @@ def load_config_file(path):
     with open(path) as config_file:
          config.update(yaml.load(config_file))
 
+    if 'properties' not in config:
+        config['properties'] = default_properties(config)
+
     enforce_config_ok(config)
 
     return config
@@ -34,3 +59,6 @@ def enforce_config_ok(config):
     assert config['void_fraction_subtype'] in ["raspa", "geo", "zeo"]
     assert config['selector_type'] in ["simplices-or-hull", "density-bin", "neighbor-bin",
                                         "best", "specific", "random"]
+    check_properties(config['properties'])
+    if config['selector_type'] == "simplices-or-hull" and len(config['properties']) != 2:
+        raise(Exception("ERROR: the simplices-or-hull selector only works with two properties"))
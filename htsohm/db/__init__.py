@@ -4,7 +4,7 @@ import os
 from shutil import copy2
 import sys
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import yaml
@@ -44,10 +44,27 @@ def init_database(connection_string, backup=False):
 
     # Create tables in the engine, if they don't exist already.
     Base.metadata.create_all(__engine__)
+    upgrade_schema(__engine__)
     Base.metadata.bind = __engine__
 
     return __engine__, __session__
 
+def upgrade_schema(engine):
+    """adds the columns and indexes of the models that are missing from tables created by older
+    versions, since create_all never changes a table that already exists. The new columns are empty
+    (NULL) for the existing rows."""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {col["name"] for col in inspector.get_columns(table.name)}
+            for col in table.columns:
+                if col.name not in existing:
+                    print("adding column %s.%s to the database" % (table.name, col.name))
+                    conn.execute(text("ALTER TABLE %s ADD COLUMN %s %s" %
+                                      (table.name, col.name, col.type.compile(dialect=engine.dialect))))
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
 # Import all models
 from htsohm.db.base import Base
 from htsohm.db.atom_sites import AtomSite
@@ -0,0 +1,165 @@
+"""
+Plain-dict representation of materials, so that workers never need a database session.
+
+The coordinator loads parents with a handful of SQLAlchemy Core queries, workers rebuild transient
+ORM objects from the dicts, and the children they return are written by the coordinator in one
+transaction per batch.
+
+A material dict looks like:
+
+    {"id": 12, "uuid": "...", "parent_id": 3, "perturbation": "all", "generation": 2,
+     "number_density": 0.001, "structure_hash": "...",
+     "structure": {"a": 20.0, "b": 20.0, "c": 20.0,
+                   "atom_types": [(sigma, epsilon), ...],
+                   "atom_sites": [(atom_type_index, x, y, z, q), ...]},
+     "void_fraction": [{column: value, ...}], "gas_loading": [...], "surface_area": [...]}
+"""
+
+from sqlalchemy import func, select
+
+from htsohm.db import Material, Structure, AtomTypes, AtomSite, VoidFraction, GasLoading, SurfaceArea
+
+property_tables = {
+    "void_fraction": VoidFraction,
+    "gas_loading": GasLoading,
+    "surface_area": SurfaceArea,
+}
+
+def property_columns(cls):
+    return [col.name for col in cls.__table__.columns if col.name not in ["id", "material_id"]]
+
+def material_to_dict(material):
+    s = material.structure
+    type_indices = {id(at): i for i, at in enumerate(s.atom_types)}
+    d = {
+        "id": material.id,
+        "uuid": material.uuid,
+        "parent_id": material.parent_id,
+        "perturbation": material.perturbation,
+        "generation": material.generation,
+        "number_density": material.number_density,
+        "structure_hash": material.structure_hash,
+        "structure": {
+            "a": s.a, "b": s.b, "c": s.c,
+            "atom_types": [(at.sigma, at.epsilon) for at in s.atom_types],
+            "atom_sites": [(type_indices[id(a.atom_types)], a.x, a.y, a.z, a.q) for a in s.atom_sites],
+        },
+    }
+    for name, cls in property_tables.items():
+        cols = property_columns(cls)
+        d[name] = [{col: getattr(row, col) for col in cols} for row in getattr(material, name)]
+    return d
+
+def material_from_dict(d, parent=None):
+    """builds a transient Material (not attached to any session) from a material dict."""
+    sd = d["structure"]
+    atom_types = [AtomTypes(sigma=sigma, epsilon=epsilon) for sigma, epsilon in sd["atom_types"]]
+    atom_sites = [AtomSite(atom_types=atom_types[ti], x=x, y=y, z=z, q=q)
+                  for ti, x, y, z, q in sd["atom_sites"]]
+    structure = Structure(a=sd["a"], b=sd["b"], c=sd["c"], atom_sites=atom_sites, atom_types=atom_types)
+
+    material = Material(structure=structure)
+    material.id = d["id"]
+    material.uuid = d["uuid"]
+    material.parent_id = d["parent_id"]
+    material.perturbation = d["perturbation"]
+    material.generation = d["generation"]
+    material.number_density = d["number_density"]
+    material.structure_hash = d.get("structure_hash")
+    if parent is not None:
+        material.parent = parent
+
+    for name, cls in property_tables.items():
+        getattr(material, name).extend([cls(**row) for row in d.get(name, [])])
+    return material
+
+def load_material_dicts(engine, ids):
+    """loads the materials with the given ids as material dicts, keyed by id.
+
+    Uses one query per table instead of lazily loading each relationship of each material."""
+    ids = sorted(set(int(i) for i in ids))
+    if len(ids) == 0:
+        return {}
+
+    mt = Material.__table__
+    st = Structure.__table__
+    att = AtomTypes.__table__
+    ast = AtomSite.__table__
+
+    with engine.connect() as conn:
+        mats = {r.id: {"id": r.id, "uuid": r.uuid, "parent_id": r.parent_id,
+                       "perturbation": r.perturbation, "generation": r.generation,
+                       "number_density": r.number_density, "structure_hash": r.structure_hash}
+                for r in conn.execute(select(mt).where(mt.c.id.in_(ids)))}
+
+        structures = {}
+        for r in conn.execute(select(st).where(st.c.material_id.in_(ids))):
+            structures[r.id] = {"a": r.a, "b": r.b, "c": r.c, "atom_types": [], "atom_sites": []}
+            mats[r.material_id]["structure"] = structures[r.id]
+
+        type_indices = {}
+        for r in conn.execute(select(att).where(att.c.structure_id.in_(structures.keys())).order_by(att.c.id)):
+            atom_types = structures[r.structure_id]["atom_types"]
+            type_indices[r.id] = len(atom_types)
+            atom_types.append((r.sigma, r.epsilon))
+
+        for r in conn.execute(select(ast).where(ast.c.structure_id.in_(structures.keys())).order_by(ast.c.id)):
+            structures[r.structure_id]["atom_sites"].append((type_indices[r.atom_types_id], r.x, r.y, r.z, r.q))
+
+        for name, cls in property_tables.items():
+            cols = property_columns(cls)
+            for m in mats.values():
+                m[name] = []
+            t = cls.__table__
+            for r in conn.execute(select(t).where(t.c.material_id.in_(ids)).order_by(t.c.id)):
+                mats[r.material_id][name].append({col: r._mapping[col] for col in cols})
+
+    return mats
+
+def insert_material_dicts(engine, material_dicts):
+    """inserts the materials in one transaction using SQLAlchemy Core bulk inserts.
+
+    Primary keys are assigned here, so this must only ever be called from a single process (the
+    coordinator). The assigned material ids are set on the dicts and returned in order."""
+    tables = [Material, Structure, AtomTypes, AtomSite] + list(property_tables.values())
+    rows = {cls: [] for cls in tables}
+
+    with engine.begin() as conn:
+        next_id = {cls: (conn.execute(select(func.max(cls.__table__.c.id))).scalar() or 0) + 1
+                   for cls in tables}
+
+        def _new_id(cls):
+            next_id[cls] += 1
+            return next_id[cls] - 1
+
+        for d in material_dicts:
+            d["id"] = _new_id(Material)
+            rows[Material].append({"id": d["id"], "uuid": d["uuid"], "parent_id": d["parent_id"],
+                                   "perturbation": d["perturbation"], "generation": d["generation"],
+                                   "number_density": d["number_density"],
+                                   "structure_hash": d.get("structure_hash")})
+
+            sd = d["structure"]
+            structure_id = _new_id(Structure)
+            rows[Structure].append({"id": structure_id, "material_id": d["id"],
+                                    "a": sd["a"], "b": sd["b"], "c": sd["c"]})
+
+            atom_type_ids = []
+            for sigma, epsilon in sd["atom_types"]:
+                atom_type_ids.append(_new_id(AtomTypes))
+                rows[AtomTypes].append({"id": atom_type_ids[-1], "structure_id": structure_id,
+                                        "sigma": sigma, "epsilon": epsilon})
+
+            for ti, x, y, z, q in sd["atom_sites"]:
+                rows[AtomSite].append({"id": _new_id(AtomSite), "structure_id": structure_id,
+                                       "atom_types_id": atom_type_ids[ti], "x": x, "y": y, "z": z, "q": q})
+
+            for name, cls in property_tables.items():
+                for row in d.get(name, []):
+                    rows[cls].append({"id": _new_id(cls), "material_id": d["id"], **row})
+
+        for cls in tables:
+            if rows[cls]:
+                conn.execute(cls.__table__.insert(), rows[cls])
+
+    return [d["id"] for d in material_dicts]
@@ -18,6 +18,7 @@ class Material(Base):
 
     # structure properties
     number_density       = Column(Float)
+    structure_hash       = Column(String(64), index=True) # see htsohm.structure_hash
 
     # relationships
     parent            = relationship("Material", remote_side=[id])
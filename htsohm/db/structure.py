@@ -6,6 +6,7 @@ from sqlalchemy.orm import relationship
 from htsohm.db import Base
 from htsohm.db.atom_sites import AtomSite
 from htsohm.db.atom_types import AtomTypes
+from htsohm.cell_list import PeriodicCellList
 from htsohm.max_pair_distance import max_pair_distance
 
 class Structure(Base):
@@ -50,13 +51,31 @@ class Structure(Base):
                 math.ceil(2 * cutoff / self.b),
                 math.ceil(2 * cutoff / self.c))
 
+    def _site_positions(self):
+        return tuple((s.x, s.y, s.z) for s in self.atom_sites)
+
+    def cell_list(self, cell_size):
+        """returns a PeriodicCellList of the atom sites, in the order of atom_sites. The last one
+        built is cached, and rebuilt when the lattice constants or any atom position change."""
+        key = (cell_size, self.a, self.b, self.c, self._site_positions())
+        cached = getattr(self, "_cell_list", None)
+        if cached is None or cached[0] != key:
+            cell_list = PeriodicCellList([(s.x, s.y, s.z) for s in self.atom_sites], (self.a, self.b, self.c), cell_size)
+            self._cell_list = cached = (key, cell_list)
+        return cached[1]
+
     @property
     def volume(self):
         return self.a * self.b * self.c
 
     @property
     def max_pair_distance(self):
-        return max_pair_distance([(a.x, a.y, a.z) for a in self.atom_sites])
+        """memoized until any atom site moves."""
+        positions = self._site_positions()
+        cached = getattr(self, "_max_pair_distance", None)
+        if cached is None or cached[0] != positions:
+            self._max_pair_distance = cached = (positions, max_pair_distance(positions))
+        return cached[1]
 
     @property
     def number_density(self):
@@ -25,7 +25,10 @@ class VoidFraction(Base):
     # simulation output
     void_fraction = Column(Float) # raspa
     void_fraction_geo = Column(Float)
-    void_fraction_zeo = Column(Float)
+    void_fraction_geo_error = Column(Float) # standard error, when sampled by monte carlo
+    void_fraction_zeo = Column(Float) # accessible volume fraction, from the voronoi network
+    largest_cavity_diameter = Column(Float)
+    pore_limiting_diameter = Column(Float)
 
     def get_void_fraction(self):
         return getattr(self, type(self).__column_for_void_fraction__)
@@ -1,69 +1,86 @@
 
+import csv
 from datetime import datetime
 from glob import glob
 import math
 from multiprocessing import Pool
 import os
+from queue import Queue
 import random
-import shutil
 import sys
+import time
 
 import numpy as np
-from sqlalchemy.orm import joinedload
 
 from htsohm import generator, load_config_file, db
-from htsohm.bins import calc_bins
+from htsohm.bin_grid import BinGrid
+from htsohm.bins import calc_bin_indices, flat_bin_ids
 from htsohm.bin.output_csv import output_csv_from_db, csv_add_bin_column
 from htsohm.db import Material, VoidFraction
+from htsohm.db.bulk import material_to_dict, material_from_dict, load_material_dicts, insert_material_dicts
+from htsohm.prescreen import Prescreen
+from htsohm.properties import material_properties, property_ranges, load_properties
+from htsohm.run_state import RunState
+from htsohm.simulation.cache import reuse_cached_results, simulation_hash
 from htsohm.simulation.run_all import run_all_simulations
+from htsohm.task_queue import QueuePool
 # from htsohm.figures import delaunay_figure
 import htsohm.select.triangulation as selector_tri
 import htsohm.select.density_bin as selector_bin
 import htsohm.select.best as selector_best
 import htsohm.select.specific as selector_specific
 import htsohm.select.neighbor_bin as selector_neighbor_bin
-from htsohm.slog import init_slog, get_slog, slog
+from htsohm.slog import init_slog, get_slog, get_slog_file, slog
 
 def print_block(string):
     print('{0}\n{1}\n{0}'.format('=' * 80, string))
 
 
-def empty_lists_2d(x,y):
-    return [[[] for j in range(x)] for i in range(y)]
+def parse_restart_path(path):
+    """splits an optional :generation suffix off a run state path."""
+    base, sep, gen = path.rpartition(":")
+    if sep and gen.isdigit():
+        return base, int(gen)
+    return path, None
 
-def dump_restart(path, box_d, box_r, bin_counts, bin_materials, bins, gen):
-    np.savez(path, box_d, box_r, bin_counts, bin_materials, bins, gen)
+def load_restart(path, output_dir):
+    """loads a restart from a run state directory, optionally suffixed with :generation to use the
+    snapshot taken at that generation, or from a txt.npz restart file written by older versions.
 
-def load_restart(path):
+    Returns the RunState if path is a run state, otherwise (box_d, box_r, start_gen)."""
     if path == "auto":
-        restart_files = glob("*.txt.npz")
-        restart_files.sort(key=os.path.getmtime)
-        if len(restart_files) == 0:
-            raise(Exception("ERROR: no txt.npz restart file in the current directory; auto cannot be used."))
-        path = restart_files[-1]
-        if len(restart_files) > 1:
-            print("WARNING: more than one txt.npz file found in this directory. Using last one: %s" % path)
+        run_state_path = os.path.join(output_dir, "run_state")
+        if os.path.exists(os.path.join(run_state_path, "state.json")):
+            path = run_state_path
+        else:
+            restart_files = glob("*.txt.npz")
+            restart_files.sort(key=os.path.getmtime)
+            if len(restart_files) == 0:
+                raise(Exception("ERROR: no run_state or txt.npz restart file found; auto cannot be used."))
+            path = restart_files[-1]
+            if len(restart_files) > 1:
+                print("WARNING: more than one txt.npz file found in this directory. Using last one: %s" % path)
+
+    run_state_path, generation = parse_restart_path(path)
+    if os.path.isdir(run_state_path):
+        return RunState.open(run_state_path, generation)
 
     npzfile = np.load(path, allow_pickle=True)
-    return [npzfile[v] if npzfile[v].size != 1 else npzfile[v].item() for v in npzfile.files]
-
-def load_restart_db(gen, num_bins, prop1range, prop2range, session):
-    mats = session.query(Material).options(joinedload("void_fraction"), joinedload("gas_loading")) \
-                    .filter(Material.generation <= gen).all()
-    box_d = np.array([m.id for m in mats])
-    box_r = np.array([(m.void_fraction[0].get_void_fraction(), m.gas_loading[0].absolute_volumetric_loading)
-                     for m in mats])
+    box_d, box_r, _, _, _, start_gen = [npzfile[v] if npzfile[v].size != 1 else npzfile[v].item()
+                                        for v in npzfile.files]
+    return box_d, box_r, start_gen
 
-    bin_counts = np.zeros((num_bins, num_bins))
-    bin_materials = empty_lists_2d(num_bins, num_bins)
+def load_restart_db(gen, num_bins, properties, session):
+    """rebuilds the run state up to generation gen from the database.
 
-    bins = calc_bins(box_r, num_bins, prop1range=prop1range, prop2range=prop2range)
-    for i, (bx, by) in enumerate(bins):
-        bin_counts[bx,by] += 1
-        bin_materials[bx][by].append(i)
+    Only the material ids and the properties are read, with a single join, instead of loading every
+    material through the ORM."""
+    box_d, box_r = load_properties(session, properties, gen)
+    bin_ids = flat_bin_ids(calc_bin_indices(box_r, property_ranges(properties), num_bins), num_bins)
+    bin_grid = BinGrid.from_bin_ids(bin_ids, num_bins, len(properties))
 
     start_gen = gen + 1
-    return box_d, box_r, bin_counts, bin_materials, set(bins), start_gen
+    return box_d, box_r, bin_grid, start_gen
 
 def check_db_materials_for_restart(expected_num_materials, session, delete_excess=False):
     """Checks for if there are enough or extra materials in the database."""
@@ -84,54 +101,214 @@ def check_db_materials_for_restart(expected_num_materials, session, delete_exces
         sys.exit(1)
 
 def init_worker(config):
-    """initialization function for worker that inits the database and gets a worker-specific
-    session."""
-    global worker_session
-    _, worker_session = db.init_database(config["database_connection_string"])
+    """initialization function for worker. Workers live for the whole run, so this only happens once
+    per worker process. Workers never touch the database: parents are passed in and children are
+    returned as material dicts (see htsohm.db.bulk)."""
+    global worker_config
+    worker_config = config
+
+    # forked workers all inherit the same random state from the parent process, for both random and
+    # the NumPy global random state used by the Monte Carlo simulations
+    random.seed()
+    np.random.seed()
     return
 
-def simulate_generation_worker(parent_id):
-    """gets most of its parameters from the global worker_metadata set in the
-    parallel_simulate_generation method."""
-    generator, config, gen = worker_metadata
+def worker_ready(_):
+    return os.getpid()
+
+def start_worker_pool(num_processes, config):
+    """starts the pool of workers that is reused for every generation of the run.
+
+    If task_queue_path is set in the config, tasks are instead handed out through a task queue to
+    workers started separately with psm-queue-worker, possibly on other nodes.
+
+    Returns the pool and the number of seconds it took to start it, including the time for every
+    worker to run init_worker."""
+    tbegin = time.perf_counter()
+    if config['task_queue_path']:
+        print("using task queue for workers: %s" % config['task_queue_path'])
+        pool = QueuePool(config['task_queue_path'], initializer=init_worker, initargs=[config],
+                         lease_seconds=config['task_lease_seconds'])
+    else:
+        pool = Pool(processes=num_processes, initializer=init_worker, initargs=[config])
+        pool.map(worker_ready, range(num_processes), chunksize=1)
+    return pool, time.perf_counter() - tbegin
+
+def simulate_generation_worker(generator, parent, gen, seed=None):
+    """generates and simulates one material in the worker process.
+
+    parent is a material dict, or None for generators that don't need a parent. Returns the child as
+    a material dict without an id; ids are assigned when the coordinator inserts it.
+
+    If seed is passed, the random state is seeded just for generating this material, so that the
+    initial random materials are reproducible regardless of which worker they land on."""
+    config = worker_config
     init_slog()
-    if parent_id > 0:
-        parent = worker_session.query(Material).get(int(parent_id))
-        material = generator(parent, config["structure_parameters"])
+    if seed is not None:
+        random.seed(seed)
+        np.random.seed(seed)
+    if parent is not None:
+        material = generator(material_from_dict(parent), config["structure_parameters"])
     else:
         material = generator(config["structure_parameters"])
+    if seed is not None:
+        random.seed()
+        np.random.seed()
 
+    return simulate_material(material, config, gen)
+
+def simulate_child_worker(child, parent, gen, generation_log=""):
+    """simulates one child that was already generated by the coordinator (see htsohm.prescreen and
+    htsohm.simulation.cache). generation_log is what the generator logged, so the worker's output
+    block stays complete."""
+    config = worker_config
+    init_slog()
+    get_slog_file().write(generation_log)
+    material = material_from_dict(child, parent=material_from_dict(parent) if parent is not None else None)
+    return simulate_material(material, config, gen)
+
+def simulate_material(material, config, gen):
     run_all_simulations(material, config)
     material.generation = gen
-    worker_session.add(material)
-    worker_session.commit()
 
     print(get_slog())
-    return (material.id, (material.void_fraction[0].get_void_fraction(),
-                          material.gas_loading[0].absolute_volumetric_loading))
-
-def parallel_simulate_generation(generator, num_processes, parent_ids, config, gen, children_per_generation):
-    global worker_metadata
-    worker_metadata = (generator, config, gen)
+    return material_to_dict(material)
 
+def generate_child(generator, parent, config):
+    """generates one child in the coordinator, for pre-screening or the simulation cache. Returns
+    the child as a material dict and the log of its generation."""
+    init_slog()
+    if parent is not None:
+        material = generator(material_from_dict(parent), config["structure_parameters"])
+    else:
+        material = generator(config["structure_parameters"])
+    return material_to_dict(material), get_slog()
+
+def generate_children(generator, parents, config, prescreen=None):
+    """generates one child per parent in the coordinator, screened by prescreen if it is on.
+    Returns a list of (child, parent, log)."""
+    generate = lambda parent: generate_child(generator, parent, config)
+    if prescreen is not None:
+        return prescreen.screen(generate, parents)
+    return [(child, parent, log) for parent in parents for child, log in [generate(parent)]]
+
+def reuse_cached_child(child, gen, log, config):
+    """looks up a child generated in the coordinator in the simulation cache, setting its structure
+    hash. Returns True if it was found there, with its results copied in; it then needs no simulating,
+    and its log is printed here instead of by a worker."""
+    uuid = reuse_cached_results(child, config)
+    if uuid is None:
+        return False
+    child["generation"] = gen
+    print(log + "-----------------------------------------------\n"
+          "Reusing the simulation results of material {}\n".format(uuid))
+    return True
+
+def parallel_simulate_generation(pool, generator, parent_ids, config, gen, children_per_generation, seeds=None,
+                                 prescreen=None):
+    engine = db.get_engine()
     if parent_ids is None:
-        parent_ids = [0] * (children_per_generation) # should only be needed for random!
-
-    with Pool(processes=num_processes, initializer=init_worker, initargs=[config]) as pool:
-        results = pool.map(simulate_generation_worker, parent_ids)
-
-    box_d, box_r = zip(*results)
+        parents = [None] * (children_per_generation) # should only be needed for random!
+    else:
+        parent_dicts = load_material_dicts(engine, parent_ids)
+        parents = [parent_dicts[int(i)] for i in parent_ids]
+
+    if (prescreen is not None or config['simulation_cache']) and seeds is None:
+        tasks = generate_children(generator, parents, config, prescreen)
+        cached = [config['simulation_cache'] and reuse_cached_child(child, gen, log, config)
+                  for child, _, log in tasks]
+        simulated = iter(pool.starmap(simulate_child_worker, [(child, parent, gen, log)
+                                      for (child, parent, log), hit in zip(tasks, cached) if not hit]))
+        children = [child if hit else next(simulated) for (child, _, _), hit in zip(tasks, cached)]
+    else:
+        if seeds is None:
+            seeds = [None] * len(parents)
+        children = pool.starmap(simulate_generation_worker,
+                                [(generator, parent, gen, seed) for parent, seed in zip(parents, seeds)])
+        if config['simulation_cache']:
+            # generated by the workers, so only hashed now, for later children to be found by
+            for child in children:
+                child["structure_hash"] = simulation_hash(material_from_dict(child).structure, config)
+
+    box_d = insert_material_dicts(engine, children)
+    box_r = [material_properties(m, config['properties']) for m in children]
+    if prescreen is not None:
+        prescreen.add(children, box_r)
     return (np.array(box_d), np.array(box_r))
 
-def select_parents(children_per_generation, box_d, box_r, bin_materials, config):
+def tasks_in_flight(num_processes, config):
+    """how many materials steady state keeps dispatched at once: one per local worker, or with a task
+    queue, whose workers can be on any number of nodes, task_queue_in_flight (by default, one
+    generation)."""
+    if config['task_queue_path']:
+        return config['task_queue_in_flight'] or config['children_per_generation']
+    return num_processes
+
+def steady_state_simulate(pool, generator, max_in_flight, config, start_gen, max_generations,
+                          select_parent, add_material, prescreen=None):
+    """Runs generations without a barrier between them.
+
+    Up to max_in_flight materials are kept dispatched (see tasks_in_flight), so every worker is kept
+    busy: as soon as any material finishes, it is inserted into the database,
+    its results are passed to add_material(material_id, material_r) and a new parent is chosen with select_parent() and
+    dispatched. Generations only exist as labels here; the material dispatched n-th after start_gen
+    is labeled with generation start_gen + n // children_per_generation.
+
+    add_material returns True when the run should stop; no new materials are dispatched after that,
+    but the materials already in flight are waited for and passed to add_material.
+    """
+    children_per_generation = config['children_per_generation']
+    num_tasks = (max_generations - start_gen + 1) * children_per_generation
+    results = Queue()
+
+    engine = db.get_engine()
+
+    def _dispatch(task_index):
+        gen = start_gen + task_index // children_per_generation
+        parent_id = select_parent()
+        parent = load_material_dicts(engine, [parent_id])[parent_id] if parent_id > 0 else None
+        if prescreen is not None or config['simulation_cache']:
+            [(child, parent, log)] = generate_children(generator, [parent], config, prescreen)
+            if config['simulation_cache'] and reuse_cached_child(child, gen, log, config):
+                results.put(child)
+            else:
+                pool.apply_async(simulate_child_worker, (child, parent, gen, log),
+                                 callback=results.put, error_callback=results.put)
+        else:
+            pool.apply_async(simulate_generation_worker, (generator, parent, gen),
+                             callback=results.put, error_callback=results.put)
+
+    dispatched = 0
+    while dispatched < min(max_in_flight, num_tasks):
+        _dispatch(dispatched)
+        dispatched += 1
+
+    completed = 0
+    while completed < dispatched:
+        result = results.get()
+        if isinstance(result, Exception):
+            raise result
+        completed += 1
+
+        material_id, = insert_material_dicts(engine, [result])
+        material_r = material_properties(result, config['properties'])
+        if prescreen is not None:
+            prescreen.add([result], [material_r])
+        if add_material(material_id, material_r):
+            num_tasks = dispatched
+        elif dispatched < num_tasks:
+            _dispatch(dispatched)
+            dispatched += 1
+
+def select_parents(children_per_generation, box_d, box_r, bin_grid, config):
     if config['generator_type'] == 'random':
         return (None, [])
     elif config['selector_type'] == 'simplices-or-hull':
         return selector_tri.choose_parents(children_per_generation, box_d, box_r, config['simplices_or_hull'])
     elif config['selector_type'] == 'density-bin':
-        return selector_bin.choose_parents(children_per_generation, box_d, box_r, bin_materials)
+        return selector_bin.choose_parents(children_per_generation, box_d, box_r, bin_grid)
     elif config['selector_type'] == 'neighbor-bin':
-        return selector_neighbor_bin.choose_parents(children_per_generation, box_d, box_r, bin_materials)
+        return selector_neighbor_bin.choose_parents(children_per_generation, box_d, box_r, bin_grid)
     elif config['selector_type'] == 'best':
         return selector_best.choose_parents(children_per_generation, box_d, box_r)
     elif config['selector_type'] == 'specific':
@@ -140,22 +317,14 @@ def select_parents(children_per_generation, box_d, box_r, bin_materials, config)
 
 def htsohm_run(config_path, restart_generation=-1, override_db_errors=False, num_processes=1, max_generations=None):
 
-    def _update_bins_counts_materials(all_bins, bins, start_index):
-        nonlocal bin_counts, bin_materials
-        for i, (bx, by) in enumerate(all_bins):
-            bin_counts[bx,by] += 1
-            bin_materials[bx][by].append(i + start_index)
-        new_bins = set(all_bins) - bins
-        return new_bins, bins.union(new_bins)
-
-
     config = load_config_file(config_path)
     os.makedirs(config['output_dir'], exist_ok=True)
     print(config)
 
     children_per_generation = config['children_per_generation']
-    prop1range = config['prop1range']
-    prop2range = config['prop2range']
+    properties = config['properties']
+    num_properties = len(properties)
+    bin_ranges = property_ranges(properties)
     VoidFraction.set_column_for_void_fraction(config['void_fraction_subtype'])
     num_bins = config['number_of_convergence_bins']
     benchmarks = config['benchmarks']
@@ -169,113 +338,214 @@ def htsohm_run(config_path, restart_generation=-1, override_db_errors=False, num
     engine, session = db.init_database(config["database_connection_string"],
                 backup=(load_restart_path != False or restart_generation > 0))
 
-    print('{:%Y-%m-%d %H:%M:%S}'.format(datetime.now()))
-    if restart_generation >= 0:
-        print("Restarting from database using generation: %s" % restart_generation)
-        box_d, box_r, bin_counts, bin_materials, bins, start_gen = load_restart_db(
-            restart_generation, num_bins, prop1range, prop2range, session)
-
-        print("Restarting at generation %d\nThere are currently %d materials" % (start_gen, len(box_r)))
-        check_db_materials_for_restart(len(box_r), session, delete_excess=override_db_errors)
-    elif load_restart_path:
-        print("Restarting from file: %s" % load_restart_path)
-        box_d, box_r, bin_counts, bin_materials, bins, start_gen = load_restart(load_restart_path)
-        print("Restarting at generation %d\nThere are currently %d materials" % (start_gen, len(box_r)))
-        check_db_materials_for_restart(len(box_r), session, delete_excess=override_db_errors)
-    else:
-        if session.query(Material).count() > 0:
-            print("ERROR: cannot have existing materials in the database for a new run")
-            sys.exit(1)
-
-        # generate initial generation of random materials
-        print("applying random seed to initial points: %d" % config['initial_points_random_seed'])
-        random.seed(config['initial_points_random_seed'])
-        box_d, box_r = parallel_simulate_generation(generator.random.new_material, num_processes, None,
-                        config, gen=0, children_per_generation=config['children_per_generation'])
-        random.seed() # flush the seed so that only the initial points are set, not generated points
-
-        # setup initial bins
-        bin_counts = np.zeros((num_bins, num_bins))
-        bin_materials = empty_lists_2d(num_bins, num_bins)
-        all_bins = calc_bins(box_r, num_bins, prop1range=prop1range, prop2range=prop2range)
-        new_bins, bins = _update_bins_counts_materials(all_bins, set(), 0)
-
-        output_path = os.path.join(config['output_dir'], "binplot_0.png")
-        # delaunay_figure(box_r, num_bins, output_path, bins=bin_counts, \
-        #                     title="Starting random materials", show_triangulation=False, show_hull=False, \
-        #                     prop1range=prop1range, prop2range=prop2range)
-
-        start_gen = 1
-
-    if config['generator_type'] == 'random':
-        generator_method = generator.random.new_material
-    elif config['generator_type'] == 'mutate':
-        generator_method = generator.mutate.mutate_material
-
-    for gen in range(start_gen, max_generations + 1):
-        benchmark_just_reached = False
-
-        # mutate materials and simulate properties
-        parents_d, parents_r = select_parents(children_per_generation, box_d, box_r, bin_materials, config)
-        new_box_d, new_box_r = parallel_simulate_generation(generator_method, num_processes, parents_d,
-                                config, gen=gen, children_per_generation=config['children_per_generation'])
-
-        # track bins
-        all_bins = calc_bins(new_box_r, num_bins, prop1range=prop1range, prop2range=prop2range)
-        new_bins, bins = _update_bins_counts_materials(all_bins, bins, gen * children_per_generation)
-
-        # evaluate algorithm effectiveness
-        bin_fraction_explored = len(bins) / num_bins ** 2
-        print_block('GENERATION %s: %5.2f%%' % (gen, bin_fraction_explored * 100))
-        while bin_fraction_explored >= next_benchmark:
-            benchmark_just_reached = True
-            print_block("%s: %5.2f%% exploration accomplished at generation %d" %
-                ('{:%Y-%m-%d %H:%M:%S}'.format(datetime.now()), bin_fraction_explored * 100, gen))
-            if benchmarks:
-                next_benchmark = benchmarks.pop(0)
+    pool, pool_startup_time = start_worker_pool(num_processes, config)
+    try:
+        print("worker pool startup time: %5.2f seconds" % pool_startup_time)
+        generations_run = 0
+        prescreen = Prescreen(config) if config['prescreen'] else None
+
+        print('{:%Y-%m-%d %H:%M:%S}'.format(datetime.now()))
+        run_state_path = os.path.join(config['output_dir'], "run_state")
+        if restart_generation >= 0:
+            print("Restarting from database using generation: %s" % restart_generation)
+            box_d, box_r, _, start_gen = load_restart_db(restart_generation, num_bins, properties, session)
+            run_state = None
+        elif load_restart_path:
+            print("Restarting from: %s" % load_restart_path)
+            run_state = load_restart(load_restart_path, config['output_dir'])
+            if isinstance(run_state, RunState):
+                if run_state.num_properties != num_properties:
+                    raise(Exception("ERROR: run state has %d properties but the config has %d" %
+                                    (run_state.num_properties, num_properties)))
+                start_gen = run_state.generation + 1
+                bin_grid = BinGrid.from_bin_ids(run_state.bin_ids, num_bins, num_properties)
+                if os.path.abspath(run_state.path) != os.path.abspath(run_state_path):
+                    print("WARNING: continuing the run state in %s instead of %s" % (run_state.path, run_state_path))
             else:
-                last_benchmark_reached = True
-
-        # if config['bin_graph_on'] and (
-        #     (benchmark_just_reached or gen == config['max_generations']) or \
-        #     (config['bin_graph_every'] > 0  and gen % config['bin_graph_every'] == 0)):
-        #
-        #     output_path = os.path.join(config['output_dir'], "binplot_%d.png" % gen)
-        #     delaunay_figure(box_r, num_bins, output_path, children=new_box_r, parents=parents_r,
-        #                     bins=bin_counts, new_bins=new_bins,
-        #                     title="Generation %d: %d/%d (+%d) %5.2f%% (+%5.2f %%)" %
-        #                         (gen, len(bins), num_bins ** 2, len(new_bins),
-        #                         100*float(len(bins)) / num_bins ** 2, 100*float(len(new_bins)) / num_bins ** 2 ),
-        #                     patches=None, prop1range=prop1range, prop2range=prop2range, \
-        #                     perturbation_methods=["all"]*children_per_generation, show_triangulation=False, show_hull=False)
-        #
-        # if config['tri_graph_on'] and (
-        #     (benchmark_just_reached or gen == config['max_generations']) or \
-        #     (config['tri_graph_every'] > 0  and gen % config['tri_graph_every'] == 0)):
-        #
-        #     output_path = os.path.join(config['output_dir'], "triplot_%d.png" % gen)
-        #     delaunay_figure(box_r, num_bins, output_path, children=new_box_r, parents=parents_r,
-        #                     bins=bin_counts, new_bins=new_bins,
-        #                     title="Generation %d: %d/%d (+%d) %5.2f%% (+%5.2f %%)" %
-        #                         (gen, len(bins), num_bins ** 2, len(new_bins),
-        #                         100*float(len(bins)) / num_bins ** 2, 100*float(len(new_bins)) / num_bins ** 2 ),
-        #                     patches=None, prop1range=prop1range, prop2range=prop2range, \
-        #                     perturbation_methods=["all"]*children_per_generation)
-
-        box_d = np.append(box_d, new_box_d, axis=0)
-        box_r = np.append(box_r, new_box_r, axis=0)
-
-        restart_path = os.path.join(config['output_dir'], "restart.txt.npz")
-        dump_restart(restart_path, box_d, box_r, bin_counts, bin_materials, bins, gen + 1)
-        if benchmark_just_reached or gen == max_generations:
-            shutil.move(restart_path, os.path.join(config['output_dir'], "restart%d.txt.npz" % gen))
-
-        if last_benchmark_reached:
-            break
+                box_d, box_r, start_gen = run_state
+                run_state = None
+                if np.shape(box_r)[1] != num_properties:
+                    raise(Exception("ERROR: restart file has %d properties but the config has %d" %
+                                    (np.shape(box_r)[1], num_properties)))
+        else:
+            if session.query(Material).count() > 0:
+                print("ERROR: cannot have existing materials in the database for a new run")
+                sys.exit(1)
+
+            # generate initial generation of random materials
+            print("applying random seed to initial points: %d" % config['initial_points_random_seed'])
+            seeds = [config['initial_points_random_seed'] + i for i in range(children_per_generation)]
+            box_d, box_r = parallel_simulate_generation(pool, generator.random.new_material, None,
+                            config, gen=0, children_per_generation=children_per_generation, seeds=seeds,
+                            prescreen=prescreen)
+            generations_run += 1
+
+            output_path = os.path.join(config['output_dir'], "binplot_0.png")
+            # delaunay_figure(box_r, num_bins, output_path, bins=bin_counts, \
+            #                     title="Starting random materials", show_triangulation=False, show_hull=False, \
+            #                     prop1range=prop1range, prop2range=prop2range)
+
+            start_gen = 1
+            run_state = None
+
+        if run_state is None:
+            # setup bins, and a run state continuing the one already there if it matches
+            bin_ids = flat_bin_ids(calc_bin_indices(box_r, bin_ranges, num_bins), num_bins)
+            bin_grid = BinGrid.from_bin_ids(bin_ids, num_bins, num_properties)
+
+            run_state = RunState.reopen_or_create(run_state_path, box_d, box_r, bin_ids, start_gen - 1)
+
+        box_d, box_r = run_state.box_d, run_state.box_r
+        if restart_generation >= 0 or load_restart_path:
+            print("Restarting at generation %d\nThere are currently %d materials" % (start_gen, len(box_r)))
+            check_db_materials_for_restart(len(box_r), session, delete_excess=override_db_errors)
+
+        if config['generator_type'] == 'random':
+            generator_method = generator.random.new_material
+        elif config['generator_type'] == 'mutate':
+            generator_method = generator.mutate.mutate_material
+
+        if prescreen is not None:
+            def _select_parent_dicts(n):
+                parents_d, _ = select_parents(n, box_d, box_r, bin_grid, config)
+                if parents_d is None:
+                    return [None] * n
+                parent_dicts = load_material_dicts(engine, parents_d)
+                return [parent_dicts[int(i)] for i in parents_d]
+
+            prescreen.bin_grid = bin_grid
+            prescreen.select_parents = _select_parent_dicts
+            if len(prescreen) == 0 and config['prescreen_warm_start'] > 0:
+                # restarted: train on the most recent materials instead of starting from nothing
+                warm_start = slice(max(len(box_d) - config['prescreen_warm_start'], 0), len(box_d))
+                warm_d, warm_r = box_d[warm_start], box_r[warm_start]
+                for i in range(0, len(warm_d), 500):
+                    material_dicts = load_material_dicts(engine, warm_d[i:i + 500])
+                    prescreen.add([material_dicts[int(m)] for m in warm_d[i:i + 500]], warm_r[i:i + 500])
+                print("prescreen trained on the last %d materials" % len(prescreen))
+
+        def _evaluate_generation(gen):
+            """prints exploration progress for the generation, checks the benchmarks and writes the
+            restart file. Returns True if the last benchmark has been reached."""
+            nonlocal next_benchmark, last_benchmark_reached
+            benchmark_just_reached = False
+
+            # evaluate algorithm effectiveness
+            bin_fraction_explored = bin_grid.num_occupied / bin_grid.num_total_bins
+            print_block('GENERATION %s: %5.2f%%' % (gen, bin_fraction_explored * 100))
+            if prescreen is not None:
+                stopped = prescreen.stopped
+                screened, rejected, replaced = prescreen.generation_counts()
+                print("prescreen: %d of %d screened children predicted to land in saturated bins; %d replaced" %
+                      (rejected, screened, replaced))
+                if stopped:
+                    print("prescreen: stopped screening this generation; the model can't tell the children apart")
+            while bin_fraction_explored >= next_benchmark:
+                benchmark_just_reached = True
+                print_block("%s: %5.2f%% exploration accomplished at generation %d" %
+                    ('{:%Y-%m-%d %H:%M:%S}'.format(datetime.now()), bin_fraction_explored * 100, gen))
+                if benchmarks:
+                    next_benchmark = benchmarks.pop(0)
+                else:
+                    last_benchmark_reached = True
+
+            # benchmark snapshots only record the current length and checksums of the run state, so
+            # they can be restarted from later with load_restart_path: run_state:<generation>
+            run_state.commit(gen, snapshot=(benchmark_just_reached or gen == max_generations))
+            if config['run_state_compact_every'] > 0 and gen % config['run_state_compact_every'] == 0:
+                run_state.compact()
+
+            return last_benchmark_reached
+
+        if config['steady_state']:
+            def _select_parent():
+                parents_d, _ = select_parents(1, box_d, box_r, bin_grid, config)
+                return int(parents_d[0]) if parents_d is not None else 0
+
+            materials_completed = 0
+            def _add_material(material_id, material_r):
+                nonlocal box_d, box_r, materials_completed
+                bin_ids = flat_bin_ids(calc_bin_indices([material_r], bin_ranges, num_bins), num_bins)
+                bin_grid.add(bin_ids)
+                run_state.append([material_id], [material_r], bin_ids)
+                box_d, box_r = run_state.box_d, run_state.box_r
+
+                materials_completed += 1
+                if materials_completed % children_per_generation == 0:
+                    return _evaluate_generation(start_gen + materials_completed // children_per_generation - 1)
+                return False
+
+            steady_state_simulate(pool, generator_method, tasks_in_flight(num_processes, config), config, start_gen, max_generations,
+                                  _select_parent, _add_material, prescreen=prescreen)
+            generations_run += math.ceil(materials_completed / children_per_generation)
+
+            if materials_completed % children_per_generation != 0:
+                # materials that were still in flight when the run stopped are already in the database,
+                # so they need to be in the run state too.
+                run_state.commit(start_gen + materials_completed // children_per_generation - 1)
+        else:
+            for gen in range(start_gen, max_generations + 1):
+                # mutate materials and simulate properties
+                parents_d, parents_r = select_parents(children_per_generation, box_d, box_r, bin_grid, config)
+                new_box_d, new_box_r = parallel_simulate_generation(pool, generator_method, parents_d,
+                                        config, gen=gen, children_per_generation=children_per_generation,
+                                        prescreen=prescreen)
+                generations_run += 1
+
+                # track bins
+                bin_ids = flat_bin_ids(calc_bin_indices(new_box_r, bin_ranges, num_bins), num_bins)
+                new_bins = bin_grid.unravel(bin_grid.add(bin_ids))
+
+                # if config['bin_graph_on'] and (
+                #     (benchmark_just_reached or gen == config['max_generations']) or \
+                #     (config['bin_graph_every'] > 0  and gen % config['bin_graph_every'] == 0)):
+                #
+                #     output_path = os.path.join(config['output_dir'], "binplot_%d.png" % gen)
+                #     delaunay_figure(box_r, num_bins, output_path, children=new_box_r, parents=parents_r,
+                #                     bins=bin_grid.bin_counts, new_bins=new_bins,
+                #                     title="Generation %d: %d/%d (+%d) %5.2f%% (+%5.2f %%)" %
+                #                         (gen, bin_grid.num_occupied, num_bins ** 2, len(new_bins),
+                #                         100*float(bin_grid.num_occupied) / num_bins ** 2, 100*float(len(new_bins)) / num_bins ** 2 ),
+                #                     patches=None, prop1range=prop1range, prop2range=prop2range, \
+                #                     perturbation_methods=["all"]*children_per_generation, show_triangulation=False, show_hull=False)
+                #
+                # if config['tri_graph_on'] and (
+                #     (benchmark_just_reached or gen == config['max_generations']) or \
+                #     (config['tri_graph_every'] > 0  and gen % config['tri_graph_every'] == 0)):
+                #
+                #     output_path = os.path.join(config['output_dir'], "triplot_%d.png" % gen)
+                #     delaunay_figure(box_r, num_bins, output_path, children=new_box_r, parents=parents_r,
+                #                     bins=bin_grid.bin_counts, new_bins=new_bins,
+                #                     title="Generation %d: %d/%d (+%d) %5.2f%% (+%5.2f %%)" %
+                #                         (gen, bin_grid.num_occupied, num_bins ** 2, len(new_bins),
+                #                         100*float(bin_grid.num_occupied) / num_bins ** 2, 100*float(len(new_bins)) / num_bins ** 2 ),
+                #                     patches=None, prop1range=prop1range, prop2range=prop2range, \
+                #                     perturbation_methods=["all"]*children_per_generation)
+
+                run_state.append(new_box_d, new_box_r, bin_ids)
+                box_d, box_r = run_state.box_d, run_state.box_r
+
+                if _evaluate_generation(gen):
+                    break
+
+        run_state.compact()
+        pool.close()
+        pool.join()
+    finally:
+        # a no-op after a normal close and join; otherwise stops the workers on an error
+        pool.terminate()
+    print("worker pool was started once for %d generations; starting a new pool every generation "
+          "would have added an estimated ~%5.2f seconds of overhead (startup time x (generations - 1))." %
+          (generations_run, pool_startup_time * max(generations_run - 1, 0)))
 
     with open("pm.csv", 'w', newline='') as f:
         output_csv_from_db(session, output_file=f)
 
-    with open("pm-binned.csv", 'w', newline='') as f:
-        # column 12 is void_fraction_geo, 13 is methane loading
-        csv_add_bin_column("pm.csv", [(12, *prop1range, num_bins), (13, *prop2range, num_bins)], output_file=f)
+    with open("pm.csv") as f:
+        header = next(csv.reader(f))
+    if all(prop['column'] in header for prop in properties):
+        with open("pm-binned.csv", 'w', newline='') as f:
+            csv_add_bin_column("pm.csv", [(header.index(prop['column']), *prop['range'], num_bins)
+                                          for prop in properties], output_file=f)
+    else:
+        print("not writing pm-binned.csv: pm.csv does not have a column for every property")
@@ -1,5 +1,3 @@
-import itertools
-
 import numpy as np
 
 def minimum_distance_v(v1, v2):
@@ -14,9 +12,20 @@ def minimum_distance_v(v1, v2):
 def minimum_distance_point(p1, p2):
     return [minimum_distance_v(v1, v2) for (v1, v2) in zip(p1, p2)]
 
-def max_pair_distance(points):
-    if len(points) == 1:
+def max_pair_distance(points, max_chunk_entries=2**22):
+    """returns the largest minimum-image distance between any two points, in fractional
+    coordinates.
+
+    Works on blocks of rows of the pair distance matrix at a time, comparing each block of points
+    only with the points from the start of the block on, so memory stays within about
+    max_chunk_entries pairs whatever the number of points."""
+    points = np.array(points, dtype=float).reshape(-1, 3)
+    if len(points) < 2:
         return 0.0
-    pairs = np.array([minimum_distance_point(p1, p2) for p1, p2 in itertools.combinations(points, 2)])
-    distances = (pairs ** 2).sum(axis=1) ** 0.5
-    return max(distances)
+    chunk = max(1, max_chunk_entries // len(points))
+    max_sq_distance = 0.0
+    for i in range(0, len(points), chunk):
+        vdiff = np.abs(points[i:][None, :, :] - points[i:i + chunk][:, None, :])
+        vdiff = np.where(vdiff < 0.5, vdiff, 1 - vdiff)
+        max_sq_distance = max(max_sq_distance, (vdiff ** 2).sum(axis=2).max())
+    return max_sq_distance ** 0.5
@@ -0,0 +1,181 @@
+"""
+Pore geometry from the Voronoi network of a periodic framework, in the manner of Zeo++.
+
+The Voronoi diagram of the atom centers and their 26 periodic images is built with scipy. Its
+vertices inside the unit cell are the nodes of the pore network, and the Voronoi edges between them
+are its channels; an edge that leaves the unit cell is followed to the periodic image of the node it
+reaches, and keeps the unit cell offset it crosses. Each node has a radius, its distance to the
+nearest atom surface, and each edge a bottleneck radius, the smallest distance to the surfaces of
+the atoms around it along the edge.
+
+- The largest cavity diameter is twice the largest node radius.
+- The pore limiting diameter is twice the largest bottleneck radius at which the network still
+  percolates through the periodic cell. Edges are added from the widest bottleneck down to a
+  union-find that tracks each node's unit cell offset from its root; percolation starts at the first
+  edge that closes a loop with a nonzero net offset.
+- The accessible volume fraction for a probe is the fraction of random points where the probe center
+  fits (at least the probe radius from every atom surface) and whose nearest node belongs to a part
+  of the network that percolates for the probe.
+
+Atoms have radius sigma / 2, as for the geometric void fraction. The diagram is not weighted by the
+atom radii, so with very different radii the network is approximate.
+"""
+
+import itertools
+
+import numpy as np
+from scipy.spatial import Voronoi, cKDTree
+
+class PeriodicUnionFind:
+    """union-find over nodes of a periodic network, tracking the unit cell offset of each node from
+    the root of its set."""
+
+    def __init__(self, num_nodes):
+        self.parent = list(range(num_nodes))
+        self.offset = [np.zeros(3, dtype=np.int64) for _ in range(num_nodes)]
+        self.percolates = [False] * num_nodes
+
+    def find(self, u):
+        """returns the root of u and the offset of u from it, compressing the path to the root."""
+        path = []
+        root = u
+        while self.parent[root] != root:
+            path.append(root)
+            root = self.parent[root]
+        offset = np.zeros(3, dtype=np.int64)
+        for node in reversed(path):
+            offset = offset + self.offset[node]
+            self.offset[node] = offset
+            self.parent[node] = root
+        return root, (self.offset[u] if u != root else np.zeros(3, dtype=np.int64))
+
+    def union(self, u, v, shift):
+        """joins u with v, where v is reached from u by crossing shift unit cells. Returns whether
+        the set of u and v percolates afterwards."""
+        root_u, offset_u = self.find(u)
+        root_v, offset_v = self.find(v)
+        if root_u == root_v:
+            if (offset_u + shift - offset_v).any():
+                self.percolates[root_u] = True
+        else:
+            self.parent[root_v] = root_u
+            self.offset[root_v] = offset_u + shift - offset_v
+            self.percolates[root_u] = self.percolates[root_u] or self.percolates[root_v]
+        return self.percolates[root_u]
+
+def surface_distances(points, centers, radii, box, max_chunk_entries=2**22):
+    """returns the distance from each point to the nearest atom surface, with periodic images."""
+    distances = np.empty(len(points))
+    chunk = max(1, max_chunk_entries // max(len(centers), 1))
+    for i in range(0, len(points), chunk):
+        delta = np.abs(points[i:i + chunk, None, :] - centers[None, :, :]) % box
+        delta = np.minimum(delta, box - delta)
+        distances[i:i + chunk] = (np.sqrt((delta ** 2).sum(axis=2)) - radii).min(axis=1)
+    return distances
+
+class PoreNetwork:
+    def __init__(self, atoms, box):
+        """atoms: an array of tuples (x, y, z, d) of atom coordinates and diameters, as for
+        calculate_void_fraction. box: the lengths (a, b, c) of the box."""
+        self.box = np.array(box, dtype=float)
+        atoms = np.array(atoms, dtype=float).reshape(-1, 4)
+        self.centers = atoms[:, :3] % self.box
+        self.radii = atoms[:, 3] / 2
+
+        shifts = np.array(list(itertools.product([-1, 0, 1], repeat=3)))
+        images = (self.centers[None, :, :] + shifts[:, None, :] * self.box).reshape(-1, 3)
+        voronoi = Voronoi(images)
+        vertices = voronoi.vertices
+
+        # nodes are the vertices in the unit cell; every other vertex is the periodic image of one
+        vertex_offsets = np.floor(vertices / self.box + 1e-9).astype(np.int64)
+        central = np.flatnonzero((vertex_offsets == 0).all(axis=1))
+        self.nodes = self._wrap(vertices[central])
+        self.node_radii = surface_distances(self.nodes, self.centers, self.radii, self.box)
+        self._node_tree = cKDTree(self.nodes, boxsize=self.box)
+        self.edges, self.edge_shifts, self.edge_radii = self._edges(voronoi, vertex_offsets,
+                                                                    set(central.tolist()), images)
+
+    def _wrap(self, points):
+        wrapped = points % self.box
+        return np.where(wrapped >= self.box, 0.0, wrapped)
+
+    def _edges(self, voronoi, vertex_offsets, central, images):
+        """the (u, v) node pairs, unit cell shifts and bottleneck radii of the edges that touch the
+        unit cell, from the Voronoi ridges."""
+        n = len(self.centers)
+        pairs, ridge_atoms = [], []
+        for (a1, a2), ridge in zip(voronoi.ridge_points, voronoi.ridge_vertices):
+            if -1 in ridge:
+                continue
+            for v1, v2 in zip(ridge, ridge[1:] + ridge[:1]):
+                if v1 in central or v2 in central:
+                    pairs.append((min(v1, v2), max(v1, v2)))
+                    ridge_atoms.append((a1, a2))
+        if len(pairs) == 0:
+            return np.zeros((0, 2), dtype=np.int64), np.zeros((0, 3), dtype=np.int64), np.zeros(0)
+        pairs, ridge_atoms = np.array(pairs), np.array(ridge_atoms)
+
+        # bottleneck: the closest approach of the edge to the surface of an atom of its ridges
+        start, end = voronoi.vertices[pairs[:, 0]], voronoi.vertices[pairs[:, 1]]
+        along = end - start
+        length2 = np.maximum((along ** 2).sum(axis=1), 1e-24)
+        radii = np.full(len(pairs), np.inf)
+        for k in range(2):
+            center = images[ridge_atoms[:, k]]
+            t = np.clip(((center - start) * along).sum(axis=1) / length2, 0.0, 1.0)
+            closest = start + t[:, None] * along
+            radii = np.minimum(radii, np.linalg.norm(closest - center, axis=1) - self.radii[ridge_atoms[:, k] % n])
+
+        # the same edge is on several ridges; it is as narrow as the narrowest
+        unique_pairs, inverse = np.unique(pairs, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        edge_radii = np.full(len(unique_pairs), np.inf)
+        np.minimum.at(edge_radii, inverse, radii)
+
+        # map both ends to nodes, and keep the unit cell shift from the first to the second
+        distances, ends = self._node_tree.query(self._wrap(voronoi.vertices[unique_pairs.reshape(-1)]))
+        ends = ends.reshape(-1, 2)
+        found = (distances.reshape(-1, 2) < 1e-6).all(axis=1)
+        shifts = vertex_offsets[unique_pairs[:, 1]] - vertex_offsets[unique_pairs[:, 0]]
+        return ends[found], shifts[found], edge_radii[found]
+
+    @property
+    def largest_cavity_diameter(self):
+        return 2 * max(self.node_radii.max(initial=0.0), 0.0)
+
+    @property
+    def pore_limiting_diameter(self):
+        union_find = PeriodicUnionFind(len(self.nodes))
+        for i in np.argsort(-self.edge_radii, kind="stable"):
+            if self.edge_radii[i] <= 0:
+                break
+            u, v = self.edges[i]
+            if union_find.union(u, v, self.edge_shifts[i]):
+                return 2 * self.edge_radii[i]
+        return 0.0
+
+    def accessible_nodes(self, probe_r):
+        """returns whether each node is part of the network that percolates for a probe of radius
+        probe_r."""
+        union_find = PeriodicUnionFind(len(self.nodes))
+        for i in np.flatnonzero(self.edge_radii >= probe_r):
+            u, v = self.edges[i]
+            union_find.union(u, v, self.edge_shifts[i])
+        roots = [union_find.find(u)[0] for u in range(len(self.nodes))]
+        return np.array([union_find.percolates[root] for root in roots], dtype=bool) & (self.node_radii >= probe_r)
+
+    def accessible_volume_fraction(self, probe_r, num_points=5000, rng=np.random):
+        points = rng.random_sample((num_points, 3)) * self.box
+        fits = surface_distances(points, self.centers, self.radii, self.box) >= probe_r
+        _, nearest = self._node_tree.query(self._wrap(points[fits]))
+        return np.count_nonzero(self.accessible_nodes(probe_r)[nearest]) / num_points
+
+def calculate_pore_geometry(atoms, box, probe_r=0.0, num_points=5000, rng=np.random):
+    """returns (accessible volume fraction, largest cavity diameter, pore limiting diameter) of a
+    framework; atoms and box are as for calculate_void_fraction."""
+    if len(atoms) == 0:
+        return 1.0, None, None
+    network = PoreNetwork(atoms, box)
+    return (network.accessible_volume_fraction(probe_r, num_points, rng),
+            network.largest_cavity_diameter, network.pore_limiting_diameter)
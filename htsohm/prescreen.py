@@ -0,0 +1,155 @@
+"""
+Pre-screening of children before they are simulated.
+
+When the prescreen config option is on, children are generated in the coordinator instead of the
+workers. A k-nearest-neighbors regressor, trained online on the structural descriptors and simulated
+properties of every material completed so far, predicts where each child will land. Children
+predicted to land in bins that already hold prescreen_saturation materials are dropped, and their
+slots are refilled with children of newly selected parents, so the simulation time goes to children
+that are more likely to find new bins.
+
+Screening only starts once prescreen_min_training materials have been seen. At most
+prescreen_max_attempts children are tried for each slot; the last one is kept whatever its
+prediction, so a generation always fills up. Once prescreen_max_rejection of the children screened in
+a generation are predicted saturated, screening stops until the next generation.
+
+The model is trained on the last prescreen_window materials only, and is refit in batches, so the
+cost of screening stays bounded as the run grows.
+"""
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from htsohm.bins import calc_bin_indices, flat_bin_ids
+from htsohm.properties import property_ranges
+
+def descriptors(material):
+    """cheap structural descriptors of a material dict: lattice constants, number density, epsilon
+    density, and the mean, spread and extremes of sigma and epsilon over the atom sites."""
+    s = material["structure"]
+    volume = s["a"] * s["b"] * s["c"]
+    site_types = np.array([s["atom_types"][site[0]] for site in s["atom_sites"]]).reshape(-1, 2)
+    if len(site_types) == 0:
+        site_types = np.zeros((1, 2))
+    sigmas, epsilons = site_types[:, 0], site_types[:, 1]
+    return np.array([s["a"], s["b"], s["c"],
+                     len(s["atom_sites"]) / volume, epsilons.sum() / volume,
+                     sigmas.mean(), sigmas.std(), sigmas.min(), sigmas.max(),
+                     epsilons.mean(), epsilons.std(), epsilons.min(), epsilons.max()])
+
+class Prescreen:
+    # children screened in a generation before its rejection rate is trusted to stop screening
+    min_screened_for_rate = 20
+
+    def __init__(self, config):
+        self.num_bins = config['number_of_convergence_bins']
+        self.ranges = property_ranges(config['properties'])
+        self.num_neighbors = config['prescreen_neighbors']
+        self.min_training = config['prescreen_min_training']
+        self.saturation = config['prescreen_saturation']
+        self.max_attempts = config['prescreen_max_attempts']
+        self.window = config['prescreen_window']
+        self.max_rejection = config['prescreen_max_rejection']
+
+        # set by htsohm_run once the bins exist: the BinGrid of the run, and a function that returns
+        # n newly selected parent material dicts (or Nones, for generators without parents)
+        self.bin_grid = None
+        self.select_parents = None
+
+        # training rows: the (windowed) rows the model was last fit on, and the rows added since
+        self._x = np.zeros((0, 0))
+        self._y = np.zeros((0, 0))
+        self._new_x = []
+        self._new_y = []
+        self._training = None
+        self.num_fits = 0
+
+        self.num_screened = 0
+        self.num_rejected = 0
+        self.num_replaced = 0
+        self._generation_counts = (0, 0, 0)
+        self.stopped = False
+
+    def __len__(self):
+        return len(self._x) + sum(len(x) for x in self._new_x)
+
+    def add(self, materials, points):
+        """adds simulated materials (as material dicts) and their property points to the training
+        set. Only the last prescreen_window materials are kept."""
+        if len(materials) == 0:
+            return
+        self._new_x.append(np.array([descriptors(m) for m in materials]))
+        self._new_y.append(np.array(points, dtype=float).reshape(len(materials), -1))
+
+    def _fit(self):
+        """standardizes the training rows and builds a KD-tree of them. Refits are batched: the model
+        is only refit once the rows added since the last fit outnumber an eighth of the fitted ones."""
+        num_new = sum(len(x) for x in self._new_x)
+        if self._training is None or num_new > len(self._x) // 8:
+            x = np.concatenate(([self._x] if len(self._x) else []) + self._new_x)[-self.window:]
+            y = np.concatenate(([self._y] if len(self._y) else []) + self._new_y)[-self.window:]
+            self._x, self._y, self._new_x, self._new_y = x, y, [], []
+            mean, std = x.mean(axis=0), x.std(axis=0)
+            std[std == 0] = 1.0
+            self._training = (cKDTree((x - mean) / std), y, mean, std)
+            self.num_fits += 1
+        return self._training
+
+    def predict(self, materials):
+        """predicts the property points of material dicts as the mean of the points of their
+        nearest neighbors in (standardized) descriptor space."""
+        tree, y, mean, std = self._fit()
+        queries = (np.array([descriptors(m) for m in materials]) - mean) / std
+        k = min(self.num_neighbors, len(y))
+        _, nearest = tree.query(queries, k=k)
+        return y[np.asarray(nearest).reshape(len(queries), k)].mean(axis=1)
+
+    def saturated(self, materials):
+        """returns whether each material dict is predicted to land in a saturated bin."""
+        if self.bin_grid is None or len(self) < self.min_training:
+            return np.zeros(len(materials), dtype=bool)
+        bin_ids = flat_bin_ids(calc_bin_indices(self.predict(materials), self.ranges, self.num_bins),
+                               self.num_bins)
+        return np.array([self.bin_grid.counts.get(b, 0) >= self.saturation for b in bin_ids.tolist()],
+                        dtype=bool)
+
+    def generation_counts(self):
+        """returns (screened, rejected, replaced) since the last call, and starts counting the next
+        generation, with screening turned back on."""
+        totals = (self.num_screened, self.num_rejected, self.num_replaced)
+        counts = tuple(t - c for t, c in zip(totals, self._generation_counts))
+        self._generation_counts = totals
+        self.stopped = False
+        return counts
+
+    def _check_rejection_rate(self):
+        """stops screening for the rest of the generation once nearly every screened child is
+        predicted to land in a saturated bin: the model can't tell the children apart then, and
+        replacing them just costs generating and screening more."""
+        screened = self.num_screened - self._generation_counts[0]
+        rejected = self.num_rejected - self._generation_counts[1]
+        if screened >= self.min_screened_for_rate and rejected >= self.max_rejection * screened:
+            self.stopped = True
+
+    def screen(self, generate, parents):
+        """generates one child per parent with generate(parent), which returns (child, log), and
+        replaces the children predicted to land in saturated bins with children of new parents. A
+        child still predicted saturated on the last of max_attempts is kept.
+
+        Returns a list of (child, parent, log) for the children to simulate."""
+        slots = [(generate(parent), parent) for parent in parents]
+        pending = list(range(len(slots)))
+        for attempt in range(self.max_attempts):
+            if len(pending) == 0 or self.stopped:
+                break
+            rejected = self.saturated([slots[i][0][0] for i in pending])
+            self.num_screened += len(pending)
+            self.num_rejected += int(rejected.sum())
+            self._check_rejection_rate()
+            pending = [i for i, r in zip(pending, rejected) if r]
+            if attempt == self.max_attempts - 1 or self.stopped:
+                break
+            self.num_replaced += len(pending)
+            for i, parent in zip(pending, self.select_parents(len(pending))):
+                slots[i] = (generate(parent), parent)
+        return [(child, parent, log) for (child, log), parent in slots]
@@ -0,0 +1,83 @@
+"""
+The properties that span the space being explored.
+
+Each property is a column of one of the simulation result tables, configured as:
+
+    properties:
+      - {table: void_fraction, column: void_fraction_geo, range: [0.0, 1.0]}
+      - {table: gas_loading, column: absolute_volumetric_loading, range: [0.0, 400.0], adsorbate: methane}
+      - {table: surface_area, column: volumetric_surface_area, range: [0.0, 4000.0]}
+
+adsorbate is optional; without it the first row of the table for a material is used, as
+material.void_fraction[0] does. Configs without properties explore prop1range of the void fraction
+(column set by void_fraction_subtype) and prop2range of the absolute volumetric loading.
+"""
+
+import numpy as np
+from sqlalchemy import select
+
+from htsohm.db import Material
+from htsohm.db.bulk import property_tables, property_columns
+
+def default_properties(config):
+    if config['void_fraction_subtype'] in ["geo", "zeo"]:
+        void_fraction_column = "void_fraction_" + config['void_fraction_subtype']
+    else:
+        void_fraction_column = "void_fraction"
+    return [{"table": "void_fraction", "column": void_fraction_column, "range": config['prop1range']},
+            {"table": "gas_loading", "column": "absolute_volumetric_loading", "range": config['prop2range']}]
+
+def check_properties(properties):
+    for prop in properties:
+        if prop.get("table") not in property_tables:
+            raise(Exception("ERROR: property table must be one of %s: %s" % (list(property_tables), prop)))
+        if prop.get("column") not in property_columns(property_tables[prop["table"]]):
+            raise(Exception("ERROR: property column is not in table %s: %s" % (prop["table"], prop)))
+        if len(prop.get("range", [])) != 2:
+            raise(Exception("ERROR: property range must be [lower, upper]: %s" % prop))
+
+def property_ranges(properties):
+    return [tuple(prop["range"]) for prop in properties]
+
+def property_value(material, prop):
+    """returns the value of one property from a material dict (see htsohm.db.bulk)."""
+    rows = material[prop["table"]]
+    if "adsorbate" in prop:
+        rows = [row for row in rows if row["adsorbate"] == prop["adsorbate"]]
+    return rows[0][prop["column"]]
+
+def material_properties(material, properties):
+    """returns the point of a material dict in the property space."""
+    return tuple(property_value(material, prop) for prop in properties)
+
+def load_properties(session, properties, max_generation):
+    """loads the ids and property points of all materials up to max_generation, ordered by id, as
+    NumPy arrays.
+
+    Uses a single join with one aliased result table per property. When a material has several
+    matching rows in a table, the first one is used. Raises an exception if any material is missing
+    a property, rather than leaving it out."""
+    mt = Material.__table__
+    joined = mt
+    columns, order = [mt.c.id], [mt.c.id]
+    for i, prop in enumerate(properties):
+        t = property_tables[prop["table"]].__table__.alias("p%d" % i)
+        on = t.c.material_id == mt.c.id
+        if "adsorbate" in prop:
+            on = on & (t.c.adsorbate == prop["adsorbate"])
+        joined = joined.outerjoin(t, on)
+        columns.append(t.c[prop["column"]])
+        order.append(t.c.id)
+
+    query = select(*columns).select_from(joined).where(mt.c.generation <= max_generation).order_by(*order)
+    rows = np.array(session.execute(query).fetchall(), dtype=float).reshape(-1, len(columns))
+
+    _, first_rows = np.unique(rows[:, 0], return_index=True)
+    box_d, box_r = rows[first_rows, 0].astype(int), rows[first_rows, 1:]
+
+    missing = np.isnan(box_r).any(axis=1)
+    if missing.any():
+        raise(Exception("ERROR: %d materials are missing a property value (%s), e.g. materials %s" %
+                        (missing.sum(), ", ".join(prop["column"] for prop in properties),
+                         box_d[missing][:10].tolist())))
+    return box_d, box_r
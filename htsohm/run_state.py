@@ -0,0 +1,216 @@
+"""
+Append-only run state: material ids, material properties and bin ids, kept in memory-mapped files.
+
+Each generation only appends its new rows to the files and rewrites a small state.json, so the cost
+of saving the run state no longer grows with the number of materials. The files are grown in
+chunks and can be compacted to their exact size.
+
+state.json records how many rows are valid and a rolling CRC-32 of each file's valid rows, so a
+truncated or damaged state is detected when it is opened. Because the files are append-only, any
+earlier state is a prefix of the current one; snapshots (e.g. at benchmarks) just record the length
+and checksums at that generation and can be reopened later.
+"""
+
+import json
+import os
+import zlib
+
+import numpy as np
+
+class AppendArray:
+    """growable array backed by a memory-mapped file. Rows are appended in place."""
+
+    def __init__(self, path, dtype, row_shape=()):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.row_shape = tuple(row_shape)
+        self.row_bytes = self.dtype.itemsize * int(np.prod(self.row_shape, dtype=int))
+        self.length = 0
+        self.crc = 0
+        if not os.path.exists(path):
+            open(path, "wb").close()
+        self._map()
+
+    def _map(self):
+        capacity = os.path.getsize(self.path) // self.row_bytes
+        if capacity > 0:
+            self._mm = np.memmap(self.path, dtype=self.dtype, mode="r+", shape=(capacity, *self.row_shape))
+        else:
+            self._mm = np.empty((0, *self.row_shape), dtype=self.dtype)
+
+    def _resize(self, capacity):
+        if isinstance(self._mm, np.memmap):
+            self._mm.flush()
+        del self._mm
+        with open(self.path, "r+b") as f:
+            f.truncate(capacity * self.row_bytes)
+        self._map()
+
+    @property
+    def capacity(self):
+        return len(self._mm)
+
+    @property
+    def data(self):
+        return self._mm[:self.length]
+
+    def append(self, rows):
+        rows = np.ascontiguousarray(rows, dtype=self.dtype).reshape(-1, *self.row_shape)
+        new_length = self.length + len(rows)
+        if new_length > self.capacity:
+            self._resize(max(new_length, 2 * self.capacity, 1024))
+        self._mm[self.length:new_length] = rows
+        self.crc = zlib.crc32(rows.tobytes(), self.crc)
+        self.length = new_length
+
+    def flush(self):
+        if isinstance(self._mm, np.memmap):
+            self._mm.flush()
+
+    def compact(self):
+        """shrinks the file to the rows that are in use."""
+        self._resize(self.length)
+
+    def checksum(self, length, chunk_rows=2**20):
+        if length * self.row_bytes > os.path.getsize(self.path):
+            return None
+        crc = 0
+        for i in range(0, length, chunk_rows):
+            crc = zlib.crc32(np.ascontiguousarray(self._mm[i:min(i + chunk_rows, length)]).tobytes(), crc)
+        return crc
+
+class RunState:
+    files = {"box_d": np.int64, "box_r": np.float64, "bin_ids": np.int64}
+
+    def __init__(self, path, num_properties):
+        self.path = path
+        self.num_properties = num_properties
+        self.generation = 0
+        self.snapshots = {}
+        self.arrays = {
+            "box_d": AppendArray(os.path.join(path, "box_d.bin"), np.int64),
+            "box_r": AppendArray(os.path.join(path, "box_r.bin"), np.float64, (num_properties,)),
+            "bin_ids": AppendArray(os.path.join(path, "bin_ids.bin"), np.int64),
+        }
+
+    @classmethod
+    def create(cls, path, num_properties):
+        """creates an empty run state at path, replacing any run state already there. Nothing is
+        recorded in state.json until the first commit."""
+        os.makedirs(path, exist_ok=True)
+        for name in cls.files:
+            open(os.path.join(path, "%s.bin" % name), "wb").close()
+        return cls(path, num_properties)
+
+    @classmethod
+    def open(cls, path, generation=None):
+        """opens the run state at path, as of the last commit or of the snapshot taken when
+        generation was completed. Anything appended afterwards is overwritten by new appends.
+
+        Raises an exception if any of the files are shorter than recorded or their checksums do not
+        match."""
+        with open(os.path.join(path, "state.json")) as f:
+            meta = json.load(f)
+
+        state = cls(path, meta["num_properties"])
+        state.snapshots = {int(g): s for g, s in meta["snapshots"].items()}
+        if generation is None:
+            commit = meta
+        elif generation in state.snapshots:
+            commit = state.snapshots[generation]
+            state.snapshots = {g: s for g, s in state.snapshots.items() if g <= generation}
+        else:
+            raise(Exception("ERROR: no snapshot for generation %d in run state %s; snapshots: %s" %
+                            (generation, path, sorted(state.snapshots))))
+
+        for name, arr in state.arrays.items():
+            length, crc = commit["length"], commit["crc"][name]
+            if arr.checksum(length) != crc:
+                raise(Exception("ERROR: run state file %s is truncated or corrupt (expected %d rows "
+                                "with crc %d)" % (arr.path, length, crc)))
+            arr.length, arr.crc = length, crc
+
+        state.generation = commit["generation"]
+        return state
+
+    @classmethod
+    def reopen_or_create(cls, path, box_d, box_r, bin_ids, generation):
+        """returns a run state at path holding exactly the given rows, committed as of generation,
+        for restarts from the database or a restart file.
+
+        If the run state already at path is intact and its committed rows start with the given
+        ones, it is reopened and cut back to them, keeping its snapshots up to generation.
+        Otherwise a new run state is created in its place."""
+        box_r = np.asarray(box_r, dtype=np.float64).reshape(len(box_d), -1)
+        state = None
+        if os.path.exists(os.path.join(path, "state.json")):
+            try:
+                state = cls.open(path)
+            except Exception as e:
+                print("WARNING: cannot reopen run state %s: %s" % (path, e))
+            n = len(box_d)
+            if state is not None and not (state.num_properties == box_r.shape[1] and state.length >= n and
+                                          np.array_equal(state.box_d[:n], box_d) and
+                                          np.array_equal(state.box_r[:n], box_r) and
+                                          np.array_equal(state.bin_ids[:n], bin_ids)):
+                print("WARNING: run state %s does not match the restart; creating a new one" % path)
+                state = None
+
+        if state is None:
+            state = cls.create(path, box_r.shape[1])
+            state.append(box_d, box_r, bin_ids)
+        else:
+            state.truncate(len(box_d))
+            state.snapshots = {g: s for g, s in state.snapshots.items()
+                               if g <= generation and s["length"] <= len(box_d)}
+        state.commit(generation)
+        return state
+
+    def truncate(self, length):
+        """drops every row after the first length rows; they are overwritten by new appends."""
+        for arr in self.arrays.values():
+            arr.length, arr.crc = length, arr.checksum(length)
+
+    @property
+    def length(self):
+        return self.arrays["box_d"].length
+
+    @property
+    def box_d(self):
+        return self.arrays["box_d"].data
+
+    @property
+    def box_r(self):
+        return self.arrays["box_r"].data
+
+    @property
+    def bin_ids(self):
+        return self.arrays["bin_ids"].data
+
+    def append(self, box_d, box_r, bin_ids):
+        self.arrays["box_d"].append(box_d)
+        self.arrays["box_r"].append(box_r)
+        self.arrays["bin_ids"].append(bin_ids)
+
+    def _commit_record(self):
+        return {"generation": self.generation, "length": self.length,
+                "crc": {name: arr.crc for name, arr in self.arrays.items()}}
+
+    def commit(self, generation, snapshot=False):
+        """flushes the appended rows to disk and records them in state.json. generation is the last
+        generation that has been completed; a restart from this state starts at the next one."""
+        self.generation = generation
+        for arr in self.arrays.values():
+            arr.flush()
+        if snapshot:
+            self.snapshots[generation] = self._commit_record()
+
+        meta = dict(self._commit_record(), num_properties=self.num_properties, snapshots=self.snapshots)
+        state_path = os.path.join(self.path, "state.json")
+        with open(state_path + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(state_path + ".tmp", state_path)
+
+    def compact(self):
+        for arr in self.arrays.values():
+            arr.compact()
@@ -3,26 +3,28 @@ from itertools import product
 import numpy as np
 from numpy.random import choice
 
-def choose_parents(num_parents, box_d, box_range, bin_materials, r=1):
-    all_parent_bins = [coords for coords, mats in np.ndenumerate(bin_materials) if len(mats) > 0]
+def bins_with_empty_neighbors(bin_grid, r=1):
+    """flat ids of the occupied bins that have at least one empty bin within r bins along every
+    axis. Bins past the edges of the grid do not count as empty.
 
-    imax = len(bin_materials)
-    jmax = len(bin_materials[0])
+    Only the neighbors of occupied bins are looked at, so this works on grids with any number of
+    axes without building the dense grid."""
+    occupied = bin_grid.occupied()
+    shape = np.array(bin_grid.shape)
+    coords = np.stack(np.unravel_index(occupied, bin_grid.shape), axis=1)
 
-    eligible_parent_bins = []
-    for coords in all_parent_bins:
-        ci, cj = coords
-        ilo = max(ci - r, 0)
-        ihi = min(ci + r, imax - 1)
-        jlo = max(cj - r, 0)
-        jhi = min(cj + r, jmax - 1)
-        neighbor_count = 0
-        for i,j in product(range(ilo, ihi + 1), range(jlo, jhi + 1)):
-            if len(bin_materials[i][j]) == 0:
-                eligible_parent_bins.append(coords)
-                break
+    eligible = np.zeros(len(occupied), dtype=bool)
+    for offset in product(range(-r, r + 1), repeat=len(shape)):
+        neighbors = coords + offset
+        inside = np.flatnonzero(((neighbors >= 0) & (neighbors < shape)).all(axis=1))
+        neighbor_ids = np.ravel_multi_index(tuple(neighbors[inside].T), bin_grid.shape)
+        eligible[inside[~bin_grid.is_occupied(neighbor_ids)]] = True
+    return occupied[eligible]
 
-    parent_bins = choice(np.array(eligible_parent_bins, "i,i"), num_parents)
-    parent_indices = [choice(bin_materials[bin[0]][bin[1]], 1)[0] for bin in parent_bins]
+def choose_parents(num_parents, box_d, box_range, bin_grid, r=1):
+    eligible_parent_bins = bins_with_empty_neighbors(bin_grid, r)
+
+    parent_bins = choice(eligible_parent_bins, num_parents)
+    parent_indices = bin_grid.sample(parent_bins)
 
     return [box_d[i] for i in parent_indices], [box_range[i] for i in parent_indices]
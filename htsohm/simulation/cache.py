@@ -0,0 +1,79 @@
+"""
+Reuse of the simulation results of materials with the same structure hash (see
+htsohm.structure_hash), from a database opened read-only: the run's own database by default, or the
+simulation_cache_db of the config, e.g. the database of an earlier run with the same simulations.
+
+Lookups happen in the coordinator, before a child is dispatched, so workers never touch a
+database; children found in the cache are not dispatched at all. Only materials already inserted by
+the coordinator can be found, so within a run a material is reused from the next time its results
+are needed after its generation (or, in steady state, after it completed).
+"""
+
+from sqlalchemy import create_engine, inspect, select
+
+from htsohm.db import Material
+from htsohm.db.bulk import property_tables, property_columns, material_from_dict
+from htsohm.structure_hash import structure_hash
+
+# top-level config keys that change the results of the simulations: the energy grid spacing of the
+# native engines, and the bins the default Monte Carlo void fraction tolerance is derived from
+result_config_keys = ["energy_grid_spacing", "number_of_convergence_bins", "properties"]
+
+_engines = {}
+
+def read_only_connection_string(connection_string):
+    if connection_string.startswith("sqlite:///") and not connection_string.startswith("sqlite:///file:"):
+        return "sqlite:///file:%s?mode=ro&uri=true" % connection_string[10:]
+    return connection_string
+
+def cache_engine(config):
+    """the engine for the cache database; one per process and database."""
+    connection_string = config['simulation_cache_db'] or config['database_connection_string']
+    if connection_string not in _engines:
+        _engines[connection_string] = create_engine(read_only_connection_string(connection_string))
+    return _engines[connection_string]
+
+def has_structure_hashes(engine):
+    """whether the materials table has the structure_hash column. A cache database last opened for
+    writing by an older version does not, and has no hashes to find; it is never upgraded here,
+    since it is opened read-only."""
+    if not hasattr(engine, "_has_structure_hashes"):
+        engine._has_structure_hashes = "structure_hash" in [col["name"] for col in inspect(engine).get_columns("materials")]
+    return engine._has_structure_hashes
+
+def simulation_hash(structure, config):
+    """the structure hash of a structure simulated with config: the simulations and the top-level
+    keys in result_config_keys are hashed along with the structure."""
+    settings = {"simulations": config["simulations"]}
+    settings.update({key: config.get(key) for key in result_config_keys})
+    return structure_hash(structure, settings, config.get("structure_hash_digits", 6))
+
+def reuse_cached_results(material, config):
+    """sets the structure hash of a material dict and, if a material with the same hash already has
+    results, copies them into the dict. Returns the uuid of that material, or None if there is none."""
+    material["structure_hash"] = simulation_hash(material_from_dict(material).structure, config)
+    cached = cached_results(cache_engine(config), material["structure_hash"])
+    if cached is None:
+        return None
+    uuid, results = cached
+    material.update(results)
+    return uuid
+
+def cached_results(engine, structure_hash):
+    """returns the uuid and property rows (as in a material dict) of the first material with the
+    given structure hash that has any results, or None if there is none."""
+    if not has_structure_hashes(engine):
+        return None
+    mt = Material.__table__
+    with engine.connect() as conn:
+        for material_id, uuid in conn.execute(select(mt.c.id, mt.c.uuid).where(
+                mt.c.structure_hash == structure_hash).order_by(mt.c.id)):
+            results = {}
+            for name, cls in property_tables.items():
+                cols = property_columns(cls)
+                t = cls.__table__
+                results[name] = [{col: r._mapping[col] for col in cols}
+                                 for r in conn.execute(select(t).where(t.c.material_id == material_id).order_by(t.c.id))]
+            if any(len(rows) > 0 for rows in results.values()):
+                return uuid, results
+    return None
@@ -0,0 +1,110 @@
+"""
+Tabulated framework-guest energies, shared by all native simulations of a material.
+
+The energy of a guest is computed once on a regular grid over the unit cell, and looked up with
+periodic trilinear interpolation. Grids are kept in memory in the worker for the most recently
+simulated materials, so the void fraction, gas loading and any restarts of a material all use the
+same grid, and can also be cached as .npy files, keyed by material uuid and forcefield.
+
+Energies are capped at max_energy before tabulating, so interpolating next to an atom core does
+not blow up; at the default cap the Boltzmann weight is zero either way.
+"""
+
+from collections import OrderedDict
+import itertools
+import os
+
+import numpy as np
+
+from htsohm.simulation.native.forcefield import LJFramework
+
+max_energy = 1e5 # K
+
+# energy grids of the most recently simulated materials, by cache key
+_grids = OrderedDict()
+max_cached_grids = 4
+
+class EnergyGrid:
+    def __init__(self, framework, spacing, values=None, block_size=8):
+        """tabulates the energies(points) of an LJFramework on a grid over its unit cell with about
+        spacing angstroms between grid points. values: previously tabulated values, to reuse.
+
+        The grid is filled in blocks of block_size ** 3 points, each computed only with the atoms
+        within the cutoff of some point of the block."""
+        self.framework = framework
+        self.cell = framework.cell
+        self.shape = tuple(int(np.ceil(length / spacing)) for length in self.cell)
+
+        if values is None:
+            axes = [np.arange(n) * length / n for n, length in zip(self.shape, self.cell)]
+            values = np.empty(self.shape)
+            for block in itertools.product(*(range(0, n, block_size) for n in self.shape)):
+                block = tuple(slice(start, start + block_size) for start in block)
+                points = np.stack(np.meshgrid(*(axis[b] for axis, b in zip(axes, block)), indexing="ij"), axis=-1)
+                lower, upper = points.reshape(-1, 3).min(axis=0), points.reshape(-1, 3).max(axis=0)
+                atoms = framework.atoms_within((lower + upper) / 2, framework.cutoff + np.linalg.norm(upper - lower) / 2)
+                values[block] = framework.energies(points.reshape(-1, 3), atoms).reshape(points.shape[:3])
+            np.minimum(values, max_energy, out=values)
+        self.values = values
+
+    # the grid stands in for the framework, so simulations use whichever they are given
+    @property
+    def box(self):
+        return self.framework.box
+
+    @property
+    def cutoff(self):
+        return self.framework.cutoff
+
+    @property
+    def guest_epsilon(self):
+        return self.framework.guest_epsilon
+
+    @property
+    def guest_sigma(self):
+        return self.framework.guest_sigma
+
+    def energies(self, points):
+        """returns the interpolated guest-framework energy at each of an (m, 3) array of cartesian
+        points, anywhere in space."""
+        scaled = np.asarray(points, dtype=float).reshape(-1, 3) / self.cell * self.shape
+        lower = np.floor(scaled)
+        t = (scaled - lower)[:, None, :]
+
+        # the 8 grid points around each point, as flat indices, and their trilinear weights
+        corners = (lower.astype(np.int64)[:, None, :] + _corners) % self.shape
+        flat = corners @ np.array([self.shape[1] * self.shape[2], self.shape[2], 1])
+        weights = np.where(_corners, t, 1 - t).prod(axis=2)
+        return (weights * self.values.reshape(-1)[flat]).sum(axis=1)
+
+_corners = np.array(list(np.ndindex(2, 2, 2)))[None, :, :]
+
+def material_framework(material, adsorbate, cutoff, config):
+    """returns what the native simulations use for the framework energies of a material: its
+    LJFramework, or, when energy_grid_spacing is set in config, an EnergyGrid of it. Grids are
+    reused from memory or, when energy_grid_cache_dir is set, from the cache directory."""
+    framework = LJFramework(material.structure, adsorbate, cutoff)
+    spacing = config.get('energy_grid_spacing', False)
+    if not spacing:
+        return framework
+
+    key = "%s_%s_%s_%s" % (material.uuid, adsorbate, cutoff, spacing)
+    if key in _grids:
+        _grids.move_to_end(key)
+        return _grids[key]
+
+    cache_dir = config.get('energy_grid_cache_dir', False)
+    cache_path = os.path.join(cache_dir, "%s.npy" % key) if cache_dir else None
+    if cache_path and os.path.exists(cache_path):
+        grid = EnergyGrid(framework, spacing, values=np.load(cache_path))
+    else:
+        grid = EnergyGrid(framework, spacing)
+        if cache_path:
+            os.makedirs(cache_dir, exist_ok=True)
+            np.save(cache_path + ".tmp.npy", grid.values)
+            os.replace(cache_path + ".tmp.npy", cache_path)
+
+    _grids[key] = grid
+    while len(_grids) > max_cached_grids:
+        _grids.popitem(last=False)
+    return grid
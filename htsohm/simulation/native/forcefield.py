@@ -0,0 +1,83 @@
+"""
+Lennard-Jones framework-guest energies for the native simulation engines.
+
+Matches the RASPA inputs written by htsohm.simulation.raspa: Lorentz-Berthelot mixing of the
+framework atom types with the guest pseudo atom, potentials shifted to zero at the cutoff, no tail
+corrections, and the framework repeated over the minimum_unit_cells supercell, with minimum-image
+distances in the supercell. Energies are in K, like the epsilons.
+"""
+
+import numpy as np
+
+from htsohm.simulation.raspa import adsorbate_LJ_atoms
+
+# molecules made of a single Lennard-Jones site, by RASPA molecule name
+single_site_molecules = {"helium": "He", "methane": "CH4_sp3", "krypton": "Kr", "xenon": "Xe"}
+
+# the first bead of multi-site molecules, which probes the surface area like RASPA's StartingBead 0
+starting_bead_atoms = dict(single_site_molecules, N2="N_n2", nitrogen="N_n2", CO2="C_co2")
+
+def probe_lj(adsorbate):
+    """returns (epsilon, sigma) of the bead of an adsorbate that probes the surface area."""
+    if adsorbate not in starting_bead_atoms:
+        raise(Exception("ERROR: the native surface area only supports adsorbates %s, not %s" %
+                        (list(starting_bead_atoms), adsorbate)))
+    [(epsilon, sigma)] = [(eps, sig) for name, eps, sig in adsorbate_LJ_atoms
+                          if name == starting_bead_atoms[adsorbate]]
+    return epsilon, sigma
+
+def guest_lj(adsorbate):
+    """returns (epsilon, sigma) of a single-site adsorbate."""
+    if adsorbate not in single_site_molecules:
+        raise(Exception("ERROR: the native engines only support single-site adsorbates %s, not %s" %
+                        (list(single_site_molecules), adsorbate)))
+    [(epsilon, sigma)] = [(eps, sig) for name, eps, sig in adsorbate_LJ_atoms
+                          if name == single_site_molecules[adsorbate]]
+    return epsilon, sigma
+
+class LJFramework:
+    def __init__(self, structure, adsorbate, cutoff):
+        self.cutoff = cutoff
+        unit_cells = structure.minimum_unit_cells(cutoff)
+        self.cell = cell = np.array([structure.a, structure.b, structure.c])
+        self.box = cell * unit_cells
+
+        self.guest_epsilon, self.guest_sigma = guest_epsilon, guest_sigma = guest_lj(adsorbate)
+        sites = [(s.x, s.y, s.z, s.atom_types.sigma, s.atom_types.epsilon) for s in structure.atom_sites]
+        sites = np.array(sites, dtype=float).reshape(-1, 5)
+        images = np.array(np.meshgrid(*(np.arange(n) for n in unit_cells), indexing="ij")).reshape(3, -1).T
+        self.coords = ((sites[None, :, :3] % 1.0 + images[:, None, :]) * cell).reshape(-1, 3)
+        self.sigma = np.tile((sites[:, 3] + guest_sigma) / 2, len(images))
+        self.epsilon = np.tile(np.sqrt(sites[:, 4] * guest_epsilon), len(images))
+
+        sr6 = (self.sigma / cutoff) ** 6
+        self.shift = 4 * self.epsilon * (sr6 ** 2 - sr6)
+
+    def atoms_within(self, point, r):
+        """indices of the supercell atoms closer than r to a point."""
+        d = np.abs(np.asarray(point, dtype=float) % self.box - self.coords)
+        d = np.minimum(d, self.box - d)
+        return np.flatnonzero((d ** 2).sum(axis=1) < r ** 2)
+
+    def energies(self, points, atoms=None, max_chunk_entries=2**20):
+        """returns the guest-framework energy at each of an (m, 3) array of cartesian points. atoms:
+        indices of the supercell atoms to include, if not all of them."""
+        points = np.asarray(points, dtype=float).reshape(-1, 3) % self.box
+        coords, sigma, epsilon, shift = self.coords, self.sigma, self.epsilon, self.shift
+        if atoms is not None:
+            coords, sigma, epsilon, shift = coords[atoms], sigma[atoms], epsilon[atoms], shift[atoms]
+
+        energies = np.zeros(len(points))
+        chunk = max(1, max_chunk_entries // max(len(coords), 1))
+        for i in range(0, len(points), chunk):
+            # minimum-image squared distances, one axis at a time; points and atoms are both in the box
+            r2 = np.zeros((len(points[i:i + chunk]), len(coords)))
+            for axis in range(3):
+                d = np.abs(points[i:i + chunk, axis, None] - coords[None, :, axis])
+                d = np.minimum(d, self.box[axis] - d)
+                r2 += d * d
+            np.maximum(r2, 1e-12, out=r2)
+            sr6 = (sigma ** 2 / r2) ** 3
+            u = 4 * epsilon * (sr6 ** 2 - sr6) - shift
+            energies[i:i + chunk] = np.where(r2 < self.cutoff ** 2, u, 0.0).sum(axis=1)
+        return energies
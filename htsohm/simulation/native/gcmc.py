@@ -0,0 +1,143 @@
+"""
+Grand canonical Monte Carlo of a single-site Lennard-Jones adsorbate in a rigid framework.
+
+Follows the RASPA gas loading simulation: translation, reinsertion and swap (insertion or deletion)
+moves with equal probability, max(20, N) moves per cycle, the pressure as the fugacity (ideal gas),
+and adsorbate-adsorbate interactions with the adsorbate's own shifted LJ potential within the same
+cutoff. The maximum translation is adjusted after every cycle towards 50% acceptance.
+
+Insertion and reinsertion positions do not depend on the state of the system, so they are drawn and
+their framework energies computed in batches. The framework energy of every adsorbed molecule is
+kept, so a move only needs the framework energy of its new position.
+"""
+
+import numpy as np
+
+boltzmann = 1.380649e-23 # J/K
+avogadro = 6.02214076e23 # 1/mol
+stp_molar_volume = 22414.0 # cm^3 (STP)/mol
+
+def molecules_uc_to_vv(unit_cell_volume):
+    """conversion factor from molecules / unit cell to cm^3 (STP) / cm^3, for a unit cell volume in
+    cubic angstroms."""
+    return stp_molar_volume / avogadro / (unit_cell_volume * 1e-24)
+
+class GCMC:
+    def __init__(self, framework, temperature, pressure, rng=np.random, batch_size=1000):
+        """framework: an LJFramework (or anything with its box, cutoff, guest parameters and
+        energies(points)). temperature in K and pressure in Pa."""
+        self.framework = framework
+        self.temperature = temperature
+        self.rng = rng
+        self.batch_size = batch_size
+
+        # beta * fugacity * volume of the supercell
+        self.beta_fv = pressure * np.prod(framework.box) * 1e-30 / (boltzmann * temperature)
+        self.positions = np.zeros((0, 3))
+        self.framework_energies = np.zeros(0)
+        self.max_displacement = 1.0
+
+        self._trials = np.zeros((0, 3))
+        self._trial_energies = np.zeros(0)
+
+        sr6 = (framework.guest_sigma / framework.cutoff) ** 6
+        self._guest_shift = 4 * framework.guest_epsilon * (sr6 ** 2 - sr6)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def _random_trial(self):
+        """returns a random position in the supercell and its framework energy."""
+        if len(self._trials) == 0:
+            self._trials = self.rng.random_sample((self.batch_size, 3)) * self.framework.box
+            self._trial_energies = self.framework.energies(self._trials)
+        point, energy = self._trials[-1], self._trial_energies[-1]
+        self._trials, self._trial_energies = self._trials[:-1], self._trial_energies[:-1]
+        return point, energy
+
+    def guest_energy(self, point, exclude=None):
+        """returns the energy of a molecule at point with the adsorbed molecules, skipping the one
+        at index exclude."""
+        delta = self.positions - point
+        delta -= self.framework.box * np.round(delta / self.framework.box)
+        r2 = np.maximum((delta ** 2).sum(axis=1), 1e-12)
+        if exclude is not None:
+            r2[exclude] = np.inf
+        sr6 = (self.framework.guest_sigma ** 2 / r2[r2 < self.framework.cutoff ** 2]) ** 3
+        return (4 * self.framework.guest_epsilon * (sr6 ** 2 - sr6) - self._guest_shift).sum()
+
+    def _accept(self, factor, delta_energy):
+        """Metropolis acceptance of a move with energy change delta_energy [K] and a prefactor."""
+        return self.rng.random_sample() < factor * np.exp(min(-delta_energy / self.temperature, 700.0))
+
+    def translate(self):
+        if len(self) == 0:
+            return False
+        i = self.rng.randint(len(self))
+        new = (self.positions[i] + (2 * self.rng.random_sample(3) - 1) * self.max_displacement) % self.framework.box
+        new_framework_energy = self.framework.energies(new[None, :])[0]
+        delta = (new_framework_energy + self.guest_energy(new, exclude=i) -
+                 self.framework_energies[i] - self.guest_energy(self.positions[i], exclude=i))
+        if self._accept(1.0, delta):
+            self.positions[i], self.framework_energies[i] = new, new_framework_energy
+            return True
+        return False
+
+    def reinsert(self):
+        if len(self) == 0:
+            return False
+        i = self.rng.randint(len(self))
+        new, new_framework_energy = self._random_trial()
+        delta = (new_framework_energy + self.guest_energy(new, exclude=i) -
+                 self.framework_energies[i] - self.guest_energy(self.positions[i], exclude=i))
+        if self._accept(1.0, delta):
+            self.positions[i], self.framework_energies[i] = new, new_framework_energy
+            return True
+        return False
+
+    def insert(self):
+        new, new_framework_energy = self._random_trial()
+        delta = new_framework_energy + self.guest_energy(new)
+        if self._accept(self.beta_fv / (len(self) + 1), delta):
+            self.positions = np.append(self.positions, new[None, :], axis=0)
+            self.framework_energies = np.append(self.framework_energies, new_framework_energy)
+            return True
+        return False
+
+    def delete(self):
+        if len(self) == 0:
+            return False
+        i = self.rng.randint(len(self))
+        delta = -self.framework_energies[i] - self.guest_energy(self.positions[i], exclude=i)
+        if self._accept(len(self) / self.beta_fv, delta):
+            self.positions = np.delete(self.positions, i, axis=0)
+            self.framework_energies = np.delete(self.framework_energies, i)
+            return True
+        return False
+
+    def cycle(self):
+        translations = accepted_translations = 0
+        for _ in range(max(20, len(self))):
+            move = self.rng.randint(3)
+            if move == 0:
+                translations += 1
+                accepted_translations += self.translate()
+            elif move == 1:
+                self.reinsert()
+            elif self.rng.random_sample() < 0.5:
+                self.insert()
+            else:
+                self.delete()
+
+        if translations > 0:
+            scale = min(max(accepted_translations / translations / 0.5, 0.5), 1.5)
+            self.max_displacement = min(max(self.max_displacement * scale, 0.05), self.framework.box.min() / 2)
+
+    def run(self, cycles, num_blocks=5):
+        """runs cycles cycles, and returns the average number of molecules in the supercell over each
+        of num_blocks blocks of cycles."""
+        num_molecules = np.zeros(cycles)
+        for c in range(cycles):
+            self.cycle()
+            num_molecules[c] = len(self)
+        return [block.mean() for block in np.array_split(num_molecules, num_blocks)]
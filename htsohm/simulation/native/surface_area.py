@@ -0,0 +1,59 @@
+"""
+Probe-accessible surface area of a framework, computed like RASPA with SurfaceAreaProbeDistance
+Sigma: each atom is inflated to a sphere of radius equal to the mixed (Lorentz-Berthelot) sigma of
+the atom and the probe, and the area of each sphere that is not inside any other atom's sphere is
+summed.
+
+Points are placed on each sphere deterministically, on a Fibonacci lattice, so the cost is fixed at
+num_points per atom and results are reproducible. Neighbors are found with the structure's periodic
+cell list, and all points of an atom are checked against all of its neighbors at once. In cells
+shorter than twice the neighbor cutoff, every periodic image within the cutoff is checked, not just
+the nearest one, including the atom's own images.
+"""
+
+import itertools
+
+import numpy as np
+
+def fibonacci_sphere(num_points):
+    """returns num_points unit vectors spread evenly over the sphere."""
+    i = np.arange(num_points) + 0.5
+    z = 1 - 2 * i / num_points
+    phi = np.pi * (1 + 5 ** 0.5) * i
+    rho = np.sqrt(1 - z ** 2)
+    return np.column_stack([rho * np.cos(phi), rho * np.sin(phi), z])
+
+def neighbor_images(cell_list, i, cutoff):
+    """returns the indices of the atoms with a periodic image closer than cutoff to atom i, other
+    than atom i itself, and the displacements from atom i to those images. When the cutoff is more
+    than half of a box length, every image within it is returned, including the images of atom i,
+    so an atom can appear more than once."""
+    center = cell_list.coords[i]
+    if 2 * cutoff <= cell_list.box.min():
+        neighbors, _ = cell_list.query_radius(center, cutoff)
+        neighbors = neighbors[neighbors != i]
+        return neighbors, cell_list.minimum_image(cell_list.coords[neighbors] - center)
+
+    reach = np.ceil(cutoff / cell_list.box).astype(np.int64)
+    shifts = np.array(list(itertools.product(*(range(-k, k + 1) for k in reach)))) * cell_list.box
+    images = cell_list.minimum_image(cell_list.coords - center)[:, None, :] + shifts[None, :, :]
+    within = (images ** 2).sum(axis=2) < cutoff ** 2
+    within[i, (shifts == 0).all(axis=1)] = False
+    atoms, _ = np.nonzero(within)
+    return atoms, images[within]
+
+def accessible_surface_area(structure, probe_sigma, num_points=500):
+    """returns the accessible surface area of the unit cell in square angstroms."""
+    if len(structure.atom_sites) == 0:
+        return 0.0
+    radii = np.array([(s.atom_types.sigma + probe_sigma) / 2 for s in structure.atom_sites])
+    cell_list = structure.cell_list(2 * radii.max())
+    unit_sphere = fibonacci_sphere(num_points)
+
+    area = 0.0
+    for i, radius in enumerate(radii):
+        neighbors, displacements = neighbor_images(cell_list, i, radius + radii.max())
+        delta = radius * unit_sphere[:, None, :] - displacements[None, :, :]
+        buried = ((delta ** 2).sum(axis=2) < radii[neighbors] ** 2).any(axis=1)
+        area += 4 * np.pi * radius ** 2 * (num_points - np.count_nonzero(buried)) / num_points
+    return area
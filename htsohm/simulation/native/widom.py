@@ -0,0 +1,12 @@
+import numpy as np
+
+def widom_void_fraction(framework, temperature, num_insertions, batch_size=1000, rng=np.random):
+    """returns the helium void fraction of an LJFramework: the average Widom Rosenbluth weight,
+    exp(-U / kT), of num_insertions guests inserted uniformly at random in the supercell, as RASPA
+    reports it. Insertions are done batch_size at a time."""
+    total_weight = 0.0
+    for i in range(0, num_insertions, batch_size):
+        points = rng.random_sample((min(batch_size, num_insertions - i), 3)) * framework.box
+        with np.errstate(over="ignore"):
+            total_weight += np.exp(-framework.energies(points) / temperature).sum()
+    return total_weight / num_insertions
@@ -1,9 +1,134 @@
+from glob import glob
 import os
+import shutil
+import subprocess
+import threading
+import time
+from uuid import uuid4
+
+# files and bytes left in simulation directories, summed over the simulations of the current
+# material (reset by run_all_simulations)
+io_counters = {"files": 0, "bytes": 0}
+_io_counters_lock = threading.Lock()
+
+def output_directory(material, config):
+    """creates and returns a new directory for a RASPA simulation of material, under scratch_root
+    (e.g. /dev/shm) if it is set, or else the working directory."""
+    output_dir = os.path.join(config.get('scratch_root') or ".", "output_{}_{}".format(material.uuid, uuid4()))
+    os.makedirs(output_dir, exist_ok=True)
+    return output_dir
+
+def count_io(output_dir, linked_bytes=False):
+    """adds the files and bytes in a simulation directory to io_counters, and returns them. Unless
+    linked_bytes is set, the bytes of files that are hardlinked elsewhere (the framework files, see
+    framework_bundle) are not counted, since they were only written once, to the bundle."""
+    num_files = num_bytes = 0
+    for dirpath, _, filenames in os.walk(output_dir):
+        for filename in filenames:
+            num_files += 1
+            stat = os.stat(os.path.join(dirpath, filename))
+            if linked_bytes or stat.st_nlink == 1:
+                num_bytes += stat.st_size
+    with _io_counters_lock:
+        io_counters["files"] += num_files
+        io_counters["bytes"] += num_bytes
+    return num_files, num_bytes
+
+def stream_simulation(input_file, output_dir, stop, poll_interval=0.5):
+    """runs RASPA on input_file in output_dir, passing each line of its output file to stop as soon
+    as the line is written, and terminates RASPA as soon as stop returns True.
+
+    Returns the standard output of RASPA and whether it was stopped early. Any previous Output
+    directory is removed first, so that only the output of this run is read."""
+    shutil.rmtree(os.path.join(output_dir, "Output"), ignore_errors=True)
+    with open(os.path.join(output_dir, "raspa.stdout"), "w+") as stdout:
+        process = subprocess.Popen(["simulate", "-i", input_file], cwd=output_dir, stdout=stdout,
+                                   stderr=subprocess.STDOUT, text=True)
+        output_file = None
+        partial = ""
+        stopped = False
+        try:
+            while not stopped:
+                running = process.poll() is None
+                if output_file is None:
+                    data_files = glob(os.path.join(output_dir, "Output", "System_0", "*.data"))
+                    if len(data_files) > 0:
+                        output_file = open(data_files[0])
+                if output_file is not None:
+                    # the last piece may be a line that is still being written
+                    lines = (partial + output_file.read()).split("\n")
+                    partial = lines.pop()
+                    stopped = any(stop(line) for line in lines)
+                if not running:
+                    break
+                time.sleep(poll_interval)
+        finally:
+            if output_file is not None:
+                output_file.close()
+            if process.poll() is None:
+                process.terminate()
+                process.wait()
+
+        if not stopped and process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, process.args)
+        stdout.seek(0)
+        return stdout.read(), stopped
+
+# framework files of a material that are shared by its simulations, by material uuid
+_bundles = {}
+_bundles_lock = threading.Lock()
+
+def write_framework_files(material, simulation_path):
+    """Writes the files that describe the framework of a material to RASPA: the .mol file and the
+    force field .def files."""
+    # Pseudomaterial mol-file
+    write_mol_file(material, simulation_path)
+    # Lennard-Jones parameters, force_field_mixing_rules.def
+    write_mixing_rules(material.structure, simulation_path)
+    # Pseudoatom definitions, pseudo_atoms.def (placeholder values)
+    write_pseudo_atoms(material.structure, simulation_path)
+    # Overwritten interactions, force_field.def (none overwritten by default)
+    write_force_field(simulation_path)
+
+def framework_bundle(material, config):
+    """returns a directory with the framework files of material. It is written the first time any
+    simulation of the material asks for it, and shared by all of them until
+    remove_framework_bundle."""
+    with _bundles_lock:
+        if material.uuid not in _bundles:
+            bundle = os.path.join(config.get('scratch_root') or ".", "framework_{}_{}".format(material.uuid, uuid4()))
+            os.makedirs(bundle)
+            write_framework_files(material, bundle)
+            _bundles[material.uuid] = bundle
+        return _bundles[material.uuid]
+
+def link_framework_files(material, output_dir, config):
+    """puts the framework files of material in a simulation directory, as hardlinks to its bundle,
+    or copies where the filesystem has no hardlinks."""
+    bundle = framework_bundle(material, config)
+    for filename in os.listdir(bundle):
+        try:
+            os.link(os.path.join(bundle, filename), os.path.join(output_dir, filename))
+        except OSError:
+            shutil.copy2(os.path.join(bundle, filename), os.path.join(output_dir, filename))
+
+def remove_framework_bundle(material):
+    """removes the framework files of material once all of its simulations are done."""
+    with _bundles_lock:
+        bundle = _bundles.pop(material.uuid, None)
+    if bundle is not None:
+        count_io(bundle, linked_bytes=True)
+        shutil.rmtree(bundle, ignore_errors=True)
+
+def atom_type_indices(structure):
+    """the index of each atom type of a structure, by id() of the atom type."""
+    return {id(at): i for i, at in enumerate(structure.atom_types)}
 
 def write_mol_file(material, simulation_path):
     """Writes .mol file for structural information."""
 
     s = material.structure
+    type_indices = atom_type_indices(s)
 
     file_name = os.path.join(simulation_path, "{}.mol".format(material.uuid))
     with open(file_name, "w") as mol_file:
@@ -12,12 +137,11 @@ def write_mol_file(material, simulation_path):
                 "\n" +
                 "  Coord_Info: Listed Cartesian None\n" +
                 "        {}\n".format(len(s.atom_sites)))
-        for i in range(len(s.atom_sites)):
-            a = s.atom_sites[i]
-            mol_file.write(
-                    "{:6} {:10.4f} {:10.4f} {:10.4f}  {:5} {:10.8f}  0  0\n".format(
-                        i + 1, round(a.x * s.a, 4), round(a.y * s.b, 4), round(a.z * s.c, 4),
-                        str(a.atom_types.atom_type_index()), round(a.q, 8)))
+        mol_file.write("".join(
+                "{:6} {:10.4f} {:10.4f} {:10.4f}  {:5} {:10.8f}  0  0\n".format(
+                    i + 1, round(a.x * s.a, 4), round(a.y * s.b, 4), round(a.z * s.c, 4),
+                    str(type_indices[id(a.atom_types)]), round(a.q, 8))
+                for i, a in enumerate(s.atom_sites)))
         mol_file.write(
                 "\n" +
                 "\n" +
@@ -31,19 +155,20 @@ def write_mol_file(material, simulation_path):
                     round(s.a, 4), round(s.b, 4), round(s.c, 4)) +
                 "\n")
 
+# pseudo atom, epsilon [K], sigma [A]
+adsorbate_LJ_atoms = [
+        ['N_n2',    36.0,       3.31],
+        ['C_co2',   27.0,       2.80],
+        ['O_co2',   79.0,       3.05],
+        ['CH4_sp3', 158.5,      3.72],
+        ['He',      10.9,       2.64],
+        ['H_com',   36.7,       2.958],
+        ['Kr',      167.06,     3.924],
+        ['Xe',      110.704,    3.690]
+]
+
 def write_mixing_rules(structure, simulation_path):
     """Writes .def file for forcefield information."""
-    adsorbate_LJ_atoms = [
-            ['N_n2',    36.0,       3.31],
-            ['C_co2',   27.0,       2.80],
-            ['O_co2',   79.0,       3.05],
-            ['CH4_sp3', 158.5,      3.72],
-            ['He',      10.9,       2.64],
-            ['H_com',   36.7,       2.958],
-            ['Kr',      167.06,     3.924],
-            ['Xe',      110.704,    3.690]
-    ]
-
     adsorbate_none_atoms = ['N_com', 'H_h2']
 
     file_name = os.path.join(simulation_path, 'force_field_mixing_rules.def')
@@ -59,9 +184,9 @@ def write_mixing_rules(structure, simulation_path):
             "IMPORTANT: define shortest matches first, so" +
             " that more specific ones overwrites these\n"
         )
-        for lj in structure.atom_types:
+        for i, lj in enumerate(structure.atom_types):
             mixing_rules_file.write(
-                "{0:12} lennard-jones {1:8f} {2:8f}\n".format(lj.atom_type_index(),
+                "{0:12} lennard-jones {1:8f} {2:8f}\n".format(i,
                     round(lj.epsilon, 4), round(lj.sigma, 4)))
         for at in adsorbate_LJ_atoms:
             mixing_rules_file.write(
@@ -94,10 +219,10 @@ def write_pseudo_atoms(structure, simulation_path):
             "%s\n" % (len(structure.atom_types) + 10) +
             "#type  print   as  chem    oxidation   mass    charge  polarization    B-factor    radii   " +
                  "connectivity  anisotropic anisotrop-type  tinker-type\n")
-        for a in structure.atom_types:
+        for i in range(len(structure.atom_types)):
             pseudo_atoms_file.write(
                 "{0:7}  yes  C   C   0   12.0       0.0  0.0  1.0  1.0    0  0  absolute  0\n".format(
-                    str(a.atom_type_index())))
+                    str(i)))
         pseudo_atoms_file.write(
             "N_n2     yes  N   N   0   14.00674   -0.4048   0.0  1.0  0.7    0  0  relative  0\n" +
             "N_com    no   N   -   0    0.0        0.8096   0.0  1.0  0.7    0  0  relative  0\n" +
@@ -1,8 +1,69 @@
 
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
 
 from htsohm.simulation import simulate
-from htsohm.slog import slog
+from htsohm.simulation.raspa import io_counters, remove_framework_bundle
+from htsohm.slog import slog, start_thread_slog, end_thread_slog
+
+def simulation_dependencies(simulations):
+    """returns the numbers of the simulations that each simulation waits for: the ones listed in its
+    depends_on, or else every earlier simulation of its own type (whose results come first in the
+    material's lists) or of a type its module depends_on."""
+    dependencies = {}
+    for simulation_number, simulation_config in simulations.items():
+        if "depends_on" in simulation_config:
+            dependencies[simulation_number] = list(simulation_config["depends_on"])
+        else:
+            types = {simulation_config["type"]} | set(getattr(simulate, simulation_config["type"]).depends_on)
+            dependencies[simulation_number] = [n for n in dependencies if simulations[n]["type"] in types]
+    return dependencies
+
+def run_simulation(material, simulation_config, config):
+    slog('Time             : {:%Y-%m-%d %H:%M:%S}'.format(datetime.now()))
+    slog("Simulation type  : {}".format(simulation_config["type"]))
+    getattr(simulate, simulation_config["type"]).run(material, simulation_config, config)
+    slog("--")
+
+def run_logged_simulation(material, simulation_config, config):
+    """runs a simulation in a worker thread, and returns its log."""
+    start_thread_slog()
+    try:
+        run_simulation(material, simulation_config, config)
+    finally:
+        log = end_thread_slog()
+    return log
+
+def run_concurrent_simulations(material, config, max_concurrent):
+    """runs the simulations of a material in up to max_concurrent threads, each one as soon as the
+    simulations it depends on are done. Only one simulation that does work in this process (the
+    "python" resource of its module) runs at a time; RASPA runs overlap freely. The logs of the
+    simulations are written in the order of the config once they are all done."""
+    simulations = config["simulations"]
+    dependencies = simulation_dependencies(simulations)
+    resources = {n: getattr(simulate, sc["type"]).resources(sc) for n, sc in simulations.items()}
+    pending = list(simulations)
+    running = {}
+    logs = {}
+
+    with ThreadPoolExecutor(max_workers=max_concurrent) as executor:
+        while pending or running:
+            for n in list(pending):
+                if len(running) >= max_concurrent:
+                    break
+                python_busy = any("python" in resources[m] for m in running.values())
+                if all(d in logs for d in dependencies[n]) and not ("python" in resources[n] and python_busy):
+                    pending.remove(n)
+                    running[executor.submit(run_logged_simulation, material, simulations[n], config)] = n
+            if not running:
+                raise(Exception("ERROR: simulations %s depend on simulations that never run" % pending))
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                logs[running.pop(future)] = future.result()
+
+    for n in simulations:
+        slog(logs[n], end="")
 
 def run_all_simulations(material, config):
     """Simulate helium void fraction, gas loading, and surface area.
@@ -15,12 +76,17 @@ def run_all_simulations(material, config):
     corresponding bins to row in database corresponding to the input-material.
     """
     slog("-----------------------------------------------")
-    for simulation_number in config["simulations"]:
-
-        simulation_config = config["simulations"][simulation_number]
-        slog('Time             : {:%Y-%m-%d %H:%M:%S}'.format(datetime.now()))
-        slog("Simulation type  : {}".format(simulation_config["type"]))
-        getattr(simulate, simulation_config["type"]).run(material, simulation_config, config)
-        slog("--")
+    io_counters["files"] = io_counters["bytes"] = 0
+    max_concurrent = config.get("max_concurrent_simulations", 1)
+    try:
+        if max_concurrent > 1:
+            run_concurrent_simulations(material, config, max_concurrent)
+        else:
+            for simulation_number in config["simulations"]:
+                run_simulation(material, config["simulations"][simulation_number], config)
+    finally:
+        # the framework files shared by the RASPA simulations of the material
+        remove_framework_bundle(material)
 
+    slog("Simulation I/O   : %d files, %d bytes" % (io_counters["files"], io_counters["bytes"]))
     slog('{:%Y-%m-%d %H:%M:%S}'.format(datetime.now()))
@@ -7,17 +7,19 @@ import subprocess
 import shutil
 from string import Template
 import sys
-from uuid import uuid4
+import time
 
 import numpy as np
 
-from htsohm.simulation.raspa import write_mol_file, write_mixing_rules
-from htsohm.simulation.raspa import write_pseudo_atoms, write_force_field
+from htsohm.simulation.raspa import link_framework_files, output_directory, count_io
+from htsohm.simulation.raspa import stream_simulation
 from htsohm.simulation.templates import load_and_subs_template
+from htsohm.simulation.native.energy_grid import material_framework
+from htsohm.simulation.native.gcmc import GCMC, molecules_uc_to_vv
 from htsohm.db import GasLoading
 from htsohm.slog import slog
 
-def write_raspa_file(filename, material, simulation_config, restart):
+def write_raspa_file(filename, material, simulation_config, restart, movies=False):
     """Writes RASPA input file for simulating gas adsorption.
 
     Args:
@@ -37,6 +39,7 @@ def write_raspa_file(filename, material, simulation_config, restart):
     unit_cells = material.structure.minimum_unit_cells(simulation_config['cutoff'])
     values = {
             "Restart"                       : 'yes' if restart else 'no',
+            "Movies"                        : 'yes' if movies else 'no',
             "Cutoff"                        : simulation_config['cutoff'],
             "NumberOfCycles"                : simulation_config["simulation_cycles"],
             "NumberOfInitializationCycles"  : simulation_config["initialization_cycles"] if not restart else 0,
@@ -54,21 +57,6 @@ def write_raspa_file(filename, material, simulation_config, restart):
     with open(filename, "w") as raspa_input_file:
         raspa_input_file.write(input_data)
 
-def write_output_files(material, simulation_config, output_dir, restart=False, filename=None):
-    # Write simulation input-files
-    # RASPA input-file
-    if filename is None:
-        filename = os.path.join(output_dir, "{}_loading.input".format(simulation_config['adsorbate']))
-    write_raspa_file(filename, material, simulation_config, restart)
-    # Pseudomaterial mol-file
-    write_mol_file(material, output_dir)
-    # Lennard-Jones parameters, force_field_mixing_rules.def
-    write_mixing_rules(material.structure, output_dir)
-    # Pseudoatom definitions, pseudo_atoms.def (placeholder values)
-    write_pseudo_atoms(material.structure, output_dir)
-    # Overwritten interactions, force_field.def (none overwritten by default)
-    write_force_field(output_dir)
-
 def parse_output(output_file, material, simulation_config):
     """Parse output file for gas adsorption data.
 
@@ -114,6 +102,90 @@ def pressure_string(p):
     else:
         return str(p)
 
+def block_statistics(all_atom_blocks, i, atoms_uc_to_vv, total_unit_cells, quiet=False):
+    """returns the loading [v/v] and its error after run i, from the per-block loadings [v/v] of all
+    runs so far (5 blocks per run)."""
+    # assign two initialization blocks to every restart run
+    run_blocks = all_atom_blocks[math.floor(i/2)*5:]
+    if quiet:
+        blocks_for_averaging = np.mean(np.array(run_blocks).reshape(-1, int(len(run_blocks) / 5)), axis=1)
+        return np.mean(blocks_for_averaging), 2*np.std(blocks_for_averaging) * atoms_uc_to_vv / total_unit_cells
+
+    slog("run blocks: ", run_blocks)
+    slog("run blocks len: %f" % (len(run_blocks) / 5))
+
+    blocks_for_averaging = np.mean(np.array(run_blocks).reshape(-1, int(len(run_blocks) / 5)), axis=1)
+    slog("incorporated blocks for averaging [v/v]: ", blocks_for_averaging)
+    atoms_std = np.std(blocks_for_averaging)
+    slog("2*std of all blocks avg %d: %f" % (i, atoms_std*2))
+    slog("2*std of all blocks: %f" % (2 * np.std(run_blocks)))
+
+    error_vv = 2*atoms_std * atoms_uc_to_vv / total_unit_cells
+    slog("calculated V/V: %f" % np.mean(blocks_for_averaging))
+    slog("calculated error: %f" % error_vv)
+    return np.mean(blocks_for_averaging), error_vv
+
+class LoadingMonitor:
+    """follows the lines of a RASPA gas loading output file as they are written, and tells when the
+    run can be stopped: when the loading error, from the blocks of the earlier runs and the blocks
+    of this run so far, is below restart_err_threshold.
+
+    The blocks of this run are made from the instantaneous absolute adsorption [mol/uc] that RASPA
+    prints every PrintEvery production cycles, split into 5 blocks as RASPA does."""
+
+    def __init__(self, all_atom_blocks, i, total_unit_cells, simulation_config):
+        self.all_atom_blocks = all_atom_blocks
+        self.i = i
+        self.total_unit_cells = total_unit_cells
+        self.threshold = simulation_config['restart_err_threshold']
+        self.min_samples = simulation_config.get("stream_min_samples", 25)
+        self.atoms_uc_to_vv = None
+        self.production = False
+        self.cycle = 0
+        self.samples = []
+
+    def blocks(self):
+        """the loading [v/v] of each of the 5 blocks of this run so far."""
+        return [block.mean() * self.atoms_uc_to_vv for block in np.array_split(np.array(self.samples), 5)]
+
+    def statistics(self):
+        return block_statistics(self.all_atom_blocks + self.blocks(), self.i, self.atoms_uc_to_vv,
+                                self.total_unit_cells, quiet=True)
+
+    def __call__(self, line):
+        if "Conversion factor molecules/unit cell -> cm^3 STP/cm^3:" in line:
+            self.atoms_uc_to_vv = float(line.split()[7])
+        elif "Current cycle:" in line:
+            self.production = not line.lstrip().startswith("[Init]")
+            self.cycle = int(line.split("Current cycle:")[1].split()[0])
+        elif self.production and "absolute adsorption:" in line and "[mol/uc]" in line:
+            self.samples.append(float(line.split()[2]))
+            if self.atoms_uc_to_vv is not None and len(self.samples) >= self.min_samples:
+                return self.statistics()[1] < self.threshold
+        return False
+
+def done_restarting(gas_loading, i, simulation_config):
+    """returns whether run i was the last one: the error is below restart_err_threshold, or there
+    have already been max_restarts restarts."""
+    if (gas_loading.absolute_volumetric_loading_error < simulation_config['restart_err_threshold']):
+        slog("Exiting because v/v err < restart_err_threshold: %4.2f < %4.2f" %
+            (gas_loading.absolute_volumetric_loading_error, simulation_config['restart_err_threshold']))
+        return True
+    elif i == simulation_config['max_restarts']:
+        slog("Exiting because we've already restarted maximum number of times.")
+        slog("v/v err >= restart_err_threshold: %4.2f >= %4.2f" %
+            (gas_loading.absolute_volumetric_loading_error, simulation_config['restart_err_threshold']))
+        return True
+    return False
+
+# types of the simulations that have to finish before this one starts (see run_all_simulations)
+# the RASPA input uses the helium void fraction
+depends_on = ["void_fraction"]
+
+def resources(simulation_config):
+    """what a simulation runs on: "process" for RASPA, "python" for the native engine."""
+    return {"python"} if simulation_config.get("engine", "raspa") == "native" else {"process"}
+
 def run(material, simulation_config, config):
     """Runs gas loading simulation.
 
@@ -124,28 +196,94 @@ def run(material, simulation_config, config):
         results (dict): gas loading simulation results.
 
     """
+    slog("Adsorbate        : {}".format(simulation_config["adsorbate"]))
+    slog("Pressure         : {}".format(simulation_config["pressure"]))
+    slog("Temperature      : {}".format(simulation_config["temperature"]))
+
+    if simulation_config.get("engine", "raspa") == "native":
+        gas_loading = run_native(material, simulation_config, config)
+    else:
+        gas_loading = run_raspa(material, simulation_config, config)
+    material.gas_loading.append(gas_loading)
+    sys.stdout.flush()
+
+def run_native(material, simulation_config, config):
+    """Runs the gas loading simulation with the native GCMC engine, restarting the same way as with
+    RASPA: the system carries on from where it was, without initialization cycles."""
+    tbegin = time.perf_counter()
+    framework = material_framework(material, simulation_config["adsorbate"], simulation_config["cutoff"], config)
+    gcmc = GCMC(framework, simulation_config["temperature"], simulation_config["pressure"])
+
+    unit_cells = material.structure.minimum_unit_cells(simulation_config['cutoff'])
+    total_unit_cells = unit_cells[0] * unit_cells[1] * unit_cells[2]
+    atoms_uc_to_vv = molecules_uc_to_vv(material.structure.volume)
+    all_atom_blocks = []
+
+    gcmc.run(simulation_config["initialization_cycles"])
+    for i in range(simulation_config['max_restarts'] + 1):
+        atom_blocks = [a * atoms_uc_to_vv / total_unit_cells for a in gcmc.run(simulation_config["simulation_cycles"])]
+        slog("new blocks for averaging [v/v]: ", atom_blocks)
+        all_atom_blocks += atom_blocks
+
+        gas_loading = GasLoading()
+        gas_loading.adsorbate        = simulation_config["adsorbate"]
+        gas_loading.pressure         = simulation_config["pressure"]
+        gas_loading.temperature      = simulation_config["temperature"]
+        gas_loading.absolute_volumetric_loading, gas_loading.absolute_volumetric_loading_error = \
+            block_statistics(all_atom_blocks, i, atoms_uc_to_vv, total_unit_cells)
+        gas_loading.cycles = simulation_config['simulation_cycles'] * (i + 1)
+        if done_restarting(gas_loading, i, simulation_config):
+            break
+        slog("\n--")
+        slog("restart # %d" % i)
+
+    slog("{} LOADING : {} v/v (STP)".format(simulation_config["adsorbate"], gas_loading.absolute_volumetric_loading))
+    slog("NATIVE gas loading simulation time: %5.2f seconds" % (time.perf_counter() - tbegin))
+    return gas_loading
+
+def run_raspa(material, simulation_config, config):
     adsorbate = simulation_config["adsorbate"]
-    output_dir = "output_{}_{}".format(material.uuid, uuid4())
-    os.makedirs(output_dir, exist_ok=True)
+    output_dir = output_directory(material, config)
     raspa_config = "./{}_loading.input".format(adsorbate)
     raspa_restart_config = "./{}_loading_restart.input".format(adsorbate)
 
-    # RASPA input-files
-    write_output_files(material, simulation_config, output_dir, restart=False, filename=os.path.join(output_dir, raspa_config))
-    write_output_files(material, simulation_config, output_dir, restart=True, filename=os.path.join(output_dir, raspa_restart_config))
+    # RASPA input-files; movies are only worth writing if the outputs are kept
+    movies = simulation_config.get("movies", config['keep_configs'])
+    write_raspa_file(os.path.join(output_dir, raspa_config), material, simulation_config, restart=False, movies=movies)
+    write_raspa_file(os.path.join(output_dir, raspa_restart_config), material, simulation_config, restart=True, movies=movies)
+    link_framework_files(material, output_dir, config)
 
     # Run simulations
-    slog("Adsorbate        : {}".format(adsorbate))
-    slog("Pressure         : {}".format(simulation_config["pressure"]))
-    slog("Temperature      : {}".format(simulation_config["temperature"]))
-
     unit_cells = material.structure.minimum_unit_cells(simulation_config['cutoff'])
     total_unit_cells = unit_cells[0] * unit_cells[1] * unit_cells[2]
     all_atom_blocks = []
 
-    process = subprocess.run(["simulate", "-i", raspa_config], check=True, cwd=output_dir, capture_output=True, text=True)
-    slog(process.stdout)
+    stream = simulation_config.get("stream_output", False)
+    def simulate(input_file, i):
+        """runs RASPA, and returns a LoadingMonitor if it was stopped early because it converged."""
+        if stream:
+            monitor = LoadingMonitor(all_atom_blocks, i, total_unit_cells, simulation_config)
+            stdout, stopped = stream_simulation(input_file, output_dir, monitor)
+            slog(stdout)
+            return monitor if stopped else None
+        process = subprocess.run(["simulate", "-i", input_file], check=True, cwd=output_dir, capture_output=True, text=True)
+        slog(process.stdout)
+        return None
+
+    monitor = simulate(raspa_config, 0)
     for i in range(simulation_config['max_restarts'] + 1):
+        if monitor is not None:
+            gas_loading = GasLoading()
+            gas_loading.adsorbate        = simulation_config["adsorbate"]
+            gas_loading.pressure         = simulation_config["pressure"]
+            gas_loading.temperature      = simulation_config["temperature"]
+            slog("Stopped RASPA at cycle %d: v/v err < restart_err_threshold" % monitor.cycle)
+            slog("new blocks for averaging [v/v]: ", monitor.blocks())
+            gas_loading.absolute_volumetric_loading, gas_loading.absolute_volumetric_loading_error = \
+                block_statistics(all_atom_blocks + monitor.blocks(), i, monitor.atoms_uc_to_vv, total_unit_cells)
+            gas_loading.cycles = simulation_config['simulation_cycles'] * i + monitor.cycle
+            slog("{} LOADING : {} v/v (STP)".format(simulation_config["adsorbate"], gas_loading.absolute_volumetric_loading))
+            break
 
         data_files = glob(os.path.join(output_dir, "Output", "System_0", "*.data"))
         if len(data_files) != 1:
@@ -164,55 +302,34 @@ def run(material, simulation_config, config):
         all_atom_blocks += atom_blocks
         slog("all blocks: ", all_atom_blocks)
 
-        # assign two initialization blocks to every restart run
-        run_blocks = all_atom_blocks[math.floor(i/2)*5:]
-        slog("run blocks: ", run_blocks)
-        slog("run blocks len: %f" % (len(run_blocks) / 5))
+        gas_loading.absolute_volumetric_loading, gas_loading.absolute_volumetric_loading_error = \
+            block_statistics(all_atom_blocks, i, atoms_uc_to_vv, total_unit_cells)
 
-        blocks_for_averaging = np.mean(np.array(run_blocks).reshape(-1, int(len(run_blocks) / 5)), axis=1)
-        slog("incorporated blocks for averaging [v/v]: ", blocks_for_averaging)
-        atoms_std = np.std(blocks_for_averaging)
-        slog("2*std of all blocks avg %d: %f" % (i, atoms_std*2))
-        slog("2*std of all blocks: %f" % (2 * np.std(run_blocks)))
-
-        error_vv = 2*atoms_std * atoms_uc_to_vv / total_unit_cells
-        gas_loading.absolute_volumetric_loading = np.mean(blocks_for_averaging)
-        gas_loading.absolute_volumetric_loading_error = error_vv
-        slog("calculated V/V: %f" % gas_loading.absolute_volumetric_loading)
-        slog("calculated error: %f" % error_vv)
-
-        slog("Copying restart to RestartInitial...")
-        # remove old RestartInitial directory and copy the current one to there
+        # remove old RestartInitial directory and put the current restart there for the next run
         shutil.rmtree(os.path.join(output_dir, "RestartInitial"), ignore_errors=True)
-        shutil.copytree(os.path.join(output_dir, "Restart"), os.path.join(output_dir, "RestartInitial"))
-
-        slog("Moving backup RASPA outputs to restart index")
-        shutil.move(os.path.join(output_dir, "Output"), os.path.join(output_dir, "Output-%d" % i))
-        shutil.move(os.path.join(output_dir, "Restart"), os.path.join(output_dir, "Restart-%d" % i))
-        shutil.move(os.path.join(output_dir, "Movies"), os.path.join(output_dir, "Movies-%d" % i))
-        shutil.move(os.path.join(output_dir, "VTK"), os.path.join(output_dir, "VTK-%d" % i))
+        if config['keep_configs']:
+            slog("Copying restart to RestartInitial...")
+            shutil.copytree(os.path.join(output_dir, "Restart"), os.path.join(output_dir, "RestartInitial"))
+
+            slog("Moving backup RASPA outputs to restart index")
+            for name in ["Output", "Restart", "Movies", "VTK"]:
+                if os.path.exists(os.path.join(output_dir, name)):
+                    shutil.move(os.path.join(output_dir, name), os.path.join(output_dir, "%s-%d" % (name, i)))
+        else:
+            # nothing is kept, so the next run just overwrites Output. RASPA only reads restarts
+            # from RestartInitial/System_0 (RestartFile is a yes/no switch, not a path), so the
+            # restart it just wrote is renamed there: one rename in the same directory, no copy.
+            os.replace(os.path.join(output_dir, "Restart"), os.path.join(output_dir, "RestartInitial"))
 
         gas_loading.cycles = simulation_config['simulation_cycles'] * (i + 1)
-        if (gas_loading.absolute_volumetric_loading_error < simulation_config['restart_err_threshold']):
-            slog("Exiting because v/v err < restart_err_threshold: %4.2f < %4.2f" %
-                (gas_loading.absolute_volumetric_loading_error, simulation_config['restart_err_threshold']))
-            break
-        elif i == simulation_config['max_restarts']:
-            slog("Exiting because we've already restarted maximum number of times.")
-            slog("v/v err >= restart_err_threshold: %4.2f >= %4.2f" %
-                (gas_loading.absolute_volumetric_loading_error, simulation_config['restart_err_threshold']))
+        if done_restarting(gas_loading, i, simulation_config):
             break
         else:
             slog("\n--")
             slog("restart # %d" % i)
-            process = subprocess.run(["simulate", "-i", raspa_restart_config], check=True, cwd=output_dir, capture_output=True, text=True)
-            slog(process.stdout)
-
-
-
-
-    material.gas_loading.append(gas_loading)
+            monitor = simulate(raspa_restart_config, i + 1)
 
+    slog("I/O: %d files, %d bytes" % count_io(output_dir))
     if not config['keep_configs']:
         shutil.rmtree(output_dir, ignore_errors=True)
-    sys.stdout.flush()
+    return gas_loading
@@ -1,15 +1,17 @@
+from glob import glob
 import sys
 import os
 import subprocess
 import shutil
+import time
 from datetime import datetime
-from uuid import uuid4
 from string import Template
-from pathlib import Path
 
-from htsohm.simulation.raspa import write_mol_file, write_mixing_rules
-from htsohm.simulation.raspa import write_pseudo_atoms, write_force_field
+from htsohm.simulation.raspa import link_framework_files, output_directory, count_io
 from htsohm.simulation.templates import load_and_subs_template
+from htsohm.simulation.native.forcefield import probe_lj
+from htsohm.simulation.native.gcmc import avogadro
+from htsohm.simulation.native.surface_area import accessible_surface_area
 from htsohm.db import SurfaceArea
 from htsohm.slog import slog
 
@@ -39,20 +41,6 @@ def write_raspa_file(filename, material, simulation_config):
     with open(filename, "w") as raspa_input_file:
         raspa_input_file.write(input_data)
 
-def write_output_files(material, simulation_config, output_dir):
-    # Write simulation input-files
-    # RASPA input-file
-    filename = os.path.join(output_dir, "SurfaceArea.input")
-    write_raspa_file(filename, material, simulation_config)
-    # Pseudomaterial mol-file
-    write_mol_file(material, output_dir)
-    # Lennard-Jones parameters, force_field_mixing_rules.def
-    write_mixing_rules(material.structure, output_dir)
-    # Pseudoatom definitions, pseudo_atoms.def (placeholder values)
-    write_pseudo_atoms(material.structure, output_dir)
-    # Overwritten interactions, force_field.def (none overwritten by default)
-    write_force_field(output_dir)
-
 def parse_output(output_file, material, simulation_config):
     """Parse output file for void fraction data.
 
@@ -84,6 +72,13 @@ def parse_output(output_file, material, simulation_config):
 
     material.surface_area.append(surface_area)
 
+# types of the simulations that have to finish before this one starts (see run_all_simulations)
+depends_on = []
+
+def resources(simulation_config):
+    """what a simulation runs on: "process" for RASPA, "python" for the native engine."""
+    return {"python"} if simulation_config.get("engine", "raspa") == "native" else {"process"}
+
 def run(material, simulation_config, config):
     """Runs surface area simulation.
 
@@ -94,32 +89,55 @@ def run(material, simulation_config, config):
         results (dict): surface area simulation results.
 
     """
-    output_dir = "output_{}_{}".format(material.uuid, uuid4())
+    slog("Probe            : {}".format(simulation_config["adsorbate"]))
+    if simulation_config.get("engine", "raspa") == "native":
+        run_native(material, simulation_config)
+    else:
+        run_raspa(material, simulation_config, config)
+    sys.stdout.flush()
+
+def run_native(material, simulation_config):
+    tbegin = time.perf_counter()
+    s = material.structure
+    _, probe_sigma = probe_lj(simulation_config["adsorbate"])
+    surface_area = SurfaceArea()
+    surface_area.adsorbate = simulation_config["adsorbate"]
+    surface_area.unit_cell_surface_area = accessible_surface_area(s, probe_sigma,
+                                                                  simulation_config.get("surface_area_points", 500))
+    # [A^2 / A^3] -> [m^2 / cm^3]; every framework atom has a mass of 12.0 (see write_pseudo_atoms)
+    surface_area.volumetric_surface_area = surface_area.unit_cell_surface_area / s.volume * 1e4
+    framework_mass = 12.0 * len(s.atom_sites) / avogadro
+    surface_area.gravimetric_surface_area = (surface_area.unit_cell_surface_area * 1e-20 / framework_mass
+                                             if framework_mass > 0 else 0.0)
+
+    slog("\nSURFACE AREA : {} m^2/cm^3\n".format(surface_area.volumetric_surface_area))
+    slog("NATIVE surface area time: %5.2f seconds" % (time.perf_counter() - tbegin))
+    material.surface_area.append(surface_area)
+
+def run_raspa(material, simulation_config, config):
+    output_dir = output_directory(material, config)
     slog("Output directory :\t{}".format(output_dir))
-    os.makedirs(output_dir, exist_ok=True)
 
     # Write simulation input-files
-    write_output_files(filename, material, simulation_config)
-
-    # Run simulations
-    while True:
-        try:
-            slog("Probe            : {}".format(simulation_config["adsorbate"]))
-            filename = "output_{}_2.2.2_298.000000_0.data".format(material.uuid)
-            output_file = os.path.join(output_dir, "Output", "System_0", filename)
-
-            while not Path(output_file).exists():
-                process = subprocess.run(["simulate", "-i", "./SurfaceArea.input"], check=True,
-                        cwd=output_dir, capture_output=True, text=True)
-                slog(process.stdout)
-
-            # Parse output
-            parse_output(output_file, material, simulation_config)
-            if not config['keep_configs']:
-                shutil.rmtree(output_dir, ignore_errors=True)
-            sys.stdout.flush()
-        except (FileNotFoundError, KeyError) as err:
-            slog(err)
-            slog(err.args)
-            continue
-        break
+    write_raspa_file(os.path.join(output_dir, "SurfaceArea.input"), material, simulation_config)
+    link_framework_files(material, output_dir, config)
+
+    # Run simulations, retrying a bounded number of times if RASPA does not write its output
+    max_attempts = simulation_config.get("max_attempts", 3)
+    for attempt in range(max_attempts):
+        process = subprocess.run(["simulate", "-i", "./SurfaceArea.input"], check=True,
+                cwd=output_dir, capture_output=True, text=True)
+        slog(process.stdout)
+
+        data_files = glob(os.path.join(output_dir, "Output", "System_0", "*.data"))
+        if len(data_files) == 1:
+            break
+        slog("no output from RASPA (attempt %d of %d)" % (attempt + 1, max_attempts))
+    else:
+        raise Exception("ERROR: RASPA did not write surface area output for %s after %d attempts" % (output_dir, max_attempts))
+
+    # Parse output
+    parse_output(data_files[0], material, simulation_config)
+    slog("I/O: %d files, %d bytes" % count_io(output_dir))
+    if not config['keep_configs']:
+        shutil.rmtree(output_dir, ignore_errors=True)
@@ -8,15 +8,18 @@ import subprocess
 import time
 
 from datetime import datetime
-from uuid import uuid4
 from string import Template
 from pathlib import Path
 
-from htsohm.simulation.raspa import write_mol_file, write_mixing_rules
-from htsohm.simulation.raspa import write_pseudo_atoms, write_force_field
+from htsohm.simulation.raspa import link_framework_files, output_directory, count_io
 from htsohm.simulation.templates import load_and_subs_template
+from htsohm.simulation.native.energy_grid import material_framework
+from htsohm.simulation.native.widom import widom_void_fraction
 from htsohm.db import VoidFraction
-from htsohm.void_fraction import calculate_void_fraction
+from htsohm.void_fraction import calculate_void_fraction, calculate_void_fractions, default_max_memory
+from htsohm.void_fraction import calculate_void_fraction_mc
+from htsohm.pore_geometry import calculate_pore_geometry
+from htsohm.properties import property_ranges
 from htsohm.slog import slog
 
 def write_raspa_file(filename, material, simulation_config):
@@ -47,20 +50,6 @@ def write_raspa_file(filename, material, simulation_config):
     with open(filename, "w") as raspa_input_file:
         raspa_input_file.write(input_data)
 
-def write_output_files(material, simulation_config, output_dir):
-    # Write simulation input-files
-    # RASPA input-file
-    filename = os.path.join(output_dir, "void_fraction.input")
-    write_raspa_file(filename, material, simulation_config)
-    # Pseudomaterial mol-file
-    write_mol_file(material, output_dir)
-    # Lennard-Jones parameters, force_field_mixing_rules.def
-    write_mixing_rules(material.structure, output_dir)
-    # Pseudoatom definitions, pseudo_atoms.def (placeholder values)
-    write_pseudo_atoms(material.structure, output_dir)
-    # Overwritten interactions, force_field.def (none overwritten by default)
-    write_force_field(output_dir)
-
 def parse_output(output_file, material, void_fraction):
     """Parse output file for void fraction data.
 
@@ -80,6 +69,31 @@ def parse_output(output_file, material, void_fraction):
             void_fraction.void_fraction = float(line.split()[4])
 
 
+def monte_carlo_tolerance(simulation_config, config):
+    """returns the standard error to sample the geometric void fraction to: geo_tolerance if it is
+    set, otherwise a quarter of the width of the void fraction bins, so that the error bars span
+    about one bin. The bins are those of the geometric void fraction property, or of another void
+    fraction property if it isn't explored, or [0, 1] if no void fraction is."""
+    if "geo_tolerance" in simulation_config:
+        return simulation_config["geo_tolerance"]
+    void_fractions = [prop for prop in config["properties"]
+                      if prop["table"] == "void_fraction" and prop["column"].startswith("void_fraction")]
+    geo = [prop for prop in void_fractions if prop["column"] == "void_fraction_geo"]
+    lower, upper = property_ranges(geo or void_fractions)[0] if void_fractions else (0.0, 1.0)
+    return (upper - lower) / config["number_of_convergence_bins"] / 4
+
+# types of the simulations that have to finish before this one starts (see run_all_simulations)
+depends_on = []
+
+def resources(simulation_config):
+    """what a simulation runs on: "process" for RASPA, "python" for the work done in this process."""
+    kinds = set()
+    if simulation_config.get("do_raspa"):
+        kinds.add("process")
+    if any(simulation_config.get(key) for key in ["do_native", "do_geo", "do_zeo"]):
+        kinds.add("python")
+    return kinds
+
 def run(material, simulation_config, config):
     """Runs void fraction simulation.
 
@@ -90,11 +104,12 @@ def run(material, simulation_config, config):
         results (dict): void fraction simulation results.
 
     """
-    output_dir = "output_{}_{}".format(material.uuid, uuid4())
-    slog("Output directory : {}".format(output_dir))
-    os.makedirs(output_dir, exist_ok=True)
-
-    write_output_files(material, simulation_config, output_dir)
+    output_dir = None
+    if "do_raspa" in simulation_config and simulation_config["do_raspa"]:
+        output_dir = output_directory(material, config)
+        slog("Output directory : {}".format(output_dir))
+        write_raspa_file(os.path.join(output_dir, "void_fraction.input"), material, simulation_config)
+        link_framework_files(material, output_dir, config)
 
     # Run simulations
     slog("Probe            : {}".format(simulation_config["adsorbate"]))
@@ -123,20 +138,57 @@ def run(material, simulation_config, config):
             slog("(parent VOID FRACTION : {})".format(material.parent.void_fraction[0].void_fraction))
 
 
+    if "do_native" in simulation_config and simulation_config["do_native"]:
+        tbegin = time.perf_counter()
+        framework = material_framework(material, simulation_config["adsorbate"], simulation_config["cutoff"], config)
+        num_insertions = simulation_config.get("native_insertions", 20 * simulation_config["simulation_cycles"])
+        void_fraction.void_fraction = widom_void_fraction(framework, simulation_config["temperature"], num_insertions)
+        slog("NATIVE void fraction simulation time: %5.2f seconds" % (time.perf_counter() - tbegin))
+        slog("NATIVE VOID FRACTION : {}".format(void_fraction.void_fraction))
+
     # run geometric void fraction
     if "do_geo" in simulation_config and simulation_config["do_geo"]:
         tbegin = time.perf_counter()
         atoms = [(a.x * material.structure.a, a.y * material.structure.b, a.z * material.structure.c, a.atom_types.sigma) for a in material.structure.atom_sites]
         box = (material.structure.a, material.structure.b, material.structure.c)
-        void_fraction.void_fraction_geo = calculate_void_fraction(atoms, box, probe_r=simulation_config["probe_radius"])
+        max_memory = simulation_config.get("geo_max_memory_mb", default_max_memory / 2**20) * 2**20
+        if simulation_config.get("geo_monte_carlo", False):
+            tolerance = monte_carlo_tolerance(simulation_config, config)
+            void_fraction.void_fraction_geo, void_fraction.void_fraction_geo_error = calculate_void_fraction_mc(
+                atoms, box, probe_r=simulation_config["probe_radius"], tolerance=tolerance,
+                batch_size=simulation_config.get("geo_batch_size", 10000),
+                max_points=simulation_config.get("geo_max_points", 10**7))
+            slog("GEOMETRIC void fraction standard error: %f (tolerance %f)" % (void_fraction.void_fraction_geo_error, tolerance))
+        elif isinstance(simulation_config["probe_radius"], list):
+            # one pass for all probe radii; the first one is the one stored
+            probe_radii = simulation_config["probe_radius"]
+            void_fractions = calculate_void_fractions(atoms, box, probe_radii, max_memory=max_memory)
+            for probe_r, vf in zip(probe_radii, void_fractions):
+                slog("GEOMETRIC void fraction (probe radius %s): %f" % (probe_r, vf))
+            void_fraction.void_fraction_geo = void_fractions[0]
+        else:
+            void_fraction.void_fraction_geo = calculate_void_fraction(atoms, box, probe_r=simulation_config["probe_radius"],
+                                                                      max_memory=max_memory)
         slog("GEOMETRIC void fraction: %f" % void_fraction.void_fraction_geo)
         slog("GEOMETRIC void fraction simulation time: %5.2f   seconds" % (time.perf_counter() - tbegin))
-    if "do_zeo" in simulation_config:
-        pass
-        # run zeo void fraction here
+    if "do_zeo" in simulation_config and simulation_config["do_zeo"]:
+        tbegin = time.perf_counter()
+        atoms = [(a.x * material.structure.a, a.y * material.structure.b, a.z * material.structure.c, a.atom_types.sigma) for a in material.structure.atom_sites]
+        box = (material.structure.a, material.structure.b, material.structure.c)
+        probe_r = simulation_config.get("probe_radius", 0.0)
+        if isinstance(probe_r, list):
+            probe_r = probe_r[0]
+        (void_fraction.void_fraction_zeo, void_fraction.largest_cavity_diameter,
+            void_fraction.pore_limiting_diameter) = calculate_pore_geometry(atoms, box, probe_r, simulation_config.get("zeo_points", 5000))
+        slog("ZEO void fraction: %f" % void_fraction.void_fraction_zeo)
+        slog("ZEO largest cavity diameter: %s; pore limiting diameter: %s" %
+             (void_fraction.largest_cavity_diameter, void_fraction.pore_limiting_diameter))
+        slog("ZEO void fraction simulation time: %5.2f   seconds" % (time.perf_counter() - tbegin))
 
     material.void_fraction.append(void_fraction)
 
-    if not config['keep_configs']:
-        shutil.rmtree(output_dir, ignore_errors=True)
+    if output_dir is not None:
+        slog("I/O: %d files, %d bytes" % count_io(output_dir))
+        if not config['keep_configs']:
+            shutil.rmtree(output_dir, ignore_errors=True)
     sys.stdout.flush()
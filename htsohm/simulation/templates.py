@@ -1,11 +1,16 @@
+from functools import lru_cache
 import os
 from string import Template
 
 import htsohm
 
-def load_and_subs_template(template_name, params):
+@lru_cache(maxsize=None)
+def load_template(template_name):
+    """reads a template once; later calls return the same Template."""
     htsohm_dir = os.path.dirname(htsohm.__file__)
     input_path = os.path.join(htsohm_dir, 'simulation', template_name)
     with open(input_path) as input_file:
-        template = Template(input_file.read())
-    return template.substitute(params)
+        return Template(input_file.read())
+
+def load_and_subs_template(template_name, params):
+    return load_template(template_name).substitute(params)
@@ -4,16 +4,33 @@ in full blocks, where a block is a complete unit of work for the worker.
 """
 
 import io
+import threading
 
 __buffered_log__ = ""
 
+# a thread can log into a buffer of its own instead, e.g. a simulation run concurrently with others
+# for the same material, so that its lines are not interleaved with theirs
+__thread_log__ = threading.local()
+
 def init_slog():
     global __buffered_log__
     __buffered_log__ = io.StringIO("")
     return
 
-def slog(*args):
-    print(*args, file=__buffered_log__)
+def slog(*args, **kwargs):
+    thread_log = getattr(__thread_log__, "log", None)
+    print(*args, file=thread_log if thread_log is not None else __buffered_log__, **kwargs)
+
+def start_thread_slog():
+    """logs the current thread into its own buffer, until end_thread_slog is called."""
+    __thread_log__.log = io.StringIO("")
+
+def end_thread_slog():
+    """returns what the current thread logged since start_thread_slog, and logs it into the
+    shared log again from then on."""
+    log = __thread_log__.log.getvalue()
+    __thread_log__.log = None
+    return log
 
 def get_slog_file():
     return __buffered_log__
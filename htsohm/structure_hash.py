@@ -0,0 +1,46 @@
+"""
+Canonical hash of a structure, for finding materials that were already simulated.
+
+Two structures hash the same when, rounded to the given number of decimal digits, they have the
+same lattice constants and the same atom sites up to the order of the sites, the order of the atom
+types, and a periodic translation of the whole structure. Each site is described by the sigma and
+epsilon of its atom type, its charge, and its fractional coordinates.
+
+To remove the translation, the structure is shifted in turn so that each site of the smallest
+(sigma, epsilon, q) lies at the origin, the shifted sites are sorted, and the smallest sorted list
+is kept. Rotations and permutations of the axes are not removed.
+
+The simulation settings are part of the hash, since the results also depend on them (see
+htsohm.simulation.cache.simulation_hash).
+"""
+
+import hashlib
+import json
+
+import numpy as np
+
+def canonical_sites(structure, digits=6):
+    """returns the sorted (sigma, epsilon, q, x, y, z) tuples of the sites of a structure, with the
+    translation removed as described above."""
+    if len(structure.atom_sites) == 0:
+        return []
+    # adding 0.0 turns any -0.0 from rounding into 0.0
+    types = np.round([(s.atom_types.sigma, s.atom_types.epsilon, s.q) for s in structure.atom_sites], digits) + 0.0
+    positions = np.array([(s.x, s.y, s.z) for s in structure.atom_sites], dtype=float)
+
+    anchors = np.flatnonzero((types == np.array(min(map(tuple, types.tolist())))).all(axis=1))
+    best = None
+    for i in anchors:
+        shifted = np.round((positions - positions[i]) % 1.0, digits) % 1.0 + 0.0
+        sites = sorted(map(tuple, np.concatenate([types, shifted], axis=1).tolist()))
+        if best is None or sites < best:
+            best = sites
+    return best
+
+def structure_hash(structure, simulations=None, digits=6):
+    """returns the sha256 hex digest of the canonical form of a structure and the simulation
+    settings it is simulated with."""
+    lattice = (np.round([structure.a, structure.b, structure.c], digits) + 0.0).tolist()
+    canonical = json.dumps({"lattice": lattice, "sites": canonical_sites(structure, digits),
+                            "simulations": simulations}, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
@@ -0,0 +1,282 @@
+"""
+SQLite-backed task queue for running the workers of a run on several nodes.
+
+The coordinator (htsohm_run) and any number of worker processes (psm-queue-worker) share one SQLite
+file, which must be on a filesystem that all nodes can see. Tasks are pickled (function, args)
+pairs; functions are pickled by reference, so workers must have the same htsohm installed.
+
+A worker claims a pending task by taking a lease on it and keeps renewing the lease with heartbeats
+while the task runs. If a worker dies, its lease expires and the coordinator puts the task back in
+the queue for another worker. Leases use each node's wall clock, so node clocks should be kept in
+sync to well under the lease time.
+
+QueuePool wraps the coordinator side of the queue in the subset of the multiprocessing.Pool API that
+htsohm_run uses, so a run can switch between a local pool and the queue with a config option.
+"""
+
+from contextlib import contextmanager
+import os
+import pickle
+import socket
+import sqlite3
+import threading
+import time
+from uuid import uuid4
+
+class TaskQueue:
+    def __init__(self, path, lease_seconds=60.0, max_attempts=3):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._conn.execute("""
+            create table if not exists tasks (
+                id integer primary key,
+                task blob,
+                status text,
+                worker text,
+                lease_expires real,
+                attempts integer default 0,
+                result blob
+            )""")
+        self._conn.execute("create index if not exists tasks_status on tasks (status)")
+        self._conn.execute("create table if not exists meta (key text primary key, value blob)")
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    @contextmanager
+    def _transaction(self):
+        """takes the database write lock up front, so that two workers can never claim the same
+        task."""
+        with self._lock:
+            self._conn.execute("begin immediate")
+            try:
+                yield self._conn
+                self._conn.execute("commit")
+            except:
+                self._conn.execute("rollback")
+                raise
+
+    def set_meta(self, key, value):
+        self._execute("insert or replace into meta (key, value) values (?, ?)", (key, pickle.dumps(value)))
+
+    def get_meta(self, key, default=None):
+        rows = self._execute("select value from meta where key = ?", (key,))
+        return pickle.loads(rows[0][0]) if rows else default
+
+    def delete_meta(self, key):
+        self._execute("delete from meta where key = ?", (key,))
+
+    def submit(self, func, args=()):
+        """adds a task to the queue and returns its task id."""
+        with self._lock:
+            cursor = self._conn.execute("insert into tasks (task, status) values (?, 'pending')",
+                                        (pickle.dumps((func, tuple(args))),))
+            return cursor.lastrowid
+
+    def claim(self, worker_id):
+        """takes a lease on the oldest pending task.
+
+        Returns (task_id, func, args), or None if there are no pending tasks."""
+        with self._transaction() as conn:
+            row = conn.execute(
+                "select id, task from tasks where status = 'pending' order by id limit 1").fetchone()
+            if row is not None:
+                conn.execute(
+                    "update tasks set status = 'running', worker = ?, lease_expires = ? where id = ?",
+                    (worker_id, time.time() + self.lease_seconds, row[0]))
+
+        if row is None:
+            return None
+        func, args = pickle.loads(row[1])
+        return row[0], func, args
+
+    def heartbeat(self, task_id, worker_id):
+        """renews the lease on a task. Returns False if the worker no longer holds the lease."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "update tasks set lease_expires = ? where id = ? and worker = ? and status = 'running'",
+                (time.time() + self.lease_seconds, task_id, worker_id))
+            return cursor.rowcount == 1
+
+    def complete(self, task_id, worker_id, result, failed=False):
+        """stores the result of a task. Results from workers that lost their lease are dropped, since
+        the task has been handed to another worker."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "update tasks set status = ?, result = ?, lease_expires = null "
+                "where id = ? and worker = ? and status = 'running'",
+                ('failed' if failed else 'done', pickle.dumps(result), task_id, worker_id))
+            return cursor.rowcount == 1
+
+    def requeue_expired(self):
+        """puts tasks with expired leases back in the queue, or fails them once they have been tried
+        max_attempts times. Returns the number of requeued tasks."""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "update tasks set status = 'failed', worker = null, result = ? "
+                "where status = 'running' and lease_expires < ? and attempts + 1 >= ?",
+                (pickle.dumps(Exception("task lease expired %d times" % self.max_attempts)),
+                 now, self.max_attempts))
+            cursor = conn.execute(
+                "update tasks set status = 'pending', worker = null, lease_expires = null, "
+                "attempts = attempts + 1 where status = 'running' and lease_expires < ?", (now,))
+            return cursor.rowcount
+
+    def pop_finished(self):
+        """removes finished tasks from the queue and returns them as (task_id, result, failed)."""
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "select id, result, status from tasks where status in ('done', 'failed')").fetchall()
+            conn.executemany("delete from tasks where id = ?", [(row[0],) for row in rows])
+        return [(task_id, pickle.loads(result), status == 'failed') for task_id, result, status in rows]
+
+    def clear(self):
+        self._execute("delete from tasks")
+
+    def counts(self):
+        return dict(self._execute("select status, count(*) from tasks group by status"))
+
+    def close(self):
+        self._conn.close()
+
+def default_worker_id():
+    return "%s:%d:%s" % (socket.gethostname(), os.getpid(), uuid4().hex[:8])
+
+def run_worker(path, worker_id=None, poll_interval=1.0, idle_timeout=None):
+    """runs tasks from the queue at path until the coordinator shuts the queue down, or until no task
+    has been available for idle_timeout seconds.
+
+    Before the first task, the worker runs the initializer the coordinator stored in the queue, so
+    workers can be started before the coordinator."""
+    queue = TaskQueue(path)
+    worker_id = worker_id or default_worker_id()
+
+    while queue.get_meta("initializer") is None:
+        time.sleep(poll_interval)
+    initializer, initargs = queue.get_meta("initializer")
+    queue.lease_seconds = queue.get_meta("lease_seconds", queue.lease_seconds)
+    if initializer is not None:
+        initializer(*initargs)
+
+    last_task_time = time.time()
+    while not queue.get_meta("shutdown", False):
+        claimed = queue.claim(worker_id)
+        if claimed is None:
+            if idle_timeout is not None and time.time() - last_task_time > idle_timeout:
+                break
+            time.sleep(poll_interval)
+            continue
+
+        task_id, func, args = claimed
+        stop_heartbeat = threading.Event()
+        def _heartbeat():
+            while not stop_heartbeat.wait(queue.lease_seconds / 3):
+                if not queue.heartbeat(task_id, worker_id):
+                    break
+        heartbeat_thread = threading.Thread(target=_heartbeat, daemon=True)
+        heartbeat_thread.start()
+
+        try:
+            result, failed = func(*args), False
+        except Exception as e:
+            result, failed = e, True
+        finally:
+            stop_heartbeat.set()
+            heartbeat_thread.join()
+
+        queue.complete(task_id, worker_id, result, failed)
+        last_task_time = time.time()
+
+    queue.close()
+
+class AsyncResult:
+    def __init__(self, callback=None, error_callback=None):
+        self._event = threading.Event()
+        self._callback = callback
+        self._error_callback = error_callback
+
+    def _set(self, result, failed):
+        self._result, self._failed = result, failed
+        self._event.set()
+        if failed and self._error_callback:
+            self._error_callback(result)
+        elif not failed and self._callback:
+            self._callback(result)
+
+    def ready(self):
+        return self._event.is_set()
+
+    def get(self, timeout=None):
+        if not self._event.wait(timeout):
+            raise TimeoutError()
+        if self._failed:
+            raise self._result
+        return self._result
+
+class QueuePool:
+    """coordinator side of the task queue, with the map/starmap/apply_async interface of
+    multiprocessing.Pool. A background thread requeues tasks whose leases have expired and
+    collects finished tasks."""
+
+    def __init__(self, path, initializer=None, initargs=(), lease_seconds=60.0, max_attempts=3,
+                 poll_interval=1.0):
+        self.queue = TaskQueue(path, lease_seconds, max_attempts)
+        # tasks left over from an earlier coordinator can never be collected
+        self.queue.clear()
+        self.queue.set_meta("shutdown", False)
+        self.queue.set_meta("lease_seconds", lease_seconds)
+        self.queue.set_meta("initializer", (initializer, tuple(initargs)))
+        self.poll_interval = poll_interval
+
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._poller = threading.Thread(target=self._poll, daemon=True)
+        self._poller.start()
+
+    def _poll(self):
+        while not self._stop.wait(self.poll_interval):
+            requeued = self.queue.requeue_expired()
+            if requeued > 0:
+                print("task queue: requeued %d tasks with expired leases" % requeued)
+            for task_id, result, failed in self.queue.pop_finished():
+                with self._pending_lock:
+                    async_result = self._pending.pop(task_id, None)
+                if async_result is not None:
+                    async_result._set(result, failed)
+
+    def apply_async(self, func, args=(), callback=None, error_callback=None):
+        async_result = AsyncResult(callback, error_callback)
+        with self._pending_lock:
+            self._pending[self.queue.submit(func, args)] = async_result
+        return async_result
+
+    def starmap(self, func, iterable):
+        return [r.get() for r in [self.apply_async(func, args) for args in iterable]]
+
+    def map(self, func, iterable):
+        return self.starmap(func, [(x,) for x in iterable])
+
+    def close(self):
+        """tells the workers to exit once they finish their current task."""
+        self.queue.set_meta("shutdown", True)
+        self.queue.delete_meta("initializer")
+
+    def terminate(self):
+        self.close()
+        self.join()
+
+    def join(self):
+        self._stop.set()
+        self._poller.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.terminate()
@@ -1,10 +1,13 @@
-
 import itertools
-from math import sqrt, ceil
+from math import ceil
 
 import numpy as np
 
-def calculate_void_fraction(atoms, box, points_per_angstrom=10, probe_r=0.0):
+# memory cap for the lattice of grid points, in bytes. The lattice is processed in slabs of x planes
+# that fit in this much memory, so the cap does not depend on the size of the box.
+default_max_memory = 64 * 2**20
+
+def calculate_void_fraction(atoms, box, points_per_angstrom=10, probe_r=0.0, max_memory=default_max_memory):
     """calculates a geometric void fraction, given the atom coordinates and diameter and the box
     size.
 
@@ -13,6 +16,11 @@ def calculate_void_fraction(atoms, box, points_per_angstrom=10, probe_r=0.0):
     the probe radius `probe_r` and the atom radius (atom diameter / 2) are marked as filled. The
     void fraction is simply the ratio of filled cubes to total cubes.
 
+    The cubes around each atom are marked all at once, from the squared distances along each axis,
+    so the cost per atom is a few NumPy operations on the block of cubes around it. The box is
+    filled one slab of x planes at a time, so at most `max_memory` bytes (one byte per cube) are
+    used for the cubes whatever the size of the box.
+
     atoms: an array of tuples (x, y, z, d) containing the atom coordinates x, y, z and the
         atom diameter d.
     box: a tuple containing the length of each side of the box. The box is assumed to start
@@ -21,32 +29,139 @@ def calculate_void_fraction(atoms, box, points_per_angstrom=10, probe_r=0.0):
         discretization of the box. The larger the number, the longer the calculations will take to
         perform, and the more accurate the result will be. Default: 10.
     probe_r: the radius of the probe. Default: 0.0 angstroms.
+    max_memory: the memory cap for the cubes, in bytes. Default: 64 MB.
     """
 
-    xi_max = ceil(box[0] * points_per_angstrom)
-    yi_max = ceil(box[1] * points_per_angstrom)
-    zi_max = ceil(box[2] * points_per_angstrom)
+    num_points = [ceil(length * points_per_angstrom) for length in box]
+    spacing = [length / n for length, n in zip(box, num_points)]
+
+    num_filled = 0
+    for x0, x1 in slabs(num_points, 1, max_memory):
+        lattice_fill = np.zeros((x1 - x0, *num_points[1:]), dtype=bool)
+        for sq_dist, d, destinations in atom_blocks(atoms, num_points, spacing, x0, x1, probe_r):
+            filled = np.less(sq_dist, sqrt_threshold(d/2 + probe_r), out=np.empty(sq_dist.shape, dtype=bool))
+            for dst, src in destinations:
+                lattice_fill[dst] |= filled[src]
+        num_filled += np.count_nonzero(lattice_fill)
+
+    return 1 - num_filled / np.prod(num_points, dtype=float)
+
+def calculate_void_fractions(atoms, box, probe_radii, points_per_angstrom=10, max_memory=default_max_memory):
+    """calculates the geometric void fraction for each of several probe radii in a single pass.
+
+    Instead of marking filled cubes for one probe, computes the periodic distance field from each
+    cube to the nearest atom surface (the distance to the atom center minus the atom radius), out
+    to the largest probe radius. A cube is filled for a probe of radius r when it is closer than r
+    to an atom surface, so the void fraction of every probe is counted from the same field. The
+    results match calculate_void_fraction, except for cubes that lie on an atom surface to within
+    floating point rounding.
+
+    The field takes eight bytes per cube, and is computed one slab of x planes at a time, using at
+    most `max_memory` bytes. Returns a list of void fractions, in the order of `probe_radii`.
+    """
+    num_points = [ceil(length * points_per_angstrom) for length in box]
+    spacing = [length / n for length, n in zip(box, num_points)]
+    max_probe_r = max(probe_radii)
 
-    dx = box[0] / xi_max
-    dy = box[1] / yi_max
-    dz = box[2] / zi_max
+    num_filled = np.zeros(len(probe_radii), dtype=np.int64)
+    for x0, x1 in slabs(num_points, 8, max_memory):
+        surface_dist = np.full((x1 - x0, *num_points[1:]), np.inf)
+        for sq_dist, d, destinations in atom_blocks(atoms, num_points, spacing, x0, x1, max_probe_r):
+            dist = np.sqrt(sq_dist, out=sq_dist)
+            dist -= d/2
+            for dst, src in destinations:
+                np.minimum(surface_dist[dst], dist[src], out=surface_dist[dst])
+        for i, probe_r in enumerate(probe_radii):
+            num_filled[i] += np.count_nonzero(surface_dist < probe_r)
 
-    lattice_fill = np.zeros((xi_max, yi_max, zi_max))
+    return list(1 - num_filled / np.prod(num_points, dtype=float))
 
+def calculate_void_fraction_mc(atoms, box, probe_r=0.0, tolerance=0.005, batch_size=10000,
+                               max_points=10**7, min_points=1000, max_batch_entries=2**22, rng=np.random):
+    """estimates a geometric void fraction by Monte Carlo sampling, stopping once the binomial
+    standard error of the estimate falls below `tolerance`.
+
+    Random points are drawn uniformly in the box in batches of `batch_size`. A point is filled when
+    it is closer than the atom radius plus the probe radius `probe_r` to the nearest periodic image
+    of any atom, which is checked for the whole batch at once with minimum-image distances. Sampling
+    stops after the first batch in which at least `min_points` have been drawn and the standard error
+    is below `tolerance`, or once `max_points` have been drawn. The standard error is computed from
+    the estimate (k + 1) / (n + 2), so it is never zero for very open or very dense frameworks.
+
+    atoms and box are as for calculate_void_fraction. Returns (void_fraction, standard_error).
+    """
+    box = np.array(box, dtype=float)
+    atoms = np.array(atoms, dtype=float).reshape(-1, 4)
+    centers, sq_radii = atoms[:, :3], (atoms[:, 3] / 2 + probe_r) ** 2
+    chunk = max(1, max_batch_entries // max(len(atoms), 1))
+
+    num_points = num_void = 0
+    while True:
+        points = rng.random_sample((batch_size, 3)) * box
+        for i in range(0, batch_size, chunk):
+            delta = points[i:i + chunk, None, :] - centers[None, :, :]
+            delta -= box * np.round(delta / box)
+            filled = ((delta ** 2).sum(axis=2) < sq_radii).any(axis=1)
+            num_void += len(filled) - np.count_nonzero(filled)
+        num_points += batch_size
+
+        p = (num_void + 1) / (num_points + 2)
+        standard_error = np.sqrt(p * (1 - p) / num_points)
+        if (num_points >= min_points and standard_error < tolerance) or num_points >= max_points:
+            return num_void / num_points, standard_error
+
+def slabs(num_points, bytes_per_point, max_memory):
+    """splits the x planes of the lattice into slabs [x0, x1) that fit in max_memory bytes (at least
+    one plane each)."""
+    plane_bytes = bytes_per_point * num_points[1] * num_points[2]
+    num_planes = max(1, int(max_memory // max(plane_bytes, 1)))
+    return [(x0, min(x0 + num_planes, num_points[0])) for x0 in range(0, num_points[0], num_planes)]
+
+def atom_blocks(atoms, num_points, spacing, x0, x1, probe_r):
+    """yields, for each atom that reaches the slab of x planes [x0, x1), the squared distances from
+    the atom center to the block of grid points within the atom radius plus probe_r of it (limited
+    to crossing a boundary once in each direction), the atom diameter, and a list of (dst, src)
+    slices that map parts of the block to the slab, following the periodic boundaries."""
+    n_slab = x1 - x0
     for x, y, z, d in atoms:
         r = d/2 + probe_r
-        delt_i = ceil(r / dx)
-        xi = int(x // dx); yi = int(y // dy); zi = int(z // dz)
-
-        # limit the lattice_indices to only crossing a boundary once in each direction
-        lattice_indices = itertools.product(
-            range(max(xi - delt_i, -xi_max), min(xi + delt_i + 1, 2*xi_max)),
-            range(max(yi - delt_i, -yi_max), min(yi + delt_i + 1, 2*yi_max)),
-            range(max(zi - delt_i, -zi_max), min(zi + delt_i + 1, 2*zi_max)))
 
-        for lxi, lyi, lzi in lattice_indices:
-            lx = lxi * dx; ly = lyi * dy; lz = lzi * dz
-            if sqrt((lx - x)**2 + (ly - y)**2 + (lz -z)**2) < r:
-                lattice_fill[lxi % xi_max, lyi % yi_max, lzi % zi_max] = 1.0
+        # for each axis, the grid points within r of the atom and the segments of those points that
+        # map to contiguous slices of the periodic lattice (along x, only the parts in the slab)
+        points = []
+        segments = []
+        for axis, (coord, dl, n) in enumerate(zip((x, y, z), spacing, num_points)):
+            li = int(coord // dl)
+            delt_i = ceil(r / dl)
+            lo, hi = max(li - delt_i, -n), min(li + delt_i + 1, 2*n)
+            offset, length = (x0, n_slab) if axis == 0 else (0, n)
+            axis_segments = []
+            for start in (-n, 0, n):
+                seg_lo, seg_hi = max(start + offset, lo), min(start + offset + length, hi)
+                if seg_lo < seg_hi:
+                    axis_segments.append((seg_lo, seg_hi, start + offset))
+            if len(axis_segments) == 0:
+                break
+            points.append((min(s[0] for s in axis_segments), max(s[1] for s in axis_segments)))
+            segments.append([(slice(seg_lo - origin, seg_hi - origin), seg_lo, seg_hi)
+                             for seg_lo, seg_hi, origin in axis_segments])
+        else:
+            sq_dists = [(np.arange(lo, hi) * dl - coord)**2
+                        for (lo, hi), coord, dl in zip(points, (x, y, z), spacing)]
+            sq_dist = np.add((sq_dists[0][:, None] + sq_dists[1][None, :])[:, :, None], sq_dists[2])
+            destinations = []
+            for axis_segments in itertools.product(*segments):
+                destinations.append((tuple(dst for dst, _, _ in axis_segments),
+                                     tuple(slice(seg_lo - lo, seg_hi - lo)
+                                           for (_, seg_lo, seg_hi), (lo, _) in zip(axis_segments, points))))
+            yield sq_dist, d, destinations
 
-    return 1 - np.sum(lattice_fill) / (xi_max * yi_max * zi_max)
+def sqrt_threshold(r):
+    """returns the float t for which sqrt(s) < r exactly when s < t, so grid points can be compared
+    by squared distance without changing which ones count as inside the atom."""
+    t = np.float64(r) * r
+    while np.sqrt(t) >= r:
+        t = np.nextafter(t, 0.0)
+    while np.sqrt(np.nextafter(t, np.inf)) < r:
+        t = np.nextafter(t, np.inf)
+    return np.nextafter(t, np.inf)
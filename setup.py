@@ -35,6 +35,9 @@ setup(
               'psm-setup-one-atom-sweep = htsohm.bin.one_atom_sweep_setup:sweep_setup',
               'psm-setup-cube-pore-sweep = htsohm.bin.cube_pore_sweep_setup:sweep_setup',
               'psm-run-one-atom-sweep = htsohm.bin.one_atom_sweep_run:run_materials',
+              'psm-queue-worker = htsohm.bin.queue_worker:queue_worker',
+              'psm-benchmark-bins = htsohm.bin.benchmark_bins:benchmark_bins',
+              'psm-validate-native-void-fraction = htsohm.bin.validate_native:validate_native_void_fraction',
           ]
       },
 )
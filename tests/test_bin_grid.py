@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from htsohm.bin_grid import BinGrid
+from htsohm.select.neighbor_bin import bins_with_empty_neighbors
+
+def test_add__counts_members_and_new_bins():
+    grid = BinGrid(3)
+    assert grid.add([4, 0, 4]).tolist() == [0, 4]
+    assert grid.add([4, 8]).tolist() == [8]
+    assert len(grid) == 5
+    assert grid.num_occupied == 3
+    assert grid.bin_counts[1, 1] == 3
+    assert grid.counts == {0: 1, 4: 3, 8: 1}
+    assert grid.members(4).tolist() == [0, 2, 3]
+    assert grid.members(5).tolist() == []
+    assert grid.unravel(grid.occupied()) == [(0, 0), (1, 1), (2, 2)]
+
+def test_add__grows_past_initial_capacity():
+    bin_ids = np.random.randint(0, 100, 5000)
+    grid = BinGrid(10)
+    for chunk in np.split(bin_ids, 50):
+        grid.add(chunk)
+    assert (grid.bin_ids == bin_ids).all()
+    assert (grid.bin_counts.flatten() == np.bincount(bin_ids, minlength=100)).all()
+    assert (grid.members(7) == np.flatnonzero(bin_ids == 7)).all()
+
+def test_sample__returns_members_of_requested_bins():
+    bin_ids = np.random.randint(0, 9, 200)
+    grid = BinGrid.from_bin_ids(bin_ids, 3)
+    requested = np.random.choice(grid.occupied(), 1000)
+    assert (bin_ids[grid.sample(requested)] == requested).all()
+
+    with pytest.raises(Exception):
+        BinGrid.from_bin_ids([0], 3).sample([1])
+
+def test_save_load__memory_mapped_and_appendable(tmp_path):
+    grid = BinGrid.from_bin_ids([3, 1, 3], 2)
+    grid.save(str(tmp_path))
+
+    loaded = BinGrid.load(str(tmp_path), 2)
+    assert isinstance(loaded.bin_ids, np.memmap)
+    assert loaded.members(3).tolist() == [0, 2]
+    assert loaded.num_occupied == 2
+
+    assert loaded.add([0]).tolist() == [0]
+    assert loaded.bin_ids.tolist() == [3, 1, 3, 0]
+    assert np.load(str(tmp_path / "bin_ids.npy")).tolist() == [3, 1, 3]
+
+def test_sparse_grid__many_axes_only_stores_occupied_bins():
+    grid = BinGrid.from_bin_ids([0, 40 ** 6 - 1, 0], 40, 6)
+    assert grid.num_total_bins == 40 ** 6
+    assert grid.occupied().tolist() == [0, 40 ** 6 - 1]
+    assert grid.members(0).tolist() == [0, 2]
+    assert grid.members(12345).tolist() == []
+    assert grid.unravel([40 ** 6 - 1]) == [(39,) * 6]
+
+def test_bins_with_empty_neighbors__ignores_bins_past_the_edges():
+    grid = BinGrid.from_bin_ids(range(1, 16), 4)
+    assert sorted(bins_with_empty_neighbors(grid).tolist()) == [1, 4, 5]
+    assert bins_with_empty_neighbors(BinGrid.from_bin_ids(range(9), 3)).tolist() == []
+
+def test_bins_with_empty_neighbors__3_axes():
+    grid = BinGrid.from_bin_ids([i for i in range(27) if i != 13], 3, 3)
+    assert sorted(bins_with_empty_neighbors(grid).tolist()) == [i for i in range(27) if i != 13]
+    grid = BinGrid.from_bin_ids([0, 26], 3, 3)
+    assert bins_with_empty_neighbors(grid, r=1).tolist() == [0, 26]
+
+def test_bin_grid__one_at_a_time_adds_rebuild_index_logarithmically():
+    rng = np.random.RandomState(0)
+    grid = BinGrid.from_bin_ids(rng.randint(0, 400, 100), 20)
+    for _ in range(20000):
+        grid.add(rng.randint(0, 400, 1))
+        grid.sample(grid.occupied()[:2], rng)
+    assert len(grid) == 20100
+    assert grid.num_index_builds < 30
+
+def test_bin_grid__pending_materials_match_a_full_rebuild(monkeypatch):
+    monkeypatch.setattr(BinGrid, "min_pending", 16)
+    rng = np.random.RandomState(1)
+    grid = BinGrid.from_bin_ids(rng.randint(0, 25, 50), 5)
+    for _ in range(40):
+        new_bins = grid.add(rng.randint(0, 25, rng.randint(1, 6)))
+        rebuilt = BinGrid.from_bin_ids(grid.bin_ids, 5)
+        assert all(grid.is_occupied(new_bins))
+        assert (grid.occupied() == rebuilt.occupied()).all()
+        assert all((a == b).all() for a, b in zip(grid.occupied_counts(), rebuilt.occupied_counts()))
+        assert all((grid.members(b) == rebuilt.members(b)).all() for b in range(25))
+        assert (grid.sample(grid.occupied(), np.random.RandomState(2)) ==
+                rebuilt.sample(rebuilt.occupied(), np.random.RandomState(2))).all()
+    assert grid.num_index_builds > 1
@@ -0,0 +1,33 @@
+import numpy as np
+
+from htsohm.bins import calc_bin, calc_bin_array, calc_bin_indices, calc_bins, flat_bin_ids, calc_flat_bin_ids
+
+def test_calc_bin_array__matches_calc_bin_including_out_of_range_values():
+    values = np.concatenate([np.random.uniform(-0.5, 1.5, 1000), [0.0, 0.1, 0.5, 0.9, 1.0]])
+    expected = [calc_bin(v, 0.0, 1.0, 10) for v in values]
+    assert calc_bin_array(values, 0.0, 1.0, 10).tolist() == expected
+
+def test_calc_bin_array__offset_range():
+    values = [0.0, 100.0, 250.0, 399.9, 400.0, 800.0]
+    expected = [calc_bin(v, 100.0, 400.0, 3) for v in values]
+    assert calc_bin_array(values, 100.0, 400.0, 3).tolist() == expected
+
+def test_calc_bin_indices__matches_calc_bin_on_each_axis():
+    values = np.column_stack([np.random.uniform(-0.5, 1.5, 500), np.random.uniform(-50, 450, 500),
+                              np.random.uniform(0, 10, 500)])
+    ranges = [(0.0, 1.0), (0.0, 400.0), (2.0, 8.0)]
+    num_bins = [10, 20, 3]
+    expected = [[calc_bin(v, *r, nb) for v, r, nb in zip(row, ranges, num_bins)] for row in values]
+    assert calc_bin_indices(values, ranges, num_bins).tolist() == expected
+
+def test_calc_bins__returns_tuples_like_calc_bin():
+    box_r = [(0.05, 390.0), (1.5, -10.0)]
+    assert calc_bins(box_r, 10, prop1range=(0.0, 1.0), prop2range=(0.0, 400.0)) == [(0, 9), (9, 0)]
+    assert calc_bins([], 10) == []
+
+def test_flat_bin_ids__usable_with_bincount():
+    bin_indices = np.array([[0, 0], [2, 3], [2, 3], [4, 4]])
+    ids = flat_bin_ids(bin_indices, 5)
+    assert ids.tolist() == [0, 13, 13, 24]
+    assert np.bincount(ids, minlength=25).reshape(5, 5)[2, 3] == 2
+    assert calc_flat_bin_ids([(0.5, 0.5)], [(0.0, 1.0), (0.0, 1.0)], [2, 4]).tolist() == [6]
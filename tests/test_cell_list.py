@@ -0,0 +1,70 @@
+import itertools
+
+import numpy as np
+import pytest
+from pytest import approx
+
+from htsohm.cell_list import PeriodicCellList
+from htsohm.db import Structure, AtomSite, AtomTypes
+
+box = (9.0, 7.5, 6.0)
+
+def brute_force_distances(frac, box, points):
+    delta = points[:, None, :] - (frac * box)[None, :, :]
+    delta -= box * np.round(delta / box)
+    return np.sqrt((delta ** 2).sum(axis=2))
+
+@pytest.fixture
+def frac():
+    return np.random.RandomState(0).random_sample((60, 3))
+
+@pytest.mark.parametrize("cell_size", [0.5, 2.0, 3.5, 20.0])
+def test_query_radius__matches_brute_force(frac, cell_size):
+    cl = PeriodicCellList(frac, box, cell_size)
+    points = np.random.RandomState(1).random_sample((10, 3)) * box
+    for point, distances in zip(points, brute_force_distances(frac, np.array(box), points)):
+        indices, found = cl.query_radius(point, 2.5)
+        assert indices.tolist() == np.flatnonzero(distances < 2.5).tolist()
+        assert found == approx(distances[indices])
+
+@pytest.mark.parametrize("cell_size", [0.5, 2.0, 20.0])
+def test_nearest__matches_brute_force(frac, cell_size):
+    cl = PeriodicCellList(frac, box, cell_size)
+    points = np.random.RandomState(2).random_sample((10, 3)) * box
+    for point, distances in zip(points, brute_force_distances(frac, np.array(box), points)):
+        assert cl.nearest(point) == (np.argmin(distances), approx(distances.min()))
+
+def test_nearest__excludes_atom_itself(frac):
+    cl = PeriodicCellList(frac, box, 2.0)
+    distances = brute_force_distances(frac, np.array(box), frac[:1] * box)[0]
+    distances[0] = np.inf
+    assert cl.nearest(frac[0] * box, exclude=0) == (np.argmin(distances), approx(distances.min()))
+
+def test_nearest__empty_cell_list():
+    assert PeriodicCellList([], box, 2.0).nearest((1.0, 1.0, 1.0)) == (-1, np.inf)
+
+@pytest.mark.parametrize("cell_size", [0.5, 2.0, 20.0])
+def test_pairs__matches_brute_force(frac, cell_size):
+    i, j, d = PeriodicCellList(frac, box, cell_size).pairs(2.0)
+    distances = brute_force_distances(frac, np.array(box), frac * box)
+    expected = [(a, b) for a, b in itertools.combinations(range(len(frac)), 2) if distances[a, b] < 2.0]
+    assert list(zip(i.tolist(), j.tolist())) == expected
+    assert d == approx(distances[i, j])
+
+def test_pairs__across_periodic_boundary():
+    i, j, d = PeriodicCellList([(0.05, 0.5, 0.5), (0.95, 0.5, 0.5)], (10.0, 10.0, 10.0), 1.5).pairs(1.5)
+    assert (i.tolist(), j.tolist()) == ([0], [1])
+    assert d == approx([1.0])
+
+def test_structure_cell_list__rebuilt_when_atoms_move():
+    at = AtomTypes(sigma=1.0, epsilon=1.0)
+    sites = [AtomSite(atom_types=at, x=0.1, y=0.1, z=0.1), AtomSite(atom_types=at, x=0.2, y=0.1, z=0.1)]
+    s = Structure(a=10.0, b=10.0, c=10.0, atom_sites=sites, atom_types=[at])
+    cl = s.cell_list(2.0)
+    assert s.cell_list(2.0) is cl
+    assert cl.nearest((1.0, 1.0, 1.0)) == (0, approx(0.0))
+
+    sites[0].x = 0.6
+    moved = s.cell_list(2.0)
+    assert moved is not cl
+    assert moved.nearest((1.0, 1.0, 1.0)) == (1, approx(1.0))
@@ -0,0 +1,53 @@
+import pytest
+from pytest import approx
+
+from htsohm import db
+from htsohm.db import Material, VoidFraction, GasLoading
+from htsohm.db.bulk import material_to_dict, material_from_dict, load_material_dicts, insert_material_dicts
+
+@pytest.fixture
+def engine():
+    engine, _ = db.init_database("sqlite://")
+    return engine
+
+@pytest.fixture
+def material():
+    m = Material.one_atom_new(3.0, 50.0, 10.0, 11.0, 12.0)
+    m.structure.atom_types.append(m.structure.atom_types[0].clone())
+    m.structure.atom_types[1].sigma = 2.5
+    m.structure.atom_sites[0].atom_types = m.structure.atom_types[1]
+    m.generation = 1
+    m.void_fraction.append(VoidFraction(void_fraction=0.5, void_fraction_geo=0.4))
+    m.gas_loading.append(GasLoading(absolute_volumetric_loading=100.0, cycles=10))
+    return m
+
+def test_material_dict_round_trip(material):
+    d = material_to_dict(material)
+    m = material_from_dict(d)
+    assert m.uuid == material.uuid
+    assert m.structure.b == 11.0
+    assert m.structure.atom_sites[0].atom_types.sigma == 2.5
+    assert m.void_fraction[0].void_fraction_geo == 0.4
+    assert material_to_dict(m) == d
+
+def test_insert_material_dicts__assigns_sequential_ids(engine, material):
+    d1 = material_to_dict(material)
+    d2 = material_to_dict(material)
+    assert insert_material_dicts(engine, [d1, d2]) == [1, 2]
+    assert insert_material_dicts(engine, [material_to_dict(material)]) == [3]
+
+def test_load_material_dicts__matches_inserted(engine, material):
+    d = material_to_dict(material)
+    insert_material_dicts(engine, [material_to_dict(material), d])
+
+    loaded = load_material_dicts(engine, [2])
+    assert list(loaded.keys()) == [2]
+    assert loaded[2] == d
+
+def test_material_from_dict__can_be_mutated_as_parent(material):
+    parent = material_from_dict(material_to_dict(material))
+    parent.id = 7
+    child = parent.clone()
+    assert child.parent_id == 7
+    assert child.structure.atom_sites[0].atom_types is child.structure.atom_types[1]
+    assert child.structure.atom_sites[0].atom_types.sigma == approx(2.5)
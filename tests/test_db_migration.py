@@ -0,0 +1,92 @@
+import sqlite3
+
+from htsohm import db
+from htsohm.db import Material, VoidFraction
+from htsohm.db.bulk import material_to_dict, load_material_dicts, insert_material_dicts
+from htsohm.simulation.cache import cache_engine, cached_results
+
+# the schema of databases created before columns were added to the models
+baseline_schema = """
+CREATE TABLE materials (id INTEGER NOT NULL, uuid VARCHAR(36), parent_id INTEGER,
+    perturbation VARCHAR(10), generation INTEGER, number_density FLOAT, PRIMARY KEY (id),
+    FOREIGN KEY(parent_id) REFERENCES materials (id));
+CREATE TABLE gas_loadings (id INTEGER NOT NULL, material_id INTEGER, adsorbate VARCHAR(16),
+    pressure FLOAT, temperature FLOAT, cycles INTEGER, absolute_volumetric_loading FLOAT,
+    absolute_volumetric_loading_error FLOAT, PRIMARY KEY (id), FOREIGN KEY(material_id) REFERENCES materials (id));
+CREATE TABLE surface_areas (id INTEGER NOT NULL, material_id INTEGER, adsorbate VARCHAR(16),
+    unit_cell_surface_area FLOAT, volumetric_surface_area FLOAT, gravimetric_surface_area FLOAT,
+    PRIMARY KEY (id), FOREIGN KEY(material_id) REFERENCES materials (id));
+CREATE TABLE void_fractions (id INTEGER NOT NULL, material_id INTEGER, adsorbate VARCHAR(16),
+    temperature FLOAT, void_fraction FLOAT, void_fraction_geo FLOAT, void_fraction_zeo FLOAT,
+    PRIMARY KEY (id), FOREIGN KEY(material_id) REFERENCES materials (id));
+CREATE TABLE structures (id INTEGER NOT NULL, material_id INTEGER, a FLOAT, b FLOAT, c FLOAT,
+    PRIMARY KEY (id), FOREIGN KEY(material_id) REFERENCES materials (id));
+CREATE TABLE atom_types (id INTEGER NOT NULL, structure_id INTEGER, sigma FLOAT, epsilon FLOAT,
+    PRIMARY KEY (id), FOREIGN KEY(structure_id) REFERENCES structures (id));
+CREATE TABLE atom_sites (id INTEGER NOT NULL, structure_id INTEGER, atom_types_id INTEGER,
+    x FLOAT, y FLOAT, z FLOAT, q FLOAT, PRIMARY KEY (id), FOREIGN KEY(structure_id) REFERENCES structures (id),
+    FOREIGN KEY(atom_types_id) REFERENCES atom_types (id));
+CREATE INDEX ix_atom_sites_structure_id ON atom_sites (structure_id);
+INSERT INTO materials VALUES (1, 'old', NULL, NULL, 0, NULL);
+INSERT INTO void_fractions VALUES (1, 1, 'helium', 298.0, 0.5, 0.4, NULL);
+"""
+
+def baseline_database(tmpdir):
+    path = str(tmpdir.join("baseline.db"))
+    with sqlite3.connect(path) as conn:
+        conn.executescript(baseline_schema)
+    return path
+
+def columns(path, table):
+    with sqlite3.connect(path) as conn:
+        return [row[1] for row in conn.execute("PRAGMA table_info(%s)" % table)]
+
+def test_init_database__adds_missing_void_fraction_columns(tmpdir):
+    path = baseline_database(tmpdir)
+    engine, session = db.init_database("sqlite:///%s" % path)
+    assert "void_fraction_geo_error" in columns(path, "void_fractions")
+
+    # existing rows are kept, with the new columns empty
+    [vf] = session.query(VoidFraction).all()
+    assert vf.void_fraction_geo == 0.4
+    assert vf.void_fraction_geo_error is None
+
+    m = Material.one_atom_new(3.0, 50.0, 10.0, 10.0, 10.0)
+    m.void_fraction.append(VoidFraction(void_fraction_geo=0.3, void_fraction_geo_error=0.01))
+    [material_id] = insert_material_dicts(engine, [material_to_dict(m)])
+    assert load_material_dicts(engine, [material_id])[material_id]["void_fraction"][0]["void_fraction_geo_error"] == 0.01
+
+    # opening the database again changes nothing
+    db.init_database("sqlite:///%s" % path)
+    assert columns(path, "void_fractions").count("void_fraction_geo_error") == 1
+
+def test_init_database__adds_missing_pore_geometry_columns(tmpdir):
+    path = baseline_database(tmpdir)
+    engine, _ = db.init_database("sqlite:///%s" % path)
+    assert {"largest_cavity_diameter", "pore_limiting_diameter"} <= set(columns(path, "void_fractions"))
+
+    m = Material.one_atom_new(3.0, 50.0, 10.0, 10.0, 10.0)
+    m.void_fraction.append(VoidFraction(void_fraction_zeo=0.7, largest_cavity_diameter=6.5, pore_limiting_diameter=4.0))
+    [material_id] = insert_material_dicts(engine, [material_to_dict(m)])
+    [row] = load_material_dicts(engine, [material_id])[material_id]["void_fraction"]
+    assert (row["largest_cavity_diameter"], row["pore_limiting_diameter"]) == (6.5, 4.0)
+
+def test_init_database__adds_structure_hash_column_and_index(tmpdir):
+    path = baseline_database(tmpdir)
+    engine, _ = db.init_database("sqlite:///%s" % path)
+    assert "structure_hash" in columns(path, "materials")
+    with sqlite3.connect(path) as conn:
+        indexes = [row[1] for row in conn.execute("PRAGMA index_list(materials)")]
+    assert "ix_materials_structure_hash" in indexes
+
+    m = Material.one_atom_new(3.0, 50.0, 10.0, 10.0, 10.0)
+    m.structure_hash = "abc"
+    m.void_fraction.append(VoidFraction(void_fraction=0.6))
+    insert_material_dicts(engine, [material_to_dict(m)])
+    uuid, results = cached_results(cache_engine({"simulation_cache_db": "sqlite:///%s" % path}), "abc")
+    assert uuid == m.uuid
+    assert results["void_fraction"][0]["void_fraction"] == 0.6
+
+def test_cached_results__finds_nothing_in_a_baseline_cache_database(tmpdir):
+    path = baseline_database(tmpdir)
+    assert cached_results(cache_engine({"simulation_cache_db": "sqlite:///%s" % path}), "abc") is None
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from pytest import approx
+
+from htsohm.db import Material, Structure, AtomSite, AtomTypes
+from htsohm.simulation.native import energy_grid
+from htsohm.simulation.native.energy_grid import EnergyGrid, material_framework
+from htsohm.simulation.native.forcefield import LJFramework
+
+def material(uuid="m1"):
+    atom_types = [AtomTypes(sigma=3.0, epsilon=50.0), AtomTypes(sigma=2.0, epsilon=20.0)]
+    sites = [(0, 0.1, 0.2, 0.3), (1, 0.7, 0.9, 0.5), (0, 0.95, 0.05, 0.5)]
+    atom_sites = [AtomSite(atom_types=atom_types[t], x=x, y=y, z=z, q=0.0) for t, x, y, z in sites]
+    m = Material(structure=Structure(a=8.0, b=9.0, c=10.0, atom_sites=atom_sites, atom_types=atom_types))
+    m.uuid = uuid
+    return m
+
+@pytest.fixture
+def framework():
+    return LJFramework(material().structure, "methane", 6.0)
+
+def test_energy_grid__exact_at_grid_points(framework):
+    grid = EnergyGrid(framework, 0.5, block_size=3)
+    points = np.array([(i, j, k) for i, j, k in [(0, 0, 0), (3, 5, 7), (15, 17, 19)]]) * framework.cell / grid.shape
+    expected = np.minimum(framework.energies(points), energy_grid.max_energy)
+    assert grid.energies(points) == approx(expected)
+
+def test_energy_grid__periodic_and_close_to_direct_energies(framework):
+    grid = EnergyGrid(framework, 0.1)
+    points = np.random.RandomState(0).random_sample((200, 3)) * framework.cell
+    assert grid.energies(points + framework.cell * [1, -2, 3]) == approx(grid.energies(points))
+
+    direct = framework.energies(points)
+    attractive = direct < 0
+    relative_error = np.abs(grid.energies(points)[attractive] / direct[attractive] - 1)
+    assert np.median(relative_error) < 0.01
+
+def test_material_framework__without_spacing_is_direct():
+    assert isinstance(material_framework(material(), "methane", 6.0, {}), LJFramework)
+
+def test_material_framework__reuses_grids_from_memory_and_cache_dir(tmp_path):
+    config = {"energy_grid_spacing": 0.5, "energy_grid_cache_dir": str(tmp_path)}
+    grid = material_framework(material(), "methane", 6.0, config)
+    assert material_framework(material(), "methane", 6.0, config) is grid
+    assert material_framework(material(), "helium", 6.0, config) is not grid
+
+    energy_grid._grids.clear()
+    cached = material_framework(material(), "methane", 6.0, config)
+    assert cached is not grid
+    assert (cached.values == grid.values).all()
+    assert len(list(tmp_path.glob("m1_*.npy"))) == 2
@@ -0,0 +1,49 @@
+import importlib
+
+import pytest
+from pytest import approx
+
+from htsohm import db
+from htsohm.db import Material, VoidFraction, GasLoading
+from htsohm.db.bulk import material_to_dict, insert_material_dicts
+
+htsohm_run = importlib.import_module("htsohm.htsohm_run")
+
+@pytest.fixture
+def session():
+    engine, session = db.init_database("sqlite://")
+    for i, (vf, vf_geo, loading) in enumerate([(0.15, 0.95, 10.0), (0.55, 0.05, 390.0), (0.35, 0.35, 150.0)]):
+        m = Material.one_atom_new(3.0, 50.0, 10.0, 10.0, 10.0)
+        m.generation = i
+        m.void_fraction.append(VoidFraction(void_fraction=vf, void_fraction_geo=vf_geo))
+        m.gas_loading.append(GasLoading(absolute_volumetric_loading=loading))
+        insert_material_dicts(engine, [material_to_dict(m)])
+    return session
+
+def properties(void_fraction_column="void_fraction"):
+    return [{"table": "void_fraction", "column": void_fraction_column, "range": [0.0, 1.0]},
+            {"table": "gas_loading", "column": "absolute_volumetric_loading", "range": [0.0, 400.0]}]
+
+def test_load_restart_db__reads_properties_and_bins_up_to_generation(session):
+    box_d, box_r, bin_grid, start_gen = htsohm_run.load_restart_db(1, 4, properties(), session)
+    assert box_d.tolist() == [1, 2]
+    assert box_r.flatten().tolist() == approx([0.15, 10.0, 0.55, 390.0])
+    assert bin_grid.bin_counts.sum() == 2
+    assert bin_grid.members(0).tolist() == [0] and bin_grid.members(2 * 4 + 3).tolist() == [1]
+    assert bin_grid.unravel(bin_grid.occupied()) == [(0, 0), (2, 3)]
+    assert start_gen == 2
+
+def test_load_restart_db__uses_configured_void_fraction_column(session):
+    box_d, box_r, bin_grid, _ = htsohm_run.load_restart_db(2, 4, properties("void_fraction_geo"), session)
+    assert box_r[:, 0].tolist() == approx([0.95, 0.05, 0.35])
+    assert set(bin_grid.unravel(bin_grid.occupied())) == {(3, 0), (0, 3), (1, 1)}
+
+def test_load_restart_db__fails_on_materials_missing_a_property(session):
+    engine = db.get_engine()
+    m = Material.one_atom_new(3.0, 50.0, 10.0, 10.0, 10.0)
+    m.generation = 1
+    m.void_fraction.append(VoidFraction(void_fraction=0.25))
+    insert_material_dicts(engine, [material_to_dict(m)])
+
+    with pytest.raises(Exception, match="missing a property"):
+        htsohm_run.load_restart_db(2, 4, properties(), session)
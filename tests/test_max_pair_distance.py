@@ -4,6 +4,7 @@ import pytest
 from pytest import approx
 
 from htsohm.max_pair_distance import minimum_distance_v, minimum_distance_point, max_pair_distance
+from htsohm.db import Structure, AtomSite, AtomTypes
 
 
 def test_minimum_distance_v__within_pbcs():
@@ -41,3 +42,15 @@ def test_max_pair_distance__max_value_should_be_corner_and_center():
     """ max value is sqrt(3) / 2 """
     points = [(0.0, 0.0, 0.0), (0.5, 0.5, 0.5)]
     assert max_pair_distance(points) == approx(3**0.5 / 2)
+
+def test_max_pair_distance__chunks_match_single_block():
+    points = np.random.RandomState(0).random_sample((50, 3))
+    assert max_pair_distance(points, max_chunk_entries=7) == max_pair_distance(points)
+
+def test_structure_max_pair_distance__recomputed_when_sites_move():
+    at = AtomTypes(sigma=1.0, epsilon=1.0)
+    sites = [AtomSite(atom_types=at, x=0.5, y=0.5, z=0.4), AtomSite(atom_types=at, x=0.5, y=0.5, z=0.5)]
+    s = Structure(a=10.0, b=10.0, c=10.0, atom_sites=sites, atom_types=[at])
+    assert s.max_pair_distance == approx(0.1)
+    sites[1].z = 0.7
+    assert s.max_pair_distance == approx(0.3)
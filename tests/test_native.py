@@ -0,0 +1,83 @@
+import itertools
+
+import numpy as np
+import pytest
+from pytest import approx
+
+from htsohm.db import Material, Structure, AtomSite, AtomTypes
+from htsohm.simulation.native.forcefield import LJFramework, guest_lj
+from htsohm.simulation.native.gcmc import GCMC, molecules_uc_to_vv
+from htsohm.simulation.native.widom import widom_void_fraction
+from htsohm.simulation.simulate.gas_loading import run_native
+from htsohm.slog import init_slog
+
+def structure(sites, a=10.0, b=11.0, c=12.0):
+    atom_types = [AtomTypes(sigma=3.0, epsilon=50.0), AtomTypes(sigma=2.0, epsilon=20.0)]
+    atom_sites = [AtomSite(atom_types=atom_types[t], x=x, y=y, z=z, q=0.0) for t, x, y, z in sites]
+    return Structure(a=a, b=b, c=c, atom_sites=atom_sites, atom_types=atom_types)
+
+def brute_force_energy(s, point, cutoff, guest_epsilon, guest_sigma):
+    """sums the shifted LJ energy over every periodic image within the cutoff."""
+    energy = 0.0
+    cell = np.array([s.a, s.b, s.c])
+    for site in s.atom_sites:
+        sigma = (site.atom_types.sigma + guest_sigma) / 2
+        epsilon = (site.atom_types.epsilon * guest_epsilon) ** 0.5
+        for image in itertools.product(range(-3, 4), repeat=3):
+            r = np.linalg.norm(point - (np.array([site.x, site.y, site.z]) + image) * cell)
+            if r < cutoff:
+                energy += 4 * epsilon * ((sigma / r) ** 12 - (sigma / r) ** 6 - (sigma / cutoff) ** 12 + (sigma / cutoff) ** 6)
+    return energy
+
+def test_guest_lj__single_site_molecules():
+    assert guest_lj("helium") == (10.9, 2.64)
+    with pytest.raises(Exception):
+        guest_lj("CO2")
+
+def test_energies__match_sum_over_periodic_images():
+    s = structure([(0, 0.1, 0.2, 0.3), (1, 0.7, 0.9, 0.5), (0, 0.95, 0.05, 0.5)])
+    framework = LJFramework(s, "helium", 12.8)
+    points = np.random.RandomState(0).random_sample((5, 3)) * [10.0, 11.0, 12.0]
+    expected = [brute_force_energy(s, p, 12.8, 10.9, 2.64) for p in points]
+    assert framework.energies(points, max_chunk_entries=100) == approx(expected)
+
+def test_energies__shifted_to_zero_at_cutoff():
+    framework = LJFramework(structure([(0, 0.0, 0.0, 0.0)], 30.0, 30.0, 30.0), "helium", 5.0)
+    assert framework.energies([(4.999999, 0.0, 0.0), (5.0, 0.0, 0.0)]) == approx([0.0, 0.0], abs=1e-4)
+
+def test_widom_void_fraction__empty_framework_is_one():
+    framework = LJFramework(structure([]), "helium", 12.8)
+    assert widom_void_fraction(framework, 298.0, 100) == 1.0
+
+def test_widom_void_fraction__dense_framework_is_zero():
+    sites = [(0, x, y, z) for x, y, z in itertools.product(np.arange(0, 1, 0.2), repeat=3)]
+    framework = LJFramework(structure(sites, 5.0, 5.0, 5.0), "helium", 6.0)
+    assert widom_void_fraction(framework, 298.0, 200) == approx(0.0, abs=1e-6)
+
+def test_molecules_uc_to_vv():
+    assert molecules_uc_to_vv(1000.0) == approx(37.22, rel=1e-3)
+
+def test_gcmc__empty_framework_loads_ideal_gas():
+    framework = LJFramework(structure([], 20.0, 20.0, 20.0), "helium", 6.0)
+    gcmc = GCMC(framework, 298.0, 2.5e6, rng=np.random.RandomState(0))
+    gcmc.run(50)
+    assert np.mean(gcmc.run(300)) == approx(gcmc.beta_fv, rel=0.15)
+
+def test_gcmc__framework_energies_of_adsorbed_molecules_are_kept_up_to_date():
+    s = structure([(0, 0.1, 0.2, 0.3), (1, 0.7, 0.9, 0.5)], 12.0, 12.0, 12.0)
+    gcmc = GCMC(LJFramework(s, "methane", 6.0), 298.0, 1e7, rng=np.random.RandomState(1))
+    gcmc.run(20)
+    assert len(gcmc) > 0
+    assert gcmc.framework_energies == approx(gcmc.framework.energies(gcmc.positions))
+
+def test_gas_loading_run_native__stops_after_max_restarts():
+    simulation_config = {"adsorbate": "methane", "pressure": 1e5, "temperature": 298.0, "cutoff": 6.0,
+                         "engine": "native", "initialization_cycles": 5, "simulation_cycles": 10,
+                         "max_restarts": 2, "restart_err_threshold": 0.0}
+    init_slog()
+    gas_loading = run_native(structure_material(), simulation_config, {})
+    assert gas_loading.cycles == 30
+    assert gas_loading.absolute_volumetric_loading >= 0.0
+
+def structure_material():
+    return Material(structure=structure([(0, 0.1, 0.2, 0.3), (1, 0.7, 0.9, 0.5)], 12.0, 12.0, 12.0))
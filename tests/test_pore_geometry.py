@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+from pytest import approx
+
+from htsohm.pore_geometry import PeriodicUnionFind, PoreNetwork, calculate_pore_geometry
+from htsohm.void_fraction import calculate_void_fraction
+
+def test_periodic_union_find__loop_with_net_offset_percolates():
+    uf = PeriodicUnionFind(3)
+    assert not uf.union(0, 1, np.array([0, 0, 0]))
+    assert not uf.union(1, 2, np.array([1, 0, 0]))
+    assert not uf.union(2, 0, np.array([-1, 0, 0]))
+    assert uf.union(0, 0, np.array([0, 1, 0]))
+
+def test_pore_network__simple_cubic_lattice():
+    # cavity at the cube corner, 8 atoms around it; window at the face center between 4 atoms
+    net = PoreNetwork([(5.0, 5.0, 5.0, 4.0)], (10.0, 10.0, 10.0))
+    assert net.largest_cavity_diameter == approx(2 * (5 * 3 ** 0.5 - 2))
+    assert net.pore_limiting_diameter == approx(2 * (5 * 2 ** 0.5 - 2))
+
+def test_pore_network__probe_larger_than_window_has_no_accessible_volume():
+    net = PoreNetwork([(5.0, 5.0, 5.0, 4.0)], (10.0, 10.0, 10.0))
+    assert net.accessible_volume_fraction(5 * 2 ** 0.5 - 2 + 0.1) == 0.0
+
+def test_pore_network__isolated_cavities_are_not_accessible():
+    # a small probe fits in the cavities of a dense lattice but not through its windows
+    net = PoreNetwork([(5.0, 5.0, 5.0, 9.0)], (6.0, 6.0, 6.0))
+    window_r, cavity_r = 3 * 2 ** 0.5 - 4.5, 3 * 3 ** 0.5 - 4.5
+    assert window_r < 0 < cavity_r
+    assert net.pore_limiting_diameter == 0.0
+    assert net.accessible_volume_fraction(0.0) == 0.0
+
+@pytest.mark.parametrize("probe_r", [0.0, 1.0])
+def test_calculate_pore_geometry__open_framework_matches_geometric_void_fraction(probe_r):
+    rng = np.random.RandomState(0)
+    box = (12.0, 11.0, 10.0)
+    atoms = [tuple(rng.random_sample(3) * box) + (rng.uniform(2.0, 3.0),) for _ in range(10)]
+    vf, lcd, pld = calculate_pore_geometry(atoms, box, probe_r, num_points=20000, rng=rng)
+    assert vf == approx(calculate_void_fraction(atoms, box, probe_r=probe_r), abs=0.02)
+    assert lcd >= pld > 2 * probe_r
+
+def test_calculate_pore_geometry__empty_framework():
+    assert calculate_pore_geometry([], (10.0, 10.0, 10.0)) == (1.0, None, None)
@@ -0,0 +1,85 @@
+from pytest import approx
+
+from htsohm.bin_grid import BinGrid
+from htsohm.db import Material
+from htsohm.db.bulk import material_to_dict
+from htsohm.prescreen import Prescreen, descriptors
+
+config = {
+    'number_of_convergence_bins': 4,
+    'properties': [{"table": "void_fraction", "column": "void_fraction", "range": [0.0, 40.0]}],
+    'prescreen_neighbors': 1,
+    'prescreen_min_training': 2,
+    'prescreen_saturation': 2,
+    'prescreen_max_attempts': 3,
+    'prescreen_window': 100,
+    'prescreen_max_rejection': 0.9,
+}
+
+def material(a):
+    return material_to_dict(Material.one_atom_new(3.0, 50.0, a, a, a))
+
+def test_descriptors__densities_and_site_statistics():
+    d = descriptors(material(10.0))
+    assert d[:5] == approx([10.0, 10.0, 10.0, 1 / 1000, 50.0 / 1000])
+    assert d[5:9] == approx([3.0, 0.0, 3.0, 3.0])
+
+def test_predict__nearest_neighbor_in_descriptor_space():
+    prescreen = Prescreen(config)
+    prescreen.add([material(a) for a in [10.0, 20.0, 30.0]], [[10.0], [20.0], [30.0]])
+    assert prescreen.predict([material(12.0), material(29.0)]).flatten() == approx([10.0, 30.0])
+
+def test_screen__replaces_children_predicted_for_saturated_bins():
+    prescreen = Prescreen(config)
+    prescreen.add([material(a) for a in [10.0, 30.0]], [[5.0], [35.0]])
+    prescreen.bin_grid = BinGrid.from_bin_ids([0, 0], 4, 1)
+    prescreen.select_parents = lambda n: [31.0] * n
+
+    tasks = prescreen.screen(lambda a: (material(a), "log"), [11.0, 29.0])
+    assert [parent for _, parent, _ in tasks] == [31.0, 29.0]
+    assert prescreen.num_rejected == 1 and prescreen.num_screened == 3
+
+def test_screen__keeps_last_child_after_max_attempts():
+    prescreen = Prescreen(config)
+    prescreen.add([material(a) for a in [10.0, 30.0]], [[5.0], [35.0]])
+    prescreen.bin_grid = BinGrid.from_bin_ids([0, 0], 4, 1)
+    prescreen.select_parents = lambda n: [10.0] * n
+
+    [(child, parent, log)] = prescreen.screen(lambda a: (material(a), "log"), [11.0])
+    assert parent == 10.0 and log == "log"
+    assert prescreen.num_rejected == 3
+    assert prescreen.num_replaced == 2
+    assert prescreen.generation_counts() == (3, 3, 2)
+    assert prescreen.generation_counts() == (0, 0, 0)
+
+def test_screen__stops_for_the_generation_when_nearly_all_are_rejected():
+    prescreen = Prescreen(config)
+    prescreen.add([material(a) for a in [10.0, 30.0]], [[5.0], [35.0]])
+    prescreen.bin_grid = BinGrid.from_bin_ids([0, 0], 4, 1)
+    prescreen.select_parents = lambda n: [10.0] * n
+
+    tasks = prescreen.screen(lambda a: (material(a), "log"), [11.0] * 30)
+    assert [parent for _, parent, _ in tasks] == [11.0] * 30
+    assert (prescreen.num_screened, prescreen.num_rejected, prescreen.num_replaced) == (30, 30, 0)
+    assert prescreen.stopped
+    prescreen.screen(lambda a: (material(a), "log"), [11.0])
+    assert prescreen.num_screened == 30
+
+    assert prescreen.generation_counts() == (30, 30, 0)
+    assert not prescreen.stopped
+
+def test_fit__keeps_a_window_and_refits_in_batches():
+    prescreen = Prescreen(dict(config, prescreen_window=20))
+    for a in range(10, 50):
+        prescreen.add([material(float(a))], [[float(a)]])
+    prescreen.predict([material(12.0)])
+    assert len(prescreen) == 20
+    assert prescreen.predict([material(12.0)]).flatten() == approx([30.0])
+
+    prescreen.add([material(60.0)], [[60.0]])
+    prescreen.predict([material(12.0)])
+    assert prescreen.num_fits == 1
+    prescreen.add([material(61.0)], [[61.0]])
+    prescreen.add([material(62.0)], [[62.0]])
+    assert prescreen.predict([material(62.0)]).flatten() == approx([62.0])
+    assert prescreen.num_fits == 2 and len(prescreen) == 20
@@ -0,0 +1,39 @@
+from pytest import approx
+
+from htsohm import db
+from htsohm.db import Material, VoidFraction, GasLoading, SurfaceArea
+from htsohm.db.bulk import material_to_dict, insert_material_dicts
+from htsohm.properties import material_properties, load_properties, default_properties
+
+properties = [
+    {"table": "void_fraction", "column": "void_fraction", "range": [0.0, 1.0]},
+    {"table": "gas_loading", "column": "absolute_volumetric_loading", "range": [0.0, 400.0], "adsorbate": "CO2"},
+    {"table": "surface_area", "column": "volumetric_surface_area", "range": [0.0, 4000.0]},
+]
+
+def new_material(generation, vf, methane, co2, sa):
+    m = Material.one_atom_new(3.0, 50.0, 10.0, 10.0, 10.0)
+    m.generation = generation
+    m.void_fraction.append(VoidFraction(void_fraction=vf))
+    m.gas_loading.append(GasLoading(adsorbate="methane", absolute_volumetric_loading=methane))
+    m.gas_loading.append(GasLoading(adsorbate="CO2", absolute_volumetric_loading=co2))
+    m.surface_area.append(SurfaceArea(volumetric_surface_area=sa))
+    return m
+
+def test_material_properties__selects_rows_by_adsorbate():
+    m = material_to_dict(new_material(0, 0.5, 100.0, 200.0, 1000.0))
+    assert material_properties(m, properties) == approx((0.5, 200.0, 1000.0))
+    assert material_properties(m, properties[1:2] + [dict(properties[1], adsorbate="methane")]) == approx((200.0, 100.0))
+
+def test_load_properties__three_properties_up_to_generation():
+    engine, session = db.init_database("sqlite://")
+    insert_material_dicts(engine, [material_to_dict(new_material(g, 0.1 * g, 10.0 * g, 20.0 * g, 100.0 * g))
+                                   for g in range(4)])
+    box_d, box_r = load_properties(session, properties, 2)
+    assert box_d.tolist() == [1, 2, 3]
+    assert box_r.shape == (3, 3)
+    assert box_r[2].tolist() == approx([0.2, 40.0, 200.0])
+
+def test_default_properties__uses_void_fraction_subtype():
+    config = {"void_fraction_subtype": "geo", "prop1range": [0.0, 1.0], "prop2range": [0.0, 300.0]}
+    assert [p["column"] for p in default_properties(config)] == ["void_fraction_geo", "absolute_volumetric_loading"]
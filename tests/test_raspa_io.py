@@ -0,0 +1,70 @@
+import os
+from types import SimpleNamespace
+
+from htsohm.db import Material, AtomSite, AtomTypes
+from htsohm.simulation.raspa import output_directory, count_io, io_counters, write_mol_file
+from htsohm.simulation.raspa import write_framework_files, link_framework_files, remove_framework_bundle
+from htsohm.simulation.templates import load_template
+
+def test_output_directory_is_created_under_scratch_root(tmpdir):
+    material = SimpleNamespace(uuid="abc")
+    output_dir = output_directory(material, {"scratch_root": str(tmpdir)})
+    assert os.path.isdir(output_dir)
+    assert os.path.dirname(output_dir) == str(tmpdir)
+    assert os.path.basename(output_dir).startswith("output_abc_")
+    assert output_directory(material, {"scratch_root": str(tmpdir)}) != output_dir
+
+def test_count_io_sums_files_and_bytes(tmpdir):
+    os.makedirs(os.path.join(str(tmpdir), "Output", "System_0"))
+    with open(os.path.join(str(tmpdir), "a.input"), "w") as f:
+        f.write("x" * 10)
+    with open(os.path.join(str(tmpdir), "Output", "System_0", "out.data"), "w") as f:
+        f.write("y" * 25)
+
+    io_counters["files"] = io_counters["bytes"] = 0
+    assert count_io(str(tmpdir)) == (2, 35)
+    assert count_io(str(tmpdir)) == (2, 35)
+    assert io_counters == {"files": 4, "bytes": 70}
+
+def test_framework_bundle_is_shared_through_hardlinks(tmpdir):
+    material = Material.one_atom_new(3.0, 50.0, 10.0, 11.0, 12.0)
+    config = {"scratch_root": str(tmpdir)}
+    output_dirs = [output_directory(material, config) for _ in range(2)]
+    for output_dir in output_dirs:
+        link_framework_files(material, output_dir, config)
+
+    expected = os.path.join(str(tmpdir), "expected")
+    os.makedirs(expected)
+    write_framework_files(material, expected)
+    filenames = sorted(os.listdir(expected))
+    assert filenames == sorted(["%s.mol" % material.uuid, "force_field_mixing_rules.def",
+                                "pseudo_atoms.def", "force_field.def"])
+    for output_dir in output_dirs:
+        assert sorted(os.listdir(output_dir)) == filenames
+        for filename in filenames:
+            assert os.stat(os.path.join(output_dir, filename)).st_nlink == 3
+            with open(os.path.join(output_dir, filename)) as f, open(os.path.join(expected, filename)) as g:
+                assert f.read() == g.read()
+
+    # the linked files are only counted once, with the bundle
+    io_counters["files"] = io_counters["bytes"] = 0
+    assert count_io(output_dirs[0])[1] == 0
+    remove_framework_bundle(material)
+    assert len(os.listdir(str(tmpdir))) == 3
+    assert io_counters["files"] == 8
+    assert io_counters["bytes"] > 0
+
+def test_write_mol_file__uses_atom_type_positions(tmpdir):
+    material = Material.one_atom_new(3.0, 50.0, 10.0, 11.0, 12.0)
+    s = material.structure
+    s.atom_types.append(AtomTypes(sigma=2.0, epsilon=20.0))
+    s.atom_sites.append(AtomSite(atom_types=s.atom_types[1], x=0.5, y=0.5, z=0.5, q=0.0))
+    write_mol_file(material, str(tmpdir))
+    with open(os.path.join(str(tmpdir), "%s.mol" % material.uuid)) as f:
+        lines = f.read().split("\n")
+    assert lines[4].split()[4] == "0"
+    assert lines[5].split()[4] == "1"
+    assert lines[5].split()[1:4] == ["5.0000", "5.5000", "6.0000"]
+
+def test_load_template_is_cached():
+    assert load_template("input_file_templates/gas_loading.input") is load_template("input_file_templates/gas_loading.input")
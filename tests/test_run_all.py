@@ -0,0 +1,74 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from htsohm.db import Material
+from htsohm.simulation import run_all
+from htsohm.simulation.run_all import run_all_simulations, simulation_dependencies
+from htsohm.slog import init_slog, get_slog, slog
+
+class FakeSimulation:
+    def __init__(self, depends_on, resource, events, duration=0.1):
+        self.depends_on = depends_on
+        self.resource = resource
+        self.events = events
+        self.duration = duration
+
+    def resources(self, simulation_config):
+        return {self.resource}
+
+    def run(self, material, simulation_config, config):
+        self.events.append(("start", simulation_config["name"], time.perf_counter()))
+        slog("running %s" % simulation_config["name"])
+        time.sleep(self.duration)
+        self.events.append(("end", simulation_config["name"], time.perf_counter()))
+
+@pytest.fixture
+def events(monkeypatch):
+    events = []
+    monkeypatch.setattr(run_all, "simulate", SimpleNamespace(
+        void_fraction=FakeSimulation([], "process", events),
+        geo=FakeSimulation([], "python", events),
+        gas_loading=FakeSimulation(["void_fraction"], "process", events),
+        surface_area=FakeSimulation([], "python", events)))
+    return events
+
+def times(events):
+    return {(kind, name): t for kind, name, t in events}
+
+simulations = {1: {"type": "void_fraction", "name": "vf"},
+               2: {"type": "gas_loading", "name": "gl"},
+               3: {"type": "surface_area", "name": "sa"},
+               4: {"type": "geo", "name": "geo"}}
+
+def test_simulation_dependencies(events):
+    sims = dict(simulations)
+    sims[5] = {"type": "gas_loading", "name": "gl2"}
+    sims[6] = {"type": "void_fraction", "name": "vf2", "depends_on": [3]}
+    assert simulation_dependencies(sims) == {1: [], 2: [1], 3: [], 4: [], 5: [1, 2], 6: [3]}
+
+def test_run_all_simulations__sequential_by_default(events):
+    init_slog()
+    run_all_simulations(Material.one_atom_new(3.0, 50.0, 10.0, 10.0, 10.0), {"simulations": simulations})
+    assert [name for kind, name, _ in events if kind == "start"] == ["vf", "gl", "sa", "geo"]
+
+def test_run_all_simulations__concurrent(events):
+    init_slog()
+    run_all_simulations(Material.one_atom_new(3.0, 50.0, 10.0, 10.0, 10.0), {"simulations": simulations, "max_concurrent_simulations": 4})
+    t = times(events)
+    # gas loading waits for the void fraction
+    assert t["start", "gl"] >= t["end", "vf"]
+    # independent simulations overlap, but only one python one at a time
+    assert t["start", "sa"] < t["end", "vf"]
+    assert t["start", "geo"] >= t["end", "sa"] or t["start", "sa"] >= t["end", "geo"]
+    # the logs are kept in blocks, in the order of the config
+    log = get_slog()
+    positions = [log.index("running %s" % name) for name in ["vf", "gl", "sa", "geo"]]
+    assert positions == sorted(positions)
+
+def test_run_all_simulations__missing_dependency(events):
+    init_slog()
+    sims = {1: {"type": "void_fraction", "name": "vf", "depends_on": [7]}}
+    with pytest.raises(Exception):
+        run_all_simulations(Material.one_atom_new(3.0, 50.0, 10.0, 10.0, 10.0), {"simulations": sims, "max_concurrent_simulations": 2})
@@ -0,0 +1,114 @@
+import os
+
+import numpy as np
+import pytest
+
+from htsohm.run_state import AppendArray, RunState
+
+def append_generation(state, start, n):
+    ids = np.arange(start, start + n)
+    state.append(ids, np.stack([ids * 0.1, ids * 2.0], axis=1), ids % 7)
+
+def test_append_array__grows_and_keeps_rows(tmp_path):
+    arr = AppendArray(str(tmp_path / "a.bin"), np.int64)
+    for i in range(5):
+        arr.append(np.arange(i * 1000, (i + 1) * 1000))
+    assert arr.length == 5000
+    assert arr.capacity >= 5000
+    assert (arr.data == np.arange(5000)).all()
+
+    arr.compact()
+    assert arr.capacity == 5000
+    assert os.path.getsize(arr.path) == 5000 * 8
+
+def test_run_state__reopen_returns_committed_rows(tmp_path):
+    state = RunState.create(str(tmp_path), 2)
+    append_generation(state, 1, 10)
+    state.commit(0)
+    append_generation(state, 11, 10)
+    state.commit(1)
+
+    reopened = RunState.open(str(tmp_path))
+    assert reopened.generation == 1
+    assert (reopened.box_d == np.arange(1, 21)).all()
+    assert reopened.box_r[5] == pytest.approx((0.6, 12.0))
+    assert (reopened.bin_ids == np.arange(1, 21) % 7).all()
+
+def test_run_state__uncommitted_rows_are_not_reopened(tmp_path):
+    state = RunState.create(str(tmp_path), 2)
+    append_generation(state, 1, 10)
+    state.commit(0)
+    append_generation(state, 11, 10)
+
+    assert RunState.open(str(tmp_path)).length == 10
+
+def test_run_state__snapshot_can_be_reopened_and_continued(tmp_path):
+    state = RunState.create(str(tmp_path), 2)
+    append_generation(state, 1, 10)
+    state.commit(0, snapshot=True)
+    append_generation(state, 11, 10)
+    state.commit(1)
+
+    snapshot = RunState.open(str(tmp_path), 0)
+    assert snapshot.length == 10
+    append_generation(snapshot, 100, 5)
+    snapshot.commit(1)
+
+    reopened = RunState.open(str(tmp_path))
+    assert reopened.box_d.tolist() == list(range(1, 11)) + list(range(100, 105))
+
+def test_run_state__truncated_file_is_detected(tmp_path):
+    state = RunState.create(str(tmp_path), 2)
+    append_generation(state, 1, 10)
+    state.commit(0)
+    state.compact()
+
+    with open(os.path.join(str(tmp_path), "box_r.bin"), "r+b") as f:
+        f.truncate(100)
+    with pytest.raises(Exception, match="truncated or corrupt"):
+        RunState.open(str(tmp_path))
+
+def test_run_state__corrupt_file_is_detected(tmp_path):
+    state = RunState.create(str(tmp_path), 2)
+    append_generation(state, 1, 10)
+    state.commit(0)
+
+    with open(os.path.join(str(tmp_path), "box_d.bin"), "r+b") as f:
+        f.write(b"\xff")
+    with pytest.raises(Exception, match="truncated or corrupt"):
+        RunState.open(str(tmp_path))
+
+def test_run_state__restart_reopens_and_keeps_earlier_snapshots(tmp_path):
+    state = RunState.create(str(tmp_path), 2)
+    for gen in range(4):
+        append_generation(state, gen * 10 + 1, 10)
+        state.commit(gen, snapshot=True)
+
+    # restarting from generation 2 with the rows the database has through generation 1
+    db = RunState.open(str(tmp_path), 1)
+    restarted = RunState.reopen_or_create(str(tmp_path), db.box_d.copy(), db.box_r.copy(),
+                                          db.bin_ids.copy(), 1)
+    assert restarted.length == 20
+    assert sorted(restarted.snapshots) == [0, 1]
+    append_generation(restarted, 100, 10)
+    restarted.commit(2)
+
+    assert RunState.open(str(tmp_path), 0).box_d.tolist() == list(range(1, 11))
+    assert RunState.open(str(tmp_path)).box_d.tolist() == list(range(1, 21)) + list(range(100, 110))
+
+def test_run_state__restart_rebuilds_mismatched_or_damaged_state(tmp_path):
+    state = RunState.create(str(tmp_path), 2)
+    append_generation(state, 1, 10)
+    state.commit(0, snapshot=True)
+
+    ids = np.arange(50, 55)
+    box_r = np.stack([ids * 0.1, ids * 2.0], axis=1)
+    rebuilt = RunState.reopen_or_create(str(tmp_path), ids, box_r, ids % 7, 0)
+    assert rebuilt.snapshots == {}
+    assert RunState.open(str(tmp_path)).box_d.tolist() == list(range(50, 55))
+
+    with open(rebuilt.arrays["box_r"].path, "r+b") as f:
+        f.write(b"\xff" * 8)
+    rebuilt = RunState.reopen_or_create(str(tmp_path), ids, box_r, ids % 7, 0)
+    assert rebuilt.length == 5
+    assert RunState.open(str(tmp_path)).box_d.tolist() == list(range(50, 55))
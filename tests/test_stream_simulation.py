@@ -0,0 +1,86 @@
+import os
+import stat
+import sys
+import time
+
+import pytest
+
+from htsohm.simulation.raspa import stream_simulation
+from htsohm.simulation.simulate.gas_loading import LoadingMonitor
+
+conversion_line = "\tConversion factor molecules/unit cell -> cm^3 STP/cm^3:  10.000 [-]"
+
+def status_lines(cycle, loading, init=False):
+    return ["%sCurrent cycle: %d out of 1000" % ("[Init] " if init else "", cycle),
+            "\tabsolute adsorption: %9.5f (avg. %9.5f) [mol/uc],   0.1 (avg.   0.1) [mol/kg]" % (loading, loading)]
+
+def test_loading_monitor_stops_once_the_blocks_agree():
+    config = {"restart_err_threshold": 1.0, "stream_min_samples": 10}
+    monitor = LoadingMonitor([], 0, 1, config)
+    assert not monitor(conversion_line)
+    assert monitor.atoms_uc_to_vv == 10.0
+
+    # initialization cycles are not sampled
+    for line in status_lines(0, 100.0, init=True):
+        assert not monitor(line)
+    assert monitor.samples == []
+
+    lines = [line for cycle in range(10, 200, 10) for line in status_lines(cycle, 2.0)]
+    stops = [i for i, line in enumerate(lines) if monitor(line)]
+    assert stops[0] == 2 * 10 - 1
+    assert monitor.cycle == 190
+    assert monitor.blocks() == [20.0] * 5
+    assert len(monitor.samples) == 19
+    assert monitor.statistics() == (20.0, 0.0)
+
+def test_loading_monitor_waits_for_a_small_error():
+    monitor = LoadingMonitor([], 0, 1, {"restart_err_threshold": 1.0, "stream_min_samples": 5})
+    monitor(conversion_line)
+    loadings = [1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0, 9.0, 10.0]
+    assert not any(monitor(line) for cycle, loading in enumerate(loadings) for line in status_lines(cycle, loading))
+
+fake_simulate = """#!{python}
+import os, sys, time
+os.makedirs("Output/System_0", exist_ok=True)
+print("starting")
+with open("Output/System_0/output.data", "w") as f:
+    for i in range({num_lines}):
+        f.write("line %d\\n" % i)
+        f.flush()
+        time.sleep(0.01)
+sys.exit({exit_code})
+"""
+
+@pytest.fixture
+def simulate(tmpdir, monkeypatch):
+    def write(num_lines, exit_code=0):
+        path = os.path.join(str(tmpdir), "bin", "simulate")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(fake_simulate.format(python=sys.executable, num_lines=num_lines, exit_code=exit_code))
+        os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+        monkeypatch.setenv("PATH", os.path.dirname(path) + os.pathsep + os.environ["PATH"])
+        output_dir = os.path.join(str(tmpdir), "run")
+        os.makedirs(output_dir, exist_ok=True)
+        return output_dir
+    return write
+
+def test_stream_simulation_reads_every_line(simulate):
+    output_dir = simulate(20)
+    lines = []
+    stdout, stopped = stream_simulation("x.input", output_dir, lambda line: lines.append(line), poll_interval=0.02)
+    assert not stopped
+    assert stdout.strip() == "starting"
+    assert lines == ["line %d" % i for i in range(20)]
+
+def test_stream_simulation_stops_early(simulate):
+    output_dir = simulate(1000)
+    tbegin = time.perf_counter()
+    _, stopped = stream_simulation("x.input", output_dir, lambda line: line == "line 5", poll_interval=0.02)
+    assert stopped
+    assert time.perf_counter() - tbegin < 5
+
+def test_stream_simulation_raises_on_failure(simulate):
+    output_dir = simulate(1, exit_code=1)
+    with pytest.raises(Exception):
+        stream_simulation("x.input", output_dir, lambda line: False, poll_interval=0.02)
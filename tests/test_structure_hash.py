@@ -0,0 +1,75 @@
+from htsohm import db
+from htsohm.db import Material, Structure, AtomSite, AtomTypes, VoidFraction, GasLoading
+from htsohm.db.bulk import material_to_dict, insert_material_dicts
+from htsohm.simulation.cache import reuse_cached_results, simulation_hash
+from htsohm.simulation.run_all import run_all_simulations
+from htsohm.slog import init_slog
+from htsohm.structure_hash import structure_hash
+
+simulations = {1: {"type": "void_fraction", "temperature": 298.0}}
+
+def material(sites, types=((3.0, 50.0), (2.0, 20.0)), a=10.0):
+    atom_types = [AtomTypes(sigma=sigma, epsilon=epsilon) for sigma, epsilon in types]
+    atom_sites = [AtomSite(atom_types=atom_types[t], x=x, y=y, z=z, q=0.0) for t, x, y, z in sites]
+    return Material(structure=Structure(a=a, b=11.0, c=12.0, atom_sites=atom_sites, atom_types=atom_types))
+
+sites = [(0, 0.1, 0.2, 0.3), (1, 0.7, 0.9, 0.5), (0, 0.4, 0.4, 0.9)]
+
+def test_structure_hash__ignores_order_of_sites_and_types():
+    h = structure_hash(material(sites).structure, simulations)
+    assert structure_hash(material(sites[::-1]).structure, simulations) == h
+    swapped = [(1 - t, x, y, z) for t, x, y, z in sites]
+    assert structure_hash(material(swapped, types=((2.0, 20.0), (3.0, 50.0))).structure, simulations) == h
+
+def test_structure_hash__ignores_periodic_translation():
+    h = structure_hash(material(sites).structure, simulations)
+    shifted = [(t, (x + 0.35) % 1.0, (y + 0.6) % 1.0, (z - 0.25) % 1.0) for t, x, y, z in sites]
+    assert structure_hash(material(shifted).structure, simulations) == h
+
+def test_structure_hash__is_rounded_to_digits():
+    h = structure_hash(material(sites).structure, simulations, digits=4)
+    nudged = [(t, x + 1e-7, y, z) for t, x, y, z in sites]
+    assert structure_hash(material(nudged).structure, simulations, digits=4) == h
+    moved = [(t, x + 1e-3, y, z) if i == 0 else (t, x, y, z) for i, (t, x, y, z) in enumerate(sites)]
+    assert structure_hash(material(moved).structure, simulations, digits=4) != h
+
+def test_structure_hash__depends_on_lattice_types_and_simulations():
+    h = structure_hash(material(sites).structure, simulations)
+    assert structure_hash(material(sites, a=10.5).structure, simulations) != h
+    assert structure_hash(material(sites, types=((3.0, 51.0), (2.0, 20.0))).structure, simulations) != h
+    assert structure_hash(material(sites).structure, {1: {"type": "void_fraction", "temperature": 77.0}}) != h
+
+def test_simulation_hash__includes_engine_settings():
+    config = {"simulations": simulations, "energy_grid_spacing": False}
+    h = simulation_hash(material(sites).structure, config)
+    assert simulation_hash(material(sites).structure, dict(config, energy_grid_spacing=0.2)) != h
+    assert simulation_hash(material(sites).structure, dict(config, number_of_convergence_bins=20)) != h
+    assert simulation_hash(material(sites).structure, dict(config, simulation_cache=True)) == h
+
+def test_reuse_cached_results__copies_results_from_cache_db(tmpdir):
+    connection_string = "sqlite:///%s" % tmpdir.join("cache.db")
+    engine, _ = db.init_database(connection_string)
+    config = {"simulations": simulations, "simulation_cache": True, "simulation_cache_db": connection_string,
+              "database_connection_string": "sqlite://"}
+    simulated = material(sites)
+    simulated.structure_hash = simulation_hash(simulated.structure, config)
+    simulated.void_fraction.append(VoidFraction(void_fraction=0.5, temperature=298.0))
+    simulated.gas_loading.append(GasLoading(absolute_volumetric_loading=100.0, cycles=10))
+    insert_material_dicts(engine, [material_to_dict(simulated)])
+
+    shifted = material_to_dict(material([(t, (x + 0.5) % 1.0, y, z) for t, x, y, z in sites]))
+    assert reuse_cached_results(shifted, config) == simulated.uuid
+    assert shifted["structure_hash"] == simulated.structure_hash
+    assert shifted["void_fraction"][0]["void_fraction"] == 0.5
+    assert shifted["gas_loading"][0]["absolute_volumetric_loading"] == 100.0
+    assert shifted["surface_area"] == []
+
+    other = material_to_dict(material(sites, a=10.5))
+    assert reuse_cached_results(other, config) is None
+    assert other["structure_hash"] is not None and other["void_fraction"] == []
+
+def test_run_all_simulations__does_not_hash():
+    init_slog()
+    m = material(sites)
+    run_all_simulations(m, {"simulations": {}})
+    assert m.structure_hash is None
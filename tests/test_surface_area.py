@@ -0,0 +1,62 @@
+import math
+
+import numpy as np
+import pytest
+from pytest import approx
+
+from htsohm.db import Material, Structure, AtomSite, AtomTypes
+from htsohm.simulation.native.surface_area import fibonacci_sphere, accessible_surface_area
+from htsohm.simulation.simulate.surface_area import run_native
+from htsohm.slog import init_slog
+
+def structure(positions, a=20.0, sigma=3.0):
+    at = AtomTypes(sigma=sigma, epsilon=10.0)
+    sites = [AtomSite(atom_types=at, x=x, y=y, z=z, q=0.0) for x, y, z in positions]
+    return Structure(a=a, b=a, c=a, atom_sites=sites, atom_types=[at])
+
+def test_fibonacci_sphere__unit_vectors_centered_on_origin():
+    points = fibonacci_sphere(1000)
+    assert np.linalg.norm(points, axis=1) == approx(np.ones(1000))
+    assert points.mean(axis=0) == approx(np.zeros(3), abs=1e-3)
+
+def test_accessible_surface_area__isolated_atom_is_whole_sphere():
+    # radius is the mixed sigma of the atom and the probe: (3.0 + 1.0) / 2
+    assert accessible_surface_area(structure([(0.5, 0.5, 0.5)]), 1.0) == approx(4 * math.pi * 2.0 ** 2)
+
+@pytest.mark.parametrize("positions", [[(0.5, 0.5, 0.5), (0.6, 0.5, 0.5)],
+                                       [(0.95, 0.5, 0.5), (0.05, 0.5, 0.5)]])
+def test_accessible_surface_area__overlapping_atoms_lose_caps(positions):
+    # atoms 2 A apart with radius 2 A: each loses a cap of height 1 A
+    expected = 2 * (4 * math.pi * 2.0 ** 2 - 2 * math.pi * 2.0 * 1.0)
+    assert accessible_surface_area(structure(positions), 1.0, num_points=4000) == approx(expected, rel=1e-3)
+
+def test_accessible_surface_area__empty_structure():
+    assert accessible_surface_area(structure([]), 1.0) == 0.0
+
+def test_run_native__fills_surface_area_columns():
+    init_slog()
+    m = Material(structure=structure([(0.5, 0.5, 0.5)], a=10.0))
+    run_native(m, {"adsorbate": "N2"})
+    [sa] = m.surface_area
+    assert sa.unit_cell_surface_area == approx(4 * math.pi * ((3.0 + 3.31) / 2) ** 2)
+    assert sa.volumetric_surface_area == approx(sa.unit_cell_surface_area / 1000 * 1e4)
+    assert sa.gravimetric_surface_area == approx(sa.unit_cell_surface_area * 1e-20 * 6.02214076e23 / 12.0)
+
+@pytest.mark.parametrize("positions", [[(0.5, 0.5, 0.5)], [(0.0, 0.0, 0.0)]])
+def test_accessible_surface_area__small_cell_overlaps_own_images(positions):
+    # radius 2 A in a 3.5 A cell: the 6 face images 3.5 A away each bury a cap of height 0.25 A, and
+    # the caps don't meet, nor do the images further out reach the sphere. RASPA, which repeats the
+    # cell out to the cutoff, gets the same area.
+    expected = 4 * math.pi * 2.0 ** 2 - 6 * 2 * math.pi * 2.0 * 0.25
+    area = accessible_surface_area(structure(positions, a=3.5), 1.0, num_points=20000)
+    assert area == approx(expected, rel=2e-3)
+
+def test_accessible_surface_area__small_cell_matches_supercell():
+    # the area of a cell too small for the minimum image is a quarter of the area of a 2x2x1 supercell
+    cell = [(0.1, 0.2, 0.3), (0.6, 0.5, 0.9)]
+    supercell = [((x + i) / 2, (y + j) / 2, z) for i in range(2) for j in range(2) for x, y, z in cell]
+    small = structure(cell, a=5.0)
+    big = Structure(a=10.0, b=10.0, c=5.0, atom_sites=[AtomSite(atom_types=small.atom_types[0], x=x, y=y, z=z, q=0.0)
+                                                       for x, y, z in supercell], atom_types=small.atom_types)
+    assert accessible_surface_area(small, 1.0, num_points=4000) == approx(
+        accessible_surface_area(big, 1.0, num_points=4000) / 4, rel=1e-6)
@@ -0,0 +1,77 @@
+from multiprocessing import Process
+from operator import mul
+import time
+
+import pytest
+
+from htsohm.task_queue import TaskQueue, QueuePool, run_worker
+
+@pytest.fixture
+def queue_path(tmp_path):
+    return str(tmp_path / "queue.sqlite")
+
+def test_claim__returns_oldest_pending_task_once(queue_path):
+    q = TaskQueue(queue_path)
+    t1 = q.submit(mul, (2, 3))
+    t2 = q.submit(mul, (4, 5))
+    assert q.claim("w1") == (t1, mul, (2, 3))
+    assert q.claim("w2") == (t2, mul, (4, 5))
+    assert q.claim("w3") is None
+
+def test_complete__result_is_popped_once(queue_path):
+    q = TaskQueue(queue_path)
+    t1 = q.submit(mul, (2, 3))
+    q.claim("w1")
+    assert q.complete(t1, "w1", 6)
+    assert q.pop_finished() == [(t1, 6, False)]
+    assert q.pop_finished() == []
+
+def test_requeue_expired__redispatches_task_and_drops_stale_result(queue_path):
+    q = TaskQueue(queue_path, lease_seconds=0.0)
+    t1 = q.submit(mul, (2, 3))
+    q.claim("w1")
+    time.sleep(0.01)
+    assert q.requeue_expired() == 1
+    assert not q.heartbeat(t1, "w1")
+
+    q.lease_seconds = 60.0
+    assert q.claim("w2")[0] == t1
+    assert not q.complete(t1, "w1", 6)
+    assert q.complete(t1, "w2", 6)
+
+def test_requeue_expired__fails_task_after_max_attempts(queue_path):
+    q = TaskQueue(queue_path, lease_seconds=0.0, max_attempts=2)
+    t1 = q.submit(mul, (2, 3))
+    for _ in range(2):
+        q.claim("w1")
+        time.sleep(0.01)
+        q.requeue_expired()
+
+    [(task_id, result, failed)] = q.pop_finished()
+    assert task_id == t1 and failed
+    assert isinstance(result, Exception)
+
+def test_queue_pool__runs_tasks_on_local_worker_processes(queue_path):
+    with QueuePool(queue_path, lease_seconds=5.0, poll_interval=0.05) as pool:
+        workers = [Process(target=run_worker, args=(queue_path,), kwargs={"poll_interval": 0.05})
+                   for _ in range(3)]
+        for w in workers:
+            w.start()
+
+        assert pool.starmap(mul, [(i, i) for i in range(20)]) == [i * i for i in range(20)]
+        with pytest.raises(TypeError):
+            pool.apply_async(mul, (None, 1)).get(timeout=10)
+
+        pool.close()
+        for w in workers:
+            w.join(timeout=10)
+            assert w.exitcode == 0
+
+def test_tasks_in_flight__not_limited_to_local_processes_with_a_task_queue():
+    from htsohm.htsohm_run import tasks_in_flight
+    config = {"task_queue_path": False, "task_queue_in_flight": False, "children_per_generation": 20}
+    assert tasks_in_flight(4, config) == 4
+    config["task_queue_path"] = "queue.sqlite"
+    assert tasks_in_flight(4, config) == 20
+    config["task_queue_in_flight"] = 64
+    assert tasks_in_flight(4, config) == 64
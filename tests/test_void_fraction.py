@@ -1,9 +1,12 @@
+import itertools
 import math
 
+import numpy as np
 import pytest
 from pytest import approx
 
-from htsohm.void_fraction import calculate_void_fraction
+from htsohm.void_fraction import calculate_void_fraction, calculate_void_fractions, calculate_void_fraction_mc
+from htsohm.simulation.simulate.void_fraction import monte_carlo_tolerance
 
 r1volume = 4*math.pi/3
 
@@ -41,3 +44,85 @@ def test_void_fraction_one_sphere_across_pbc():
 
     atoms = [(4,4,4,2)]
     assert calculate_void_fraction(atoms, (4,4,4)) == approx(1 - r1volume/4**3, 0.01)
+
+def brute_force_void_fraction(atoms, box, points_per_angstrom, probe_r):
+    num_points = [math.ceil(length * points_per_angstrom) for length in box]
+    spacing = [length / n for length, n in zip(box, num_points)]
+    grid = np.stack(np.meshgrid(*[np.arange(n) for n in num_points], indexing="ij"), axis=-1)
+    filled = np.zeros(num_points, dtype=bool)
+    for x, y, z, d in atoms:
+        for image in itertools.product([-1, 0, 1], repeat=3):
+            lattice_indices = grid + np.array(image) * num_points
+            lx, ly, lz = [lattice_indices[..., i] * spacing[i] for i in range(3)]
+            filled |= np.sqrt((lx - x)**2 + (ly - y)**2 + (lz - z)**2) < d/2 + probe_r
+    return 1 - filled.sum() / filled.size
+
+@pytest.mark.parametrize("box", [(4, 4, 4), (5.3, 6.1, 7.7), (3.0, 9.5, 4.2)])
+def test_void_fraction_matches_brute_force(box):
+    rng = np.random.default_rng(0)
+    atoms = [(rng.uniform(0, box[0]), rng.uniform(0, box[1]), rng.uniform(0, box[2]), rng.uniform(0.5, 4.0))
+             for _ in range(6)]
+    atoms.append((box[0], 0.0, box[2] / 2, 3.0))
+    assert calculate_void_fraction(atoms, box, points_per_angstrom=4, probe_r=0.3) == \
+           brute_force_void_fraction(atoms, box, 4, 0.3)
+
+def test_void_fraction_atom_bigger_than_box_matches_brute_force():
+    atoms = [(1.0, 2.0, 0.5, 7.0)]
+    box = (2.5, 3.0, 2.0)
+    assert calculate_void_fraction(atoms, box, points_per_angstrom=3, probe_r=0.0) == \
+           brute_force_void_fraction(atoms, box, 3, 0.0)
+
+@pytest.mark.parametrize("max_memory", [1, 1000, 2**20])
+def test_void_fraction__memory_capped_slabs_match_whole_lattice(max_memory):
+    rng = np.random.RandomState(3)
+    box = (6.3, 5.1, 4.4)
+    atoms = [tuple(rng.random_sample(3) * box) + (rng.uniform(0.5, 4.0),) for _ in range(8)]
+    assert calculate_void_fraction(atoms, box, probe_r=0.7, max_memory=max_memory) == \
+        calculate_void_fraction(atoms, box, probe_r=0.7)
+
+@pytest.mark.parametrize("max_memory", [1, 2**20])
+def test_void_fractions__multiple_probes_match_single_probe(max_memory):
+    rng = np.random.RandomState(4)
+    box = (6.3, 5.1, 4.4)
+    atoms = [tuple(rng.random_sample(3) * box) + (rng.uniform(0.5, 4.0),) for _ in range(8)]
+    probe_radii = [0.0, 0.5, 1.3, 2.6]
+    assert calculate_void_fractions(atoms, box, probe_radii, max_memory=max_memory) == \
+        approx([calculate_void_fraction(atoms, box, probe_r=r) for r in probe_radii], abs=1e-6)
+
+def test_void_fractions__empty_crystal():
+    assert calculate_void_fractions([], (4,4,4), [0.0, 1.0]) == [1.0, 1.0]
+
+def test_void_fraction_mc__empty_and_filled_crystals():
+    assert calculate_void_fraction_mc([], (4,4,4))[0] == 1.0
+    assert calculate_void_fraction_mc([(2,2,2,100)], (4,4,4))[0] == 0.0
+
+def test_void_fraction_mc__agrees_with_grid_within_error():
+    rng = np.random.RandomState(5)
+    box = (6.3, 5.1, 4.4)
+    atoms = [tuple(rng.random_sample(3) * box) + (rng.uniform(0.5, 4.0),) for _ in range(8)]
+    vf, error = calculate_void_fraction_mc(atoms, box, probe_r=0.5, tolerance=0.002, rng=np.random.RandomState(0))
+    assert error < 0.002
+    assert vf == approx(calculate_void_fraction(atoms, box, probe_r=0.5), abs=5 * error + 0.005)
+
+def test_void_fraction_mc__stops_at_tolerance():
+    atoms = [(2,2,2,2)]
+    rng = np.random.RandomState(0)
+    _, loose_error = calculate_void_fraction_mc(atoms, (4,4,4), tolerance=0.01, batch_size=100, min_points=100, rng=rng)
+    _, tight_error = calculate_void_fraction_mc(atoms, (4,4,4), tolerance=0.001, batch_size=100, min_points=100, rng=rng)
+    assert 0.009 < loose_error < 0.01
+    assert 0.0009 < tight_error < 0.001
+
+def test_void_fraction_mc__stops_at_max_points():
+    _, error = calculate_void_fraction_mc([(2,2,2,2)], (4,4,4), tolerance=1e-6, batch_size=100, max_points=500)
+    assert error > 1e-6
+
+def test_monte_carlo_tolerance__from_the_void_fraction_property_bins():
+    vf = {"table": "void_fraction", "column": "void_fraction", "range": [0.0, 0.8]}
+    geo = {"table": "void_fraction", "column": "void_fraction_geo", "range": [0.2, 0.6]}
+    loading = {"table": "gas_loading", "column": "absolute_volumetric_loading", "range": [0.0, 300.0]}
+    config = {"number_of_convergence_bins": 10}
+
+    assert monte_carlo_tolerance({"geo_tolerance": 0.5}, dict(config, properties=[geo])) == 0.5
+    assert monte_carlo_tolerance({}, dict(config, properties=[loading, vf, geo])) == approx(0.01)
+    assert monte_carlo_tolerance({}, dict(config, properties=[loading, vf])) == approx(0.02)
+    assert monte_carlo_tolerance({}, dict(config, properties=[loading])) == approx(0.025)